@@ -1,14 +1,16 @@
 """
 Adaptive Learner — El bot aprende de su propio historial
 Actualiza los pesos de cada condición según su historial real de aciertos/fallos.
-Persiste el estado de aprendizaje en JSON.
+Persiste el estado de aprendizaje en el BrainStore (SQLite).
 """
-import json
 import os
+import threading
 import time
 import math
 from typing import Dict, List, Optional, Tuple
 
+from brain.brain_store import BrainStore, get_brain_store
+
 
 class AdaptiveLearner:
     """
@@ -60,10 +62,13 @@ class AdaptiveLearner:
         "min_score_to_trade": 0.38,     # umbral bajo para operar
     }
 
-    def __init__(self, persist_path: str = "brain/learning_state.json"):
+    def __init__(self, persist_path: str = "brain/learning_state.json",
+                 store: Optional[BrainStore] = None):
+        # persist_path: JSON heredado que se importa una vez al store
         self.persist_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), "..", persist_path
         )
+        self.store = store or get_brain_store()
         self.weights: Dict[str, float] = dict(self.DEFAULT_WEIGHTS)
         self.thresholds: Dict[str, float] = dict(self.DEFAULT_THRESHOLDS)
         self.condition_stats: Dict[str, Dict] = {
@@ -75,6 +80,9 @@ class AdaptiveLearner:
         self.max_weight = 2.5
         self.total_trades = 0
         self.total_wins = 0
+        # score_conditions corre en los hilos del escaneo y learn_from_trade
+        # en el del SettlementTracker: pesos y estadísticas bajo un mismo lock
+        self._lock = threading.RLock()
         self._load()
         
         # Cargar historial de trades previos desde TradePersistence
@@ -88,23 +96,24 @@ class AdaptiveLearner:
         - score: float 0-1 ponderado por los pesos aprendidos
         - breakdown: contribución de cada condición activa
         """
-        total_weight = 0.0
-        weighted_score = 0.0
-        breakdown = {}
-
-        for cond_name, is_active in conditions.items():
-            weight = self.weights.get(cond_name, 1.0)
-            total_weight += weight
-            contribution = weight if is_active else 0.0
-            weighted_score += contribution
-            if is_active:
-                breakdown[cond_name] = {
-                    "weight": weight,
-                    "win_rate": self._win_rate(cond_name),
-                }
-
-        if total_weight == 0:
-            return 0.0, {}
+        with self._lock:
+            total_weight = 0.0
+            weighted_score = 0.0
+            breakdown = {}
+
+            for cond_name, is_active in conditions.items():
+                weight = self.weights.get(cond_name, 1.0)
+                total_weight += weight
+                contribution = weight if is_active else 0.0
+                weighted_score += contribution
+                if is_active:
+                    breakdown[cond_name] = {
+                        "weight": weight,
+                        "win_rate": self._win_rate(cond_name),
+                    }
+
+            if total_weight == 0:
+                return 0.0, {}
 
         score = weighted_score / total_weight
         return score, breakdown
@@ -125,40 +134,43 @@ class AdaptiveLearner:
         conditions_at_entry: las condiciones que estaban activas al entrar
         diagnosis: por qué se cree que falló (del TradeEvaluator)
         """
-        is_win = result == "WIN"
-        self.total_trades += 1
-        if is_win:
-            self.total_wins += 1
-
-        for cond_name, was_active in conditions_at_entry.items():
-            if not was_active:
-                continue
-
-            # Actualizar estadísticas
-            if cond_name not in self.condition_stats:
-                self.condition_stats[cond_name] = {"wins": 0, "losses": 0, "total": 0}
-            self.condition_stats[cond_name]["total"] += 1
+        with self._lock:
+            is_win = result == "WIN"
+            self.total_trades += 1
             if is_win:
-                self.condition_stats[cond_name]["wins"] += 1
-            else:
-                self.condition_stats[cond_name]["losses"] += 1
-
-            # Actualizar peso usando Bayesian update simplificado
-            current_weight = self.weights.get(cond_name, 1.0)
-            stats = self.condition_stats[cond_name]
-            if stats["total"] >= 3:
-                wr = stats["wins"] / stats["total"]
-                # Si win rate es bueno → aumentar peso; si es malo → reducir
-                target = wr * 2.0  # rango 0-2 (baseline=1.0 si wr=50%)
-                delta = (target - current_weight) * self.learning_rate
-                new_weight = current_weight + delta
-                self.weights[cond_name] = max(self.min_weight, min(self.max_weight, new_weight))
-
-        # Ajustar thresholds si el diagnóstico indica causa específica
-        if diagnosis and not is_win:
-            self._adjust_thresholds_from_diagnosis(diagnosis)
-
-        self._save()
+                self.total_wins += 1
+
+            changed = []
+            for cond_name, was_active in conditions_at_entry.items():
+                if not was_active:
+                    continue
+                changed.append(cond_name)
+
+                # Actualizar estadísticas
+                if cond_name not in self.condition_stats:
+                    self.condition_stats[cond_name] = {"wins": 0, "losses": 0, "total": 0}
+                self.condition_stats[cond_name]["total"] += 1
+                if is_win:
+                    self.condition_stats[cond_name]["wins"] += 1
+                else:
+                    self.condition_stats[cond_name]["losses"] += 1
+
+                # Actualizar peso usando Bayesian update simplificado
+                current_weight = self.weights.get(cond_name, 1.0)
+                stats = self.condition_stats[cond_name]
+                if stats["total"] >= 3:
+                    wr = stats["wins"] / stats["total"]
+                    # Si win rate es bueno → aumentar peso; si es malo → reducir
+                    target = wr * 2.0  # rango 0-2 (baseline=1.0 si wr=50%)
+                    delta = (target - current_weight) * self.learning_rate
+                    new_weight = current_weight + delta
+                    self.weights[cond_name] = max(self.min_weight, min(self.max_weight, new_weight))
+
+            # Ajustar thresholds si el diagnóstico indica causa específica
+            if diagnosis and not is_win:
+                self._adjust_thresholds_from_diagnosis(diagnosis)
+
+        self._save(changed)
 
     def _adjust_thresholds_from_diagnosis(self, diagnosis: Dict):
         """Ajusta thresholds mínimos basado en el diagnóstico de fallo."""
@@ -191,15 +203,16 @@ class AdaptiveLearner:
     def get_top_conditions(self, n: int = 5) -> List[Dict]:
         """Las condiciones más predictivas según el historial."""
         result = []
-        for cond, stats in self.condition_stats.items():
-            if stats["total"] >= 3:
-                wr = stats["wins"] / stats["total"]
-                result.append({
-                    "condition": cond,
-                    "win_rate": wr,
-                    "total": stats["total"],
-                    "weight": self.weights.get(cond, 1.0),
-                })
+        with self._lock:
+            for cond, stats in self.condition_stats.items():
+                if stats["total"] >= 3:
+                    wr = stats["wins"] / stats["total"]
+                    result.append({
+                        "condition": cond,
+                        "win_rate": wr,
+                        "total": stats["total"],
+                        "weight": self.weights.get(cond, 1.0),
+                    })
         return sorted(result, key=lambda x: x["win_rate"], reverse=True)[:n]
 
     def get_global_winrate(self) -> float:
@@ -214,36 +227,34 @@ class AdaptiveLearner:
 
     # ── Persistencia ──────────────────────────────────────────────────────────
 
-    def _save(self):
+    def _save(self, changed: Optional[List[str]] = None):
+        """Guarda contadores/umbrales y solo las condiciones en `changed` (None = todas)."""
+        # Copia bajo el lock; la escritura a SQLite no bloquea el escaneo
+        with self._lock:
+            names = list(self.condition_stats) if changed is None else changed
+            stats = {n: dict(self.condition_stats[n]) for n in names if n in self.condition_stats}
+            weights = dict(self.weights)
+            meta = {
+                "thresholds": dict(self.thresholds),
+                "total_trades": self.total_trades,
+                "total_wins": self.total_wins,
+                "last_updated": time.time(),
+            }
         try:
-            existing = {}
-            if os.path.exists(self.persist_path):
-                with open(self.persist_path, "r") as f:
-                    existing = json.load(f)
-            existing["weights"] = self.weights
-            existing["thresholds"] = self.thresholds
-            existing["condition_stats"] = self.condition_stats
-            existing["total_trades"] = self.total_trades
-            existing["total_wins"] = self.total_wins
-            existing["last_updated"] = time.time()
-            os.makedirs(os.path.dirname(self.persist_path), exist_ok=True)
-            with open(self.persist_path, "w") as f:
-                json.dump(existing, f, indent=2)
+            with self.store.transaction():
+                self.store.upsert_condition_stats(stats, weights)
+                self.store.set_meta("learner", meta)
         except Exception:
             pass
 
     def _load(self):
-        if not os.path.exists(self.persist_path):
-            return
         try:
-            with open(self.persist_path, "r") as f:
-                data = json.load(f)
-            if "weights" in data:
-                self.weights.update(data["weights"])
-            if "thresholds" in data:
-                self.thresholds.update(data["thresholds"])
-            if "condition_stats" in data:
-                self.condition_stats.update(data["condition_stats"])
+            self.store.import_learning_state(self.persist_path)
+            stats, weights = self.store.load_condition_stats()
+            self.weights.update(weights)
+            self.condition_stats.update(stats)
+            data = self.store.get_meta("learner", {})
+            self.thresholds.update(data.get("thresholds", {}))
             self.total_trades = data.get("total_trades", 0)
             self.total_wins = data.get("total_wins", 0)
         except Exception:
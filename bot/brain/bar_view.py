@@ -0,0 +1,69 @@
+"""
+Bar View — Vista columnar de velas OHLC
+Un DataFrame de velas se convierte una sola vez en arrays NumPy por columna y
+las funciones de evidencia (MarketAI) y la analítica post-trade trabajan sobre
+esos arrays con operaciones vectorizadas en lugar de iterrows()/iloc por fila.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Bars:
+    """Velas como arrays float64 por columna (misma longitud y orden que el DataFrame)."""
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+
+    @classmethod
+    def from_df(cls, df: Optional[pd.DataFrame]) -> Optional["Bars"]:
+        if df is None:
+            return None
+        return cls(*(df[k].to_numpy(dtype=float) for k in ("open", "high", "low", "close")))
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def tail(self, n: int) -> "Bars":
+        return Bars(self.open[-n:], self.high[-n:], self.low[-n:], self.close[-n:])
+
+    @property
+    def range(self) -> np.ndarray:
+        return self.high - self.low
+
+
+# ── Analítica post-trade ──────────────────────────────────────────────────────
+
+TARGET_PCT = 0.0003   # movimiento mínimo a favor para considerar "objetivo alcanzado"
+
+
+def bars_to_target(bars: Optional[Bars], entry_price: float, direction: str,
+                   target_pct: float = TARGET_PCT) -> Optional[int]:
+    """Nº de vela (1 = primera) en que el precio superó el objetivo, o None si nunca."""
+    if bars is None or len(bars) == 0:
+        return None
+    if direction == "CALL":
+        hits = np.flatnonzero(bars.high > entry_price * (1 + target_pct))
+    else:
+        hits = np.flatnonzero(bars.low < entry_price * (1 - target_pct))
+    return int(hits[0]) + 1 if len(hits) else None
+
+
+def post_trade_move(df_after: Optional[pd.DataFrame], entry_price: float,
+                    direction: str) -> Tuple[float, int]:
+    """
+    (pips máximos a favor, velas hasta el objetivo) tras la entrada.
+    Sin datos suficientes devuelve (0.0, 1), como el registro de toques espera.
+    """
+    if df_after is None or len(df_after) < 2 or entry_price <= 0:
+        return 0.0, 1
+    bars = Bars.from_df(df_after)
+    if direction == "CALL":
+        pips = (float(bars.high.max()) - entry_price) * 10000
+    else:
+        pips = (entry_price - float(bars.low.min())) * 10000
+    return max(0.0, pips), bars_to_target(bars, entry_price, direction) or 1
@@ -0,0 +1,307 @@
+"""
+Brain Store — Persistencia transaccional del cerebro en SQLite (modo WAL)
+Un único archivo para zonas, estadísticas de condiciones, eventos de toque y
+trades. Cada guardado escribe solo las filas que cambiaron dentro de una
+transacción: un corte a mitad de escritura ya no deja el estado corrupto, y
+MarketMemory / AdaptiveLearner dejan de pisarse los campos de learning_state.json.
+
+Los JSON anteriores (learning_state.json, zone_reactions.json) se importan una
+sola vez al abrir el store; no se borran.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+ZONE_FIELDS = ("asset", "level", "zone_type", "touches", "holds", "breaks", "strength",
+               "last_touch_ts", "first_seen_ts", "avg_reaction_pips", "notes")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS zones (
+    asset             TEXT NOT NULL,
+    level             REAL NOT NULL,
+    zone_type         TEXT,
+    touches           INTEGER,
+    holds             INTEGER,
+    breaks            INTEGER,
+    strength          REAL,
+    last_touch_ts     REAL,
+    first_seen_ts     REAL,
+    avg_reaction_pips REAL,
+    notes             TEXT,
+    PRIMARY KEY (asset, level)
+);
+CREATE TABLE IF NOT EXISTS condition_stats (
+    name   TEXT PRIMARY KEY,
+    wins   INTEGER DEFAULT 0,
+    losses INTEGER DEFAULT 0,
+    total  INTEGER DEFAULT 0,
+    weight REAL
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts    REAL,
+    asset TEXT,
+    data  TEXT
+);
+CREATE TABLE IF NOT EXISTS zone_profiles (
+    zone_key  TEXT PRIMARY KEY,
+    asset     TEXT,
+    level     REAL,
+    zone_type TEXT,
+    stats     TEXT
+);
+CREATE TABLE IF NOT EXISTS touch_events (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    zone_key  TEXT NOT NULL,
+    timestamp REAL,
+    data      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_touch_events_zone ON touch_events (zone_key, id);
+"""
+
+
+class BrainStore:
+    """
+    Conexión SQLite compartida entre hilos (escaneo paralelo + worker de
+    liquidación). Las escrituras se agrupan con `transaction()`; las anidadas
+    se confirman en un solo COMMIT al salir de la más externa.
+    """
+
+    def __init__(self, db_path: str = "brain/brain_state.db"):
+        if not os.path.isabs(db_path):
+            db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", db_path)
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._depth = 0
+        # isolation_level=None: las transacciones se abren a mano en transaction()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                     isolation_level=None, timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            outer = self._depth == 0
+            if outer:
+                self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self._conn
+            except BaseException:
+                self._depth -= 1
+                if outer:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if outer:
+                self._conn.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ── Meta (clave -> JSON) ──────────────────────────────────────────────────
+
+    def get_meta(self, key: str, default=None):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else default
+
+    def set_meta(self, key: str, value):
+        with self.transaction() as db:
+            db.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                       "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                       (key, json.dumps(value)))
+
+    # ── Zonas ─────────────────────────────────────────────────────────────────
+
+    def upsert_zones(self, zones: Iterable[dict]):
+        cols = ", ".join(ZONE_FIELDS)
+        marks = ", ".join("?" for _ in ZONE_FIELDS)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in ZONE_FIELDS[2:])
+        rows = [tuple(json.dumps(z.get(c, [])) if c == "notes" else z.get(c) for c in ZONE_FIELDS)
+                for z in zones]
+        if not rows:
+            return
+        with self.transaction() as db:
+            db.executemany(f"INSERT INTO zones ({cols}) VALUES ({marks}) "
+                           f"ON CONFLICT(asset, level) DO UPDATE SET {updates}", rows)
+
+    def delete_zones(self, asset: str, levels: Iterable[float]):
+        rows = [(asset, level) for level in levels]
+        if not rows:
+            return
+        with self.transaction() as db:
+            db.executemany("DELETE FROM zones WHERE asset = ? AND level = ?", rows)
+
+    def load_zones(self) -> Dict[str, List[dict]]:
+        out: Dict[str, List[dict]] = {}
+        for row in self._query(f"SELECT {', '.join(ZONE_FIELDS)} FROM zones ORDER BY asset, level"):
+            z = dict(zip(ZONE_FIELDS, row))
+            z["notes"] = json.loads(z["notes"]) if z["notes"] else []
+            out.setdefault(z["asset"], []).append(z)
+        return out
+
+    # ── Estadísticas de condiciones (AdaptiveLearner) ─────────────────────────
+
+    def upsert_condition_stats(self, stats: Dict[str, dict], weights: Dict[str, float]):
+        rows = [(name, s.get("wins", 0), s.get("losses", 0), s.get("total", 0), weights.get(name))
+                for name, s in stats.items()]
+        if not rows:
+            return
+        with self.transaction() as db:
+            db.executemany("INSERT INTO condition_stats (name, wins, losses, total, weight) "
+                           "VALUES (?, ?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET "
+                           "wins = excluded.wins, losses = excluded.losses, "
+                           "total = excluded.total, weight = excluded.weight", rows)
+
+    def load_condition_stats(self) -> Tuple[Dict[str, dict], Dict[str, float]]:
+        stats, weights = {}, {}
+        for name, wins, losses, total, weight in self._query(
+                "SELECT name, wins, losses, total, weight FROM condition_stats"):
+            stats[name] = {"wins": wins, "losses": losses, "total": total}
+            if weight is not None:
+                weights[name] = weight
+        return stats, weights
+
+    # ── Trades ────────────────────────────────────────────────────────────────
+
+    def append_trade(self, trade: dict):
+        with self.transaction() as db:
+            db.execute("INSERT INTO trades (ts, asset, data) VALUES (?, ?, ?)",
+                       (trade.get("timestamp", time.time()), trade.get("asset"),
+                        json.dumps(trade, default=str)))
+
+    def recent_trades(self, n: int = 200) -> List[dict]:
+        rows = self._query("SELECT data FROM trades ORDER BY id DESC LIMIT ?", (n,))
+        return [json.loads(r[0]) for r in reversed(rows)]
+
+    # ── Perfiles de zona y eventos de toque (ZoneReactionHistory) ─────────────
+
+    def upsert_zone_profile(self, zone_key: str, asset: str, level: float,
+                            zone_type: str, stats: dict):
+        with self.transaction() as db:
+            db.execute("INSERT INTO zone_profiles (zone_key, asset, level, zone_type, stats) "
+                       "VALUES (?, ?, ?, ?, ?) ON CONFLICT(zone_key) DO UPDATE SET "
+                       "zone_type = excluded.zone_type, stats = excluded.stats",
+                       (zone_key, asset, level, zone_type, json.dumps(stats)))
+
+    def append_touch(self, zone_key: str, event: dict):
+        with self.transaction() as db:
+            db.execute("INSERT INTO touch_events (zone_key, timestamp, data) VALUES (?, ?, ?)",
+                       (zone_key, event.get("timestamp"), json.dumps(event)))
+
+    def load_zone_profile(self, zone_key: str, events: int = 20) -> Optional[dict]:
+        """Perfil de una zona por su clave (índice primario) con sus últimos `events` eventos."""
+        rows = self._query("SELECT asset, level, zone_type, stats FROM zone_profiles "
+                           "WHERE zone_key = ?", (zone_key,))
+        if not rows:
+            return None
+        asset, level, zone_type, stats = rows[0]
+        d = json.loads(stats) if stats else {}
+        d.update(asset=asset, level=level, zone_type=zone_type)
+        recent = self._query("SELECT data FROM touch_events WHERE zone_key = ? "
+                             "ORDER BY id DESC LIMIT ?", (zone_key, events))
+        d["touch_events"] = [json.loads(r[0]) for r in reversed(recent)]
+        return d
+
+    def compact_touch_events(self, keep_per_zone: int = 100) -> int:
+        """
+        Borra los eventos más viejos que los últimos `keep_per_zone` de cada zona
+        (sus totales ya están en el perfil) y hace checkpoint del WAL.
+        """
+        with self.transaction() as db:
+            deleted = db.execute(
+                "DELETE FROM touch_events WHERE id IN ("
+                "  SELECT id FROM ("
+                "    SELECT id, ROW_NUMBER() OVER "
+                "      (PARTITION BY zone_key ORDER BY id DESC) AS rn FROM touch_events"
+                "  ) WHERE rn > ?)", (keep_per_zone,)).rowcount
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return deleted
+
+    # ── Migración desde JSON ──────────────────────────────────────────────────
+
+    def import_learning_state(self, path: str) -> bool:
+        """Importa learning_state.json (zonas, trades y pesos) una sola vez."""
+        data = self._read_legacy(path)
+        if data is None:
+            return False
+        with self.transaction():
+            self.upsert_zones(z for zones in data.get("zones", {}).values() for z in zones)
+            for trade in data.get("trade_history", []):
+                self.append_trade(trade)
+            stats = dict(data.get("condition_stats", {}))
+            for name in data.get("weights", {}):
+                stats.setdefault(name, {"wins": 0, "losses": 0, "total": 0})
+            self.upsert_condition_stats(stats, data.get("weights", {}))
+            if any(k in data for k in ("thresholds", "total_trades", "total_wins")):
+                self.set_meta("learner", {
+                    "thresholds": data.get("thresholds", {}),
+                    "total_trades": data.get("total_trades", 0),
+                    "total_wins": data.get("total_wins", 0),
+                    "last_updated": data.get("last_updated", time.time()),
+                })
+            self._mark_imported(path)
+        return True
+
+    def import_zone_reactions(self, path: str) -> bool:
+        """Importa zone_reactions.json (perfiles + eventos guardados) una sola vez."""
+        data = self._read_legacy(path)
+        if data is None:
+            return False
+        with self.transaction():
+            for zone_key, d in data.items():
+                d = dict(d)
+                events = d.pop("touch_events", [])
+                self.upsert_zone_profile(zone_key, d.pop("asset"), d.pop("level"),
+                                         d.pop("zone_type"), d)
+                for event in events:
+                    self.append_touch(zone_key, event)
+            self._mark_imported(path)
+        return True
+
+    def _read_legacy(self, path: str) -> Optional[dict]:
+        if self.get_meta(self._import_key(path)) or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _mark_imported(self, path: str):
+        self.set_meta(self._import_key(path), time.time())
+
+    @staticmethod
+    def _import_key(path: str) -> str:
+        return f"imported:{os.path.basename(path)}"
+
+
+# Singleton
+_store: Optional[BrainStore] = None
+_store_lock = threading.Lock()
+
+
+def get_brain_store() -> BrainStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BrainStore()
+        return _store
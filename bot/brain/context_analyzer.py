@@ -7,9 +7,14 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Optional, List
 
+from brain.indicator_service import get_indicator_service
+
 
 class ContextAnalyzer:
 
+    def __init__(self):
+        self.indicators = get_indicator_service()
+
     def analyze(self, df_m1: pd.DataFrame, df_m5: pd.DataFrame,
                 df_m15: pd.DataFrame, df_h1: Optional[pd.DataFrame],
                 zone=None, current_price: float = 0.0) -> Dict:
@@ -122,7 +127,7 @@ class ContextAnalyzer:
 
         # EMA slope
         if len(closes) >= 20:
-            ema20 = self._ema(closes, 20)
+            ema20 = self.indicators.ema(df, 20)
             slope = (ema20[-1] - ema20[-5]) / ema20[-5] * 100 if ema20[-5] != 0 else 0
         else:
             slope = 0.0
@@ -154,11 +159,10 @@ class ContextAnalyzer:
 
     def _momentum_analysis(self, df_m1: pd.DataFrame, df_m5: pd.DataFrame) -> Dict:
         closes_m1 = df_m1["close"].values
-        closes_m5 = df_m5["close"].values if len(df_m5) >= 5 else closes_m1
 
-        rsi_m1 = self._rsi(closes_m1, 14)
-        rsi_m5 = self._rsi(closes_m5, 14)
-        macd_m1, signal_m1, hist_m1 = self._macd(closes_m1)
+        rsi_m1 = self.indicators.rsi(df_m1, 14)
+        rsi_m5 = self.indicators.rsi(df_m5 if len(df_m5) >= 5 else df_m1, 14)
+        macd_m1, signal_m1, hist_m1 = self.indicators.macd(df_m1)
 
         rsi_val = float(rsi_m1[-1]) if len(rsi_m1) > 0 else 50.0
         rsi_m5_val = float(rsi_m5[-1]) if len(rsi_m5) > 0 else 50.0
@@ -192,7 +196,7 @@ class ContextAnalyzer:
         if len(df) < 20:
             return "unknown"
         closes = df["close"].values
-        atr = self._atr(df)
+        atr = self.indicators.atr(df)
         avg_atr = float(np.mean(atr[-20:])) if len(atr) >= 20 else float(np.mean(atr))
         last_atr = float(atr[-1]) if len(atr) > 0 else 0.0
 
@@ -368,80 +372,6 @@ class ContextAnalyzer:
             "volatility_pips": volatility,
         }
 
-    # ── Indicadores internos ──────────────────────────────────────────────────
-
-    @staticmethod
-    def _ema(data: np.ndarray, period: int) -> np.ndarray:
-        if len(data) < period:
-            return data
-        alpha = 2.0 / (period + 1)
-        ema = np.zeros(len(data))
-        ema[period - 1] = np.mean(data[:period])
-        for i in range(period, len(data)):
-            ema[i] = alpha * data[i] + (1 - alpha) * ema[i - 1]
-        return ema
-
-    @staticmethod
-    def _rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
-        if len(closes) < period + 1:
-            return np.full(len(closes), 50.0)
-        delta = np.diff(closes)
-        gain = np.where(delta > 0, delta, 0.0)
-        loss = np.where(delta < 0, -delta, 0.0)
-        avg_gain = np.zeros(len(delta))
-        avg_loss = np.zeros(len(delta))
-        avg_gain[period - 1] = np.mean(gain[:period])
-        avg_loss[period - 1] = np.mean(loss[:period])
-        for i in range(period, len(delta)):
-            avg_gain[i] = (avg_gain[i - 1] * (period - 1) + gain[i]) / period
-            avg_loss[i] = (avg_loss[i - 1] * (period - 1) + loss[i]) / period
-        rs = np.where(avg_loss > 1e-10, avg_gain / np.where(avg_loss > 1e-10, avg_loss, 1e-10), 100.0)
-        rsi = 100 - 100 / (1 + rs)
-        return np.concatenate([[50.0], rsi])
-
-    @staticmethod
-    def _macd(closes: np.ndarray, fast=12, slow=26, signal=9):
-        def ema(data, p):
-            if len(data) < p:
-                return data
-            a = 2.0 / (p + 1)
-            e = np.zeros(len(data))
-            e[p - 1] = np.mean(data[:p])
-            for i in range(p, len(data)):
-                e[i] = a * data[i] + (1 - a) * e[i - 1]
-            return e
-
-        if len(closes) < slow + signal:
-            z = np.zeros(len(closes))
-            return z, z, z
-        ema_fast = ema(closes, fast)
-        ema_slow = ema(closes, slow)
-        macd_line = ema_fast - ema_slow
-        signal_line = ema(macd_line, signal)
-        hist = macd_line - signal_line
-        return macd_line, signal_line, hist
-
-    @staticmethod
-    def _atr(df: pd.DataFrame, period: int = 14) -> np.ndarray:
-        highs = df["high"].values
-        lows = df["low"].values
-        closes = df["close"].values
-        n = len(df)
-        if n < 2:
-            return np.zeros(n)
-        tr = np.zeros(n)
-        tr[0] = highs[0] - lows[0]
-        for i in range(1, n):
-            tr[i] = max(highs[i] - lows[i],
-                        abs(highs[i] - closes[i - 1]),
-                        abs(lows[i] - closes[i - 1]))
-        atr = np.zeros(n)
-        if n >= period:
-            atr[period - 1] = np.mean(tr[:period])
-            for i in range(period, n):
-                atr[i] = (atr[i - 1] * (period - 1) + tr[i]) / period
-        return atr
-
     @staticmethod
     def _empty_context() -> Dict:
         return {
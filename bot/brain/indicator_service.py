@@ -0,0 +1,224 @@
+"""
+Indicator Service — Indicadores técnicos compartidos y memoizados
+Un mismo ciclo de análisis pedía EMA/RSI/MACD/ATR sobre las mismas velas M1/M5
+desde ContextAnalyzer, FeatureEngineer, SignalEngine y el ensemble ML, cada uno
+con su propio bucle. Aquí cada serie (activo, timeframe, indicador, parámetros)
+se calcula una sola vez por vela y se reparte como vista NumPy de solo lectura.
+
+Las fórmulas son vectorizadas (recurrencias EMA/Wilder vía ewm de pandas) y
+reproducen exactamente la semántica de cada consumidor mediante `kind`:
+- "seeded": recurrencia sembrada con la media simple de los primeros `period`
+  valores, ceros antes (ContextAnalyzer y el ATR de la librería `ta`)
+- "ewm": media exponencial de pandas con `adjust` / `strict` (min_periods=period)
+- "sma": medias móviles simples (RSI/ATR clásicos de FeatureEngineer)
+
+La caché solo se usa con DataFrames etiquetados en `df.attrs` con `asset` y
+`timeframe` (MarketDataHandler y el replay lo hacen). La etiqueta solo decide
+qué frames se cachean: la clave incluye un hash del contenido de las columnas
+que lee el indicador, así que un slice, una copia modificada o una edición en
+sitio (aunque conserve attrs) nunca devuelve indicadores de otros datos.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _readonly(arr) -> np.ndarray:
+    arr = np.asarray(arr, dtype=float)
+    arr.flags.writeable = False
+    return arr
+
+
+def _seeded(x: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """y[i] = alpha*x[i] + (1-alpha)*y[i-1], y[period-1] = media(x[:period]), ceros antes."""
+    out = np.zeros(len(x))
+    if len(x) < period:
+        return out
+    s = np.array(x[period - 1:], dtype=float)
+    s[0] = np.mean(x[:period])
+    out[period - 1:] = pd.Series(s).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return out
+
+
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    tr = high - low
+    if len(tr) > 1:
+        prev = close[:-1]
+        tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(high[1:] - prev), np.abs(low[1:] - prev)))
+    return tr
+
+
+def _ewm(x: np.ndarray, period: int, adjust: bool, strict: bool) -> np.ndarray:
+    return pd.Series(x).ewm(span=period, adjust=adjust,
+                            min_periods=period if strict else 0).mean().to_numpy()
+
+
+# ── Fórmulas ──────────────────────────────────────────────────────────────────
+
+def calc_ema(close: np.ndarray, period: int, kind: str = "seeded",
+             adjust: bool = False, strict: bool = False) -> np.ndarray:
+    if kind == "ewm":
+        return _ewm(close, period, adjust, strict)
+    if len(close) < period:
+        return np.array(close, dtype=float)
+    return _seeded(close, period, 2.0 / (period + 1))
+
+
+def calc_rsi(close: np.ndarray, period: int = 14, kind: str = "seeded") -> np.ndarray:
+    if kind == "sma":
+        delta = pd.Series(close).diff()
+        gain = delta.where(delta > 0, 0).rolling(window=period).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+        return (100 - (100 / (1 + gain / loss))).to_numpy()
+
+    if kind == "ewm":
+        # Wilder con ewm(alpha=1/period) y NaN hasta tener `period` diferencias
+        delta = np.diff(close, prepend=close[0]) if len(close) else np.array([])
+        up = pd.Series(np.where(delta > 0, delta, 0.0))
+        dn = pd.Series(np.where(delta < 0, -delta, 0.0))
+        ema_up = up.ewm(alpha=1 / period, min_periods=period, adjust=False).mean().to_numpy()
+        ema_dn = dn.ewm(alpha=1 / period, min_periods=period, adjust=False).mean().to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(ema_dn == 0, 100, 100 - (100 / (1 + ema_up / ema_dn)))
+
+    if len(close) < period + 1:
+        return np.full(len(close), 50.0)
+    delta = np.diff(close)
+    avg_gain = _seeded(np.where(delta > 0, delta, 0.0), period, 1.0 / period)
+    avg_loss = _seeded(np.where(delta < 0, -delta, 0.0), period, 1.0 / period)
+    rs = np.where(avg_loss > 1e-10, avg_gain / np.where(avg_loss > 1e-10, avg_loss, 1e-10), 100.0)
+    return np.concatenate([[50.0], 100 - 100 / (1 + rs)])
+
+
+def calc_macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9,
+              kind: str = "seeded", adjust: bool = False,
+              strict: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if kind == "ewm":
+        line = _ewm(close, fast, adjust, strict) - _ewm(close, slow, adjust, strict)
+        sig = _ewm(line, signal, adjust, strict)
+        return line, sig, line - sig
+    if len(close) < slow + signal:
+        z = np.zeros(len(close))
+        return z, z, z
+    line = calc_ema(close, fast) - calc_ema(close, slow)
+    sig = calc_ema(line, signal)
+    return line, sig, line - sig
+
+
+def calc_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+             period: int = 14, kind: str = "seeded") -> np.ndarray:
+    n = len(close)
+    if n < 2:
+        return np.zeros(n)
+    tr = _true_range(np.asarray(high, dtype=float), np.asarray(low, dtype=float),
+                     np.asarray(close, dtype=float))
+    if kind == "sma":
+        return pd.Series(tr).rolling(window=period).mean().to_numpy()
+    return _seeded(tr, period, 1.0 / period)
+
+
+def calc_bollinger(close: np.ndarray, period: int = 20, std_dev: float = 2,
+                   ddof: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    s = pd.Series(close)
+    mid = s.rolling(window=period).mean().to_numpy()
+    std = s.rolling(window=period).std(ddof=ddof).to_numpy()
+    return mid + std * std_dev, mid - std * std_dev, mid
+
+
+# ── Servicio ──────────────────────────────────────────────────────────────────
+
+class IndicatorService:
+    """
+    Caché LRU de series de indicadores por (activo, timeframe, indicador,
+    parámetros, huella de la ventana). Seguro entre hilos del escaneo paralelo.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ── API para consumidores ─────────────────────────────────────────────────
+
+    def ema(self, df: pd.DataFrame, period: int, kind: str = "seeded",
+            adjust: bool = False, strict: bool = False) -> np.ndarray:
+        return self._get(df, ("ema", period, kind, adjust, strict), ("close",),
+                         lambda c: calc_ema(c["close"], period, kind, adjust, strict))
+
+    def rsi(self, df: pd.DataFrame, period: int = 14, kind: str = "seeded") -> np.ndarray:
+        return self._get(df, ("rsi", period, kind), ("close",),
+                         lambda c: calc_rsi(c["close"], period, kind))
+
+    def macd(self, df: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9,
+             kind: str = "seeded", adjust: bool = False,
+             strict: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._get(df, ("macd", fast, slow, signal, kind, adjust, strict), ("close",),
+                         lambda c: calc_macd(c["close"], fast, slow, signal, kind, adjust, strict))
+
+    def atr(self, df: pd.DataFrame, period: int = 14, kind: str = "seeded") -> np.ndarray:
+        return self._get(df, ("atr", period, kind), ("high", "low", "close"),
+                         lambda c: calc_atr(c["high"], c["low"], c["close"], period, kind))
+
+    def bollinger(self, df: pd.DataFrame, period: int = 20, std_dev: float = 2,
+                  ddof: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self._get(df, ("bb", period, std_dev, ddof), ("close",),
+                         lambda c: calc_bollinger(c["close"], period, std_dev, ddof))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    # ── Internos ──────────────────────────────────────────────────────────────
+
+    def _get(self, df: pd.DataFrame, spec: tuple, columns: Tuple[str, ...],
+             compute: Callable[[dict], object]):
+        cols = {c: df[c].to_numpy(dtype=float) for c in columns}
+        key = self._key(df, spec, cols)
+        if key is not None:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached
+
+        result = compute(cols)
+        result = tuple(_readonly(r) for r in result) if isinstance(result, tuple) else _readonly(result)
+
+        if key is not None:
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = result
+                if len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _key(df: pd.DataFrame, spec: tuple, cols: dict) -> Optional[tuple]:
+        attrs = getattr(df, "attrs", None) or {}
+        asset = attrs.get("asset")
+        if asset is None or len(df) == 0:
+            return None
+        # Huella de los datos mismos (no de attrs): cualquier valor distinto cambia la clave
+        content = tuple(hash(np.ascontiguousarray(cols[c]).tobytes()) for c in sorted(cols))
+        return (asset, attrs.get("timeframe"), spec, len(df), content)
+
+
+# Singleton
+_service: Optional[IndicatorService] = None
+
+
+def get_indicator_service() -> IndicatorService:
+    global _service
+    if _service is None:
+        _service = IndicatorService()
+    return _service
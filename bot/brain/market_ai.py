@@ -11,6 +11,8 @@ import pandas as pd
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
+from brain.bar_view import Bars
+
 
 @dataclass
 class Evidence:
@@ -58,17 +60,18 @@ class MarketAI:
         """
         reasoning = []
         all_evidence: List[Evidence] = []
+        # Vista columnar: cada DataFrame se convierte a arrays una sola vez
+        m1, m5 = Bars.from_df(df_m1), Bars.from_df(df_m5)
 
         # ── PASO 1: Leer la estructura del mercado ────────────────────────────
         reasoning.append("1. Leyendo estructura del mercado...")
-        market_story = self._read_market_story(df_m1, df_m5, df_m15, df_h1, context)
+        market_story = self._read_market_story(m5, context)
         reasoning.extend(market_story["reasoning"])
 
         # ── PASO 2: Evaluar la zona ───────────────────────────────────────────
         reasoning.append("2. Evaluando zona de precio...")
         zone_evidence = self._evaluate_zone(
-            zone_level, zone_type, zone_strength, zone_touches, zone_hold_rate,
-            context, df_m5
+            zone_level, zone_type, zone_strength, zone_touches, zone_hold_rate
         )
         all_evidence.extend(zone_evidence["evidence"])
         reasoning.extend(zone_evidence["reasoning"])
@@ -76,14 +79,14 @@ class MarketAI:
         # ── PASO 3: Analizar el patrón de vela ───────────────────────────────
         reasoning.append("3. Interpretando patrón de vela...")
         pattern_evidence = self._evaluate_pattern(
-            pattern_name, pattern_strength, context, df_m1
+            pattern_name, pattern_strength, m1
         )
         all_evidence.extend(pattern_evidence["evidence"])
         reasoning.extend(pattern_evidence["reasoning"])
 
         # ── PASO 4: Momentum y RSI ────────────────────────────────────────────
         reasoning.append("4. Analizando momentum...")
-        momentum_evidence = self._evaluate_momentum(df_m1, df_m5, context)
+        momentum_evidence = self._evaluate_momentum(context)
         all_evidence.extend(momentum_evidence["evidence"])
         reasoning.extend(momentum_evidence["reasoning"])
 
@@ -95,7 +98,7 @@ class MarketAI:
 
         # ── PASO 6: Detectar trampas y señales de advertencia ────────────────
         reasoning.append("6. Buscando trampas del mercado...")
-        trap_evidence = self._detect_traps(df_m1, df_m5, context, zone_level, zone_type)
+        trap_evidence = self._detect_traps(m1, m5, context, zone_level, zone_type)
         all_evidence.extend(trap_evidence["evidence"])
         reasoning.extend(trap_evidence["reasoning"])
 
@@ -113,7 +116,7 @@ class MarketAI:
     # PASO 1 — Estructura del mercado
     # ─────────────────────────────────────────────────────────────────────────
 
-    def _read_market_story(self, df_m1, df_m5, df_m15, df_h1, context) -> Dict:
+    def _read_market_story(self, m5: Optional[Bars], context) -> Dict:
         reasoning = []
         dominant_trend = context.get("dominant_trend", "neutral")
         phase = context.get("market_phase", "ranging")
@@ -136,9 +139,8 @@ class MarketAI:
             reasoning.append(f"  → ADVERTENCIA: Mercado muerto. Poca volatilidad, spreads peligrosos.")
 
         # Leer los últimos 5 cuerpos de vela M5 para entender el impulso reciente
-        if df_m5 is not None and len(df_m5) >= 8:
-            recent = df_m5.tail(8)
-            bull_count = sum(1 for _, r in recent.iterrows() if float(r["close"]) > float(r["open"]))
+        if m5 is not None and len(m5) >= 8:
+            bull_count = int(np.count_nonzero(m5.close[-8:] > m5.open[-8:]))
             bear_count = 8 - bull_count
             if bull_count >= 6:
                 reasoning.append(f"  → Impulso reciente: MUY ALCISTA ({bull_count}/8 velas verdes)")
@@ -154,7 +156,7 @@ class MarketAI:
     # ─────────────────────────────────────────────────────────────────────────
 
     def _evaluate_zone(self, zone_level, zone_type, zone_strength,
-                        zone_touches, zone_hold_rate, context, df_m5) -> Dict:
+                        zone_touches, zone_hold_rate) -> Dict:
         evidence = []
         reasoning = []
 
@@ -206,7 +208,7 @@ class MarketAI:
     # PASO 3 — Evaluación de patrón
     # ─────────────────────────────────────────────────────────────────────────
 
-    def _evaluate_pattern(self, pattern_name, pattern_strength, context, df_m1) -> Dict:
+    def _evaluate_pattern(self, pattern_name, pattern_strength, m1: Optional[Bars]) -> Dict:
         evidence = []
         reasoning = []
 
@@ -228,8 +230,8 @@ class MarketAI:
         base_score = pattern_scores.get(pattern_name, 0.50) if has_pattern else 0.30
 
         # En ausencia de patrón claro, mirar si las últimas 2 velas M1 forman estructura
-        if not has_pattern and df_m1 is not None and len(df_m1) >= 5:
-            micro_structure = self._micro_pattern_analysis(df_m1)
+        if not has_pattern and m1 is not None and len(m1) >= 5:
+            micro_structure = self._micro_pattern_analysis(m1)
             if micro_structure["found"]:
                 reasoning.append(f"  → Sin patrón clásico pero hay micro-estructura: {micro_structure['name']}")
                 base_score = 0.55
@@ -257,16 +259,14 @@ class MarketAI:
 
         return {"evidence": evidence, "reasoning": reasoning}
 
-    def _micro_pattern_analysis(self, df_m1: pd.DataFrame) -> Dict:
+    def _micro_pattern_analysis(self, m1: Bars) -> Dict:
         """Detecta micro-estructuras de 2-3 velas que no son patrones clásicos."""
-        if len(df_m1) < 4:
+        if len(m1) < 4:
             return {"found": False}
 
-        c_2 = df_m1.iloc[-3]
-        c_1 = df_m1.iloc[-2]
-
-        o2, c2 = float(c_2["open"]), float(c_2["close"])
-        o1, c1 = float(c_1["open"]), float(c_1["close"])
+        # Velas -3 y -2 (cerradas)
+        o2, o1 = m1.open[-3:-1]
+        c2, c1 = m1.close[-3:-1]
 
         # Dos velas consecutivas del mismo color (momentum)
         if c2 > o2 and c1 > o1:
@@ -289,7 +289,7 @@ class MarketAI:
     # PASO 4 — Momentum y RSI
     # ─────────────────────────────────────────────────────────────────────────
 
-    def _evaluate_momentum(self, df_m1, df_m5, context) -> Dict:
+    def _evaluate_momentum(self, context) -> Dict:
         evidence = []
         reasoning = []
         momentum = context.get("momentum", {})
@@ -402,23 +402,19 @@ class MarketAI:
     # PASO 6 — Detección de trampas
     # ─────────────────────────────────────────────────────────────────────────
 
-    def _detect_traps(self, df_m1, df_m5, context, zone_level, zone_type) -> Dict:
+    def _detect_traps(self, m1: Optional[Bars], m5: Optional[Bars], context,
+                      zone_level, zone_type) -> Dict:
         evidence = []
         reasoning = []
 
         # ── Trampa 1: Rotura falsa (fake breakout) ────────────────────────────
         # Si el precio rompió la zona en la vela anterior y ahora volvió,
         # puede ser una trampa bajista/alcista clásica
-        if df_m5 is not None and len(df_m5) >= 6:
-            recent5 = df_m5.tail(6)
-            prices_crossed = 0
-            for _, row in recent5.iterrows():
-                if zone_type == "resistance":
-                    if float(row["high"]) > zone_level * 1.0008:
-                        prices_crossed += 1
-                else:
-                    if float(row["low"]) < zone_level * 0.9992:
-                        prices_crossed += 1
+        if m5 is not None and len(m5) >= 6:
+            if zone_type == "resistance":
+                prices_crossed = int(np.count_nonzero(m5.high[-6:] > zone_level * 1.0008))
+            else:
+                prices_crossed = int(np.count_nonzero(m5.low[-6:] < zone_level * 0.9992))
             if prices_crossed >= 2:
                 evidence.append(Evidence(
                     "fake_breakout_risk", 0.12, False, 0.70,
@@ -427,11 +423,10 @@ class MarketAI:
                 reasoning.append(f"  → ALERTA: La zona fue cruzada {prices_crossed} veces recientemente. Riesgo de falsa ruptura.")
 
         # ── Trampa 2: Mercado en noticias / spike ─────────────────────────────
-        if df_m1 is not None and len(df_m1) >= 5:
-            ranges = [float(r["high"]) - float(r["low"])
-                      for _, r in df_m1.tail(5).iterrows()]
+        if m1 is not None and len(m1) >= 5:
+            ranges = m1.tail(5).range
             avg_range = np.mean(ranges[:-1])  # promedio sin la última
-            last_range = ranges[-1]
+            last_range = float(ranges[-1])
             if last_range > avg_range * 2.5:
                 evidence.append(Evidence(
                     "spike_detected", 0.10, False, 0.80,
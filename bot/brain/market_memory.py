@@ -2,13 +2,17 @@
 Market Memory — Memoria persistente del mercado
 Registra zonas donde el precio ha reaccionado, cuántas veces y con qué fuerza.
 Cada vez que el precio toca una zona y reacciona (o rompe), se actualiza el registro.
+Persiste en el BrainStore (SQLite): cada save() escribe solo las zonas que cambiaron.
 """
-import json
+import bisect
 import os
+import threading
 import time
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict, field
 
+from brain.brain_store import BrainStore, get_brain_store
+
 
 @dataclass
 class Zone:
@@ -54,68 +58,81 @@ class Zone:
 
 
 class MarketMemory:
-    def __init__(self, persist_path: str = "brain/learning_state.json"):
+    def __init__(self, persist_path: str = "brain/learning_state.json",
+                 store: Optional[BrainStore] = None):
+        # persist_path: JSON heredado que se importa una vez al store
         self.persist_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), "..", persist_path
         )
-        os.makedirs(os.path.dirname(self.persist_path), exist_ok=True)
+        self.store = store or get_brain_store()
+        # Zonas por activo ordenadas por level (+ espejo de levels para bisect)
         self.zones: Dict[str, List[Zone]] = {}
+        self._levels: Dict[str, List[float]] = {}
+        # Caché por activo: zonas por fuerza desc. y sus claves -strength;
+        # se invalida solo cuando una zona del activo cambia
+        self._by_strength: Dict[str, Tuple[List[Zone], List[float]]] = {}
         self.trade_history: List[dict] = []
+        # Cambios pendientes de persistir: zonas tocadas y levels purgados
+        self._dirty: Dict[int, Zone] = {}
+        self._removed: Dict[str, List[float]] = {}
+        # El escaneo multi-activo escribe zonas desde varios hilos a la vez
+        self._lock = threading.RLock()
         self._load()
 
     # ── Persistencia ──────────────────────────────────────────────────────────
 
     def _load(self):
-        if not os.path.exists(self.persist_path):
-            return
         try:
-            with open(self.persist_path, "r") as f:
-                data = json.load(f)
-            for asset, zone_list in data.get("zones", {}).items():
-                self.zones[asset] = []
-                for zd in zone_list:
-                    z = Zone(**{k: v for k, v in zd.items() if k in Zone.__dataclass_fields__})
-                    self.zones[asset].append(z)
-            self.trade_history = data.get("trade_history", [])
+            self.store.import_learning_state(self.persist_path)
+            for asset, zone_list in self.store.load_zones().items():
+                self.zones[asset] = [
+                    Zone(**{k: v for k, v in zd.items() if k in Zone.__dataclass_fields__})
+                    for zd in zone_list
+                ]
+                self._reindex(asset)
+            self.trade_history = self.store.recent_trades(200)
         except Exception:
             pass
 
     def save(self):
+        """Persiste en una transacción solo las zonas modificadas o purgadas."""
         try:
-            data = {
-                "version": "4.0",
-                "updated": time.time(),
-                "zones": {
-                    asset: [asdict(z) for z in zones]
-                    for asset, zones in self.zones.items()
-                },
-                "trade_history": self.trade_history[-200:],
-            }
-            with open(self.persist_path, "w") as f:
-                json.dump(data, f, indent=2)
+            with self._lock:
+                dirty = [asdict(z) for z in self._dirty.values()]
+                removed = {a: levels for a, levels in self._removed.items() if levels}
+                with self.store.transaction():
+                    for asset, levels in removed.items():
+                        self.store.delete_zones(asset, levels)
+                    self.store.upsert_zones(dirty)
+                self._dirty.clear()
+                self._removed.clear()
         except Exception:
             pass
 
     # ── Gestión de zonas ──────────────────────────────────────────────────────
 
     def add_or_update_zone(self, asset: str, level: float, zone_type: str,
-                            reacted: bool, reaction_pips: float = 0.0):
+                            reacted: bool, reaction_pips: float = 0.0) -> Zone:
         """Registra que el precio tocó un nivel. reacted=True si aguantó (hold), False si rompió."""
-        if asset not in self.zones:
-            self.zones[asset] = []
-
-        existing = self._find_nearby_zone(asset, level, tolerance_pct=0.0015)
-        if existing:
-            existing.touches += 1
-            existing.last_touch_ts = time.time()
-            if reacted:
-                existing.holds += 1
-            else:
-                existing.breaks += 1
-            if reaction_pips > 0:
-                existing.avg_reaction_pips = (existing.avg_reaction_pips * 0.7 + reaction_pips * 0.3)
-            existing.recalculate_strength()
-        else:
+        with self._lock:
+            if asset not in self.zones:
+                self._reindex(asset)
+
+            existing = self._find_nearby_zone(asset, level, tolerance_pct=0.0015)
+            if existing:
+                existing.touches += 1
+                existing.last_touch_ts = time.time()
+                if reacted:
+                    existing.holds += 1
+                else:
+                    existing.breaks += 1
+                if reaction_pips > 0:
+                    existing.avg_reaction_pips = (existing.avg_reaction_pips * 0.7 + reaction_pips * 0.3)
+                existing.recalculate_strength()
+                self._by_strength.pop(asset, None)
+                self._dirty[id(existing)] = existing
+                return existing
+
             z = Zone(
                 level=level,
                 asset=asset,
@@ -128,36 +145,43 @@ class MarketMemory:
                 avg_reaction_pips=reaction_pips,
             )
             z.recalculate_strength()
-            self.zones[asset].append(z)
+            i = bisect.bisect_right(self._levels[asset], level)
+            self.zones[asset].insert(i, z)
+            self._levels[asset].insert(i, level)
+            self._by_strength.pop(asset, None)
+            self._dirty[id(z)] = z
+            return z
 
     def bulk_add_zones(self, asset: str, detected_zones: List[dict]):
         """Recibe zonas detectadas desde el historial de velas y las integra sin duplicar."""
-        for zd in detected_zones:
-            self.add_or_update_zone(
-                asset=asset,
-                level=zd["level"],
-                zone_type=zd.get("type", "both"),
-                reacted=True,
-                reaction_pips=zd.get("avg_reaction_pips", 5.0),
-            )
-            # Actualizar touches con el conteo histórico
-            existing = self._find_nearby_zone(asset, zd["level"])
-            if existing:
-                existing.touches = max(existing.touches, zd.get("touches", 1))
-                existing.holds = max(existing.holds, zd.get("holds", 0))
-                existing.recalculate_strength()
+        with self._lock:
+            for zd in detected_zones:
+                zone = self.add_or_update_zone(
+                    asset=asset,
+                    level=zd["level"],
+                    zone_type=zd.get("type", "both"),
+                    reacted=True,
+                    reaction_pips=zd.get("avg_reaction_pips", 5.0),
+                )
+                # Actualizar touches con el conteo histórico
+                zone.touches = max(zone.touches, zd.get("touches", 1))
+                zone.holds = max(zone.holds, zd.get("holds", 0))
+                zone.recalculate_strength()
+            self._by_strength.pop(asset, None)
 
     def get_zones_near_price(self, asset: str, price: float,
                               tolerance_pct: float = 0.002,
                               min_strength: float = 0.35) -> List[Zone]:
         """Devuelve zonas activas cercanas al precio actual, ordenadas por fuerza."""
-        if asset not in self.zones:
+        if price <= 0:
             return []
-        nearby = []
-        for z in self.zones[asset]:
-            distance_pct = abs(z.level - price) / price
-            if distance_pct <= tolerance_pct and z.strength >= min_strength:
-                nearby.append((distance_pct, z))
+        with self._lock:
+            band = price * tolerance_pct
+            nearby = []
+            for z in self._in_range(asset, price - band, price + band):
+                distance_pct = abs(z.level - price) / price
+                if distance_pct <= tolerance_pct and z.strength >= min_strength:
+                    nearby.append((distance_pct, z))
         nearby.sort(key=lambda x: (x[0], -x[1].strength))
         return [z for _, z in nearby]
 
@@ -170,40 +194,83 @@ class MarketMemory:
         return max(candidates, key=lambda z: z.strength)
 
     def get_all_zones(self, asset: str, min_strength: float = 0.3) -> List[Zone]:
-        return sorted(
-            [z for z in self.zones.get(asset, []) if z.strength >= min_strength],
-            key=lambda z: z.strength,
-            reverse=True,
-        )
+        with self._lock:
+            ranked, keys = self._strength_index(asset)
+            return ranked[:bisect.bisect_right(keys, -min_strength)]
 
     def purge_weak_zones(self, asset: str, min_strength: float = 0.2):
-        if asset in self.zones:
-            self.zones[asset] = [z for z in self.zones[asset] if z.strength >= min_strength]
+        with self._lock:
+            if asset in self.zones:
+                weak = [z for z in self.zones[asset] if z.strength < min_strength]
+                if not weak:
+                    return
+                for z in weak:
+                    self._dirty.pop(id(z), None)
+                self._removed.setdefault(asset, []).extend(z.level for z in weak)
+                self.zones[asset] = [z for z in self.zones[asset] if z.strength >= min_strength]
+                self._reindex(asset)
 
     # ── Historial de trades ───────────────────────────────────────────────────
 
     def record_trade_result(self, trade: dict):
-        self.trade_history.append(trade)
-        self.save()
+        with self._lock:
+            self.trade_history.append(trade)
+            self.trade_history = self.trade_history[-200:]
+            with self.store.transaction():
+                self.store.append_trade(trade)
+                self.save()
 
     def get_recent_trades(self, n: int = 50) -> List[dict]:
         return self.trade_history[-n:]
 
     # ── Utilidades ────────────────────────────────────────────────────────────
 
+    def _reindex(self, asset: str):
+        """Reordena las zonas del activo por level y descarta la caché de fuerza."""
+        zones = sorted(self.zones.get(asset, []), key=lambda z: z.level)
+        self.zones[asset] = zones
+        self._levels[asset] = [z.level for z in zones]
+        self._by_strength.pop(asset, None)
+
+    def _in_range(self, asset: str, low: float, high: float) -> List[Zone]:
+        levels = self._levels.get(asset)
+        if not levels:
+            return []
+        i = bisect.bisect_left(levels, low)
+        j = bisect.bisect_right(levels, high)
+        return self.zones[asset][i:j]
+
+    def _strength_index(self, asset: str) -> Tuple[List[Zone], List[float]]:
+        cached = self._by_strength.get(asset)
+        if cached is None:
+            ranked = sorted(self.zones.get(asset, []), key=lambda z: z.strength, reverse=True)
+            cached = (ranked, [-z.strength for z in ranked])
+            self._by_strength[asset] = cached
+        return cached
+
     def _find_nearby_zone(self, asset: str, level: float,
                            tolerance_pct: float = 0.0015) -> Optional[Zone]:
-        for z in self.zones.get(asset, []):
-            if abs(z.level - level) / max(level, 0.0001) <= tolerance_pct:
-                return z
-        return None
+        band = max(level, 0.0001) * tolerance_pct
+        candidates = self._in_range(asset, level - band, level + band)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda z: abs(z.level - level))
 
-    def get_zone_context(self, asset: str, price: float) -> dict:
+    def get_zone_context(self, asset: str, price: float, min_strength: float = 0.3) -> dict:
         """Resumen del contexto de zonas para el precio actual."""
-        above = [z for z in self.get_all_zones(asset) if z.level > price]
-        below = [z for z in self.get_all_zones(asset) if z.level <= price]
-        nearest_above = min(above, key=lambda z: z.level - price) if above else None
-        nearest_below = max(below, key=lambda z: price - z.level) if below else None
+        with self._lock:
+            zones = self.zones.get(asset, [])
+            split = bisect.bisect_right(self._levels.get(asset, []), price)
+            # Primera zona fuerte hacia arriba (level > price) y hacia abajo (level <= price)
+            up, down = split, split - 1
+            while up < len(zones) and zones[up].strength < min_strength:
+                up += 1
+            while down >= 0 and zones[down].strength < min_strength:
+                down -= 1
+            nearest_above = zones[up] if up < len(zones) else None
+            nearest_below = zones[down] if down >= 0 else None
+            _, keys = self._strength_index(asset)
+            zone_count = bisect.bisect_right(keys, -min_strength)
 
         dist_above = (nearest_above.level - price) / price if nearest_above else 1.0
         dist_below = (price - nearest_below.level) / price if nearest_below else 1.0
@@ -221,7 +288,7 @@ class MarketMemory:
             "dist_to_support_pct": dist_below,
             "dist_to_resistance_pct": dist_above,
             "bias": bias,
-            "zone_count": len(self.get_all_zones(asset)),
+            "zone_count": zone_count,
         }
 
 
@@ -84,13 +84,22 @@ class MarketSession:
         },
     }
 
+    def __init__(self, clock=None):
+        # None = reloj real; el replay offline inyecta un reloj simulado
+        self.clock = clock
+
+    def _now_utc(self) -> datetime:
+        if self.clock is None:
+            return datetime.now(timezone.utc)
+        return datetime.fromtimestamp(self.clock(), timezone.utc)
+
     def get_current_session(self) -> Tuple[str, Dict]:
         """
         Detecta la sesión actual basada en UTC.
         Retorna (session_name, params).
         El bot SIEMPRE opera — solo cambia los parámetros.
         """
-        now_utc = datetime.now(timezone.utc)
+        now_utc = self._now_utc()
         hour = now_utc.hour + now_utc.minute / 60.0
 
         # Overlap Londres-NY es el mejor momento
@@ -157,7 +166,7 @@ class MarketSession:
     def get_status_display(self) -> str:
         """Para mostrar en el dashboard"""
         session_name, params = self.get_current_session()
-        now_utc = datetime.now(timezone.utc)
+        now_utc = self._now_utc()
         quality = self.get_session_quality()
         quality_bar = "█" * int(quality * 5) + "░" * (5 - int(quality * 5))
         freq = params.get("trade_freq", "MEDIUM")
@@ -3,12 +3,16 @@ OPENCODE AI CLIENT — Motor de Razonamiento Principal
 Conecta al servidor EasyPanel compatible con OpenAI API
 Endpoint: https://tecnovariedades-provedor-ia.er7iaf.easypanel.host/v1
 """
+import hashlib
 import json
 import os
+import threading
 import time
 import requests
 import re
-from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
 
 
 # ─── Configuración del Servidor (lee del entorno, con fallback local) ──────────
@@ -29,6 +33,12 @@ OPENCODE_MODEL_DEEP = os.environ.get(
     "opencode/qwen3.6-plus-free"
 )
 TIMEOUT_SECONDS     = 40   # El servidor puede tardar hasta 35s en responder
+# Espera máxima del camino señal→orden; pasado esto se usa el veredicto local y
+# la respuesta, cuando llegue, queda en caché para la próxima vela
+LATENCY_BUDGET_SECONDS = float(os.environ.get("OPENCODE_LATENCY_BUDGET", "6"))
+CACHE_TTL_SECONDS   = 120  # Dos velas M1: el mismo contexto no vuelve a preguntarse
+CACHE_MAX_ENTRIES   = 256
+RSI_BUCKET          = 5    # Resolución del RSI en la huella del contexto
 
 SYSTEM_PROMPT_TRADER = """Eres un trader profesional con 10 años de experiencia en opciones binarias OTC.
 Tu rol es analizar señales de trading y proporcionar veredictos precisos en formato JSON.
@@ -43,21 +53,42 @@ class OpenCodeAIClient:
     Provee razonamiento IA profundo para el bot de trading.
     """
 
-    def __init__(self):
-        self.base_url   = OPENCODE_BASE_URL
-        self.api_key    = OPENCODE_API_KEY
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 latency_budget: float = LATENCY_BUDGET_SECONDS,
+                 cache_ttl: float = CACHE_TTL_SECONDS):
+        # base_url/api_key permiten apuntar a un servidor stub local en pruebas
+        self.base_url   = (base_url or OPENCODE_BASE_URL).rstrip("/")
+        self.api_key    = api_key or OPENCODE_API_KEY
         self.model_fast = OPENCODE_MODEL_FAST
         self.model_deep = OPENCODE_MODEL_DEEP
         self.headers    = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type":  "application/json",
         }
+        self.latency_budget = latency_budget
+        self.cache_ttl      = cache_ttl
         self.calls_made    = 0
         self.calls_failed  = 0
         self.calls_saved   = 0
+        self.cache_hits    = 0
+        self.deduped       = 0
+        self.budget_fallbacks = 0
         self.avg_resp_time = 0.0
         self._resp_times   = []
 
+        # Sesión con keep-alive: reutiliza conexiones TCP/TLS entre llamadas
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Caché TTL de respuestas y llamadas en vuelo (misma clave → un solo POST)
+        self._cache: Dict[str, Tuple[float, Dict]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="opencode")
+
         print("[OK] OpenCode AI Client inicializado")
         print(f"    Endpoint: {self.base_url}")
         print(f"    Modelo rapido: {self.model_fast}")
@@ -69,7 +100,8 @@ class OpenCodeAIClient:
         self,
         market_context: Dict,
         current_analysis: Dict,
-        deep: bool = False
+        deep: bool = False,
+        budget: Optional[float] = None
     ) -> Optional[Dict]:
         """
         Analiza una oportunidad de trade usando IA.
@@ -78,9 +110,11 @@ class OpenCodeAIClient:
             market_context:    Datos del mercado (activo, precio, RSI, patrón, etc.)
             current_analysis:  Análisis previo del sistema local
             deep:              Si True, usa el modelo de razonamiento profundo
+            budget:            Segundos máximos de espera (por defecto latency_budget)
 
         Returns:
             Dict con {direction, confidence, decision, reasoning} o None si falla
+            o si la respuesta no llega dentro del presupuesto
         """
         model = self.model_deep if deep else self.model_fast
 
@@ -136,7 +170,9 @@ RESPONDE SOLO CON ESTE JSON (sin ningún otro texto):
                 {"role": "system", "content": SYSTEM_PROMPT_TRADER},
                 {"role": "user",   "content": prompt}
             ],
-            tag = f"TRADE-{asset}"
+            tag = f"TRADE-{asset}",
+            cache_key = self._context_key(market_context, current_analysis, model),
+            budget = self.latency_budget if budget is None else budget,
         )
 
     def learn_from_result(
@@ -248,13 +284,94 @@ RESPONDE SOLO CON ESTE JSON:
 
     # ── Interno ────────────────────────────────────────────────────────────────
 
-    def _call(self, model: str, messages: List[Dict], tag: str = "") -> Optional[Dict]:
+    @staticmethod
+    def _context_key(market_context: Dict, current_analysis: Dict, model: str) -> str:
+        """Huella normalizada del contexto: activo, zona, RSI redondeado, tendencia y patrón."""
+        try:
+            rsi = int(round(float(market_context.get("rsi", 50)) / RSI_BUCKET)) * RSI_BUCKET
+        except (TypeError, ValueError):
+            rsi = 50
+        parts = (
+            model,
+            market_context.get("asset", "UNKNOWN"),
+            market_context.get("zone_type", "unknown"),
+            rsi,
+            market_context.get("trend", "NEUTRAL"),
+            market_context.get("pattern", "none"),
+            current_analysis.get("direction", "NEUTRAL"),
+        )
+        return "|".join(str(p) for p in parts)
+
+    def _call(self, model: str, messages: List[Dict], tag: str = "",
+              cache_key: Optional[str] = None,
+              budget: Optional[float] = None) -> Optional[Dict]:
+        """
+        Llamada con caché TTL y deduplicación: peticiones con la misma clave
+        (huella del contexto, o hash del prompt si no se da) comparten un solo
+        POST. Con `budget` se espera como máximo esos segundos; la llamada sigue
+        en segundo plano y su resultado queda en caché.
+        """
+        if cache_key is None:
+            cache_key = hashlib.sha1(
+                json.dumps([model, messages], sort_keys=True).encode("utf-8")
+            ).hexdigest()
+
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None and time.time() - cached[0] <= self.cache_ttl:
+                self.cache_hits += 1
+                self.calls_saved += 1
+                return dict(cached[1])
+            future = self._inflight.get(cache_key)
+            if future is not None:
+                self.deduped += 1
+            else:
+                future = self._pool.submit(self._request, model, messages, tag, cache_key)
+                self._inflight[cache_key] = future
+
+        try:
+            result = future.result(timeout=budget)
+        except FutureTimeout:
+            self.budget_fallbacks += 1
+            try:
+                print(f"[!] OpenCode AI [{tag}] sin respuesta en {budget:.1f}s — veredicto local")
+            except Exception:
+                pass
+            return None
+        except Exception:
+            return None
+        return dict(result) if result is not None else None
+
+    def _request(self, model: str, messages: List[Dict], tag: str,
+                 cache_key: str) -> Optional[Dict]:
+        """Ejecuta el POST en el pool y publica el resultado en la caché."""
+        try:
+            result = self._post(model, messages, tag)
+            with self._lock:
+                if result is not None:
+                    self._cache[cache_key] = (time.time(), result)
+                    self._evict_cache()
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+
+    def _evict_cache(self) -> None:
+        """Descarta entradas vencidas y, si sigue llena, las más antiguas."""
+        if len(self._cache) <= CACHE_MAX_ENTRIES:
+            return
+        now = time.time()
+        for key in [k for k, (ts, _) in self._cache.items() if now - ts > self.cache_ttl]:
+            del self._cache[key]
+        while len(self._cache) > CACHE_MAX_ENTRIES:
+            del self._cache[min(self._cache, key=lambda k: self._cache[k][0])]
+
+    def _post(self, model: str, messages: List[Dict], tag: str = "") -> Optional[Dict]:
         """Realiza la llamada al endpoint OpenAI-compatible y parsea el JSON."""
         t0 = time.time()
         try:
-            resp = requests.post(
+            resp = self.session.post(
                 f"{self.base_url}/chat/completions",
-                headers=self.headers,
                 json={
                     "model":       model,
                     "messages":    messages,
@@ -335,10 +452,11 @@ RESPONDE SOLO CON ESTE JSON:
         return None
 
     def _track_time(self, elapsed: float) -> None:
-        self._resp_times.append(elapsed)
-        if len(self._resp_times) > 20:
-            self._resp_times.pop(0)
-        self.avg_resp_time = sum(self._resp_times) / len(self._resp_times)
+        with self._lock:
+            self._resp_times.append(elapsed)
+            if len(self._resp_times) > 20:
+                self._resp_times.pop(0)
+            self.avg_resp_time = sum(self._resp_times) / len(self._resp_times)
 
     def get_stats(self) -> Dict:
         total = self.calls_made + self.calls_failed
@@ -347,6 +465,9 @@ RESPONDE SOLO CON ESTE JSON:
             "calls_failed":  self.calls_failed,
             "success_rate":  f"{(self.calls_made / total * 100) if total > 0 else 0:.1f}%",
             "avg_resp_time": f"{self.avg_resp_time:.1f}s",
+            "cache_hits":    self.cache_hits,
+            "deduped":       self.deduped,
+            "budget_fallbacks": self.budget_fallbacks,
             "model_fast":    self.model_fast,
             "model_deep":    self.model_deep,
         }
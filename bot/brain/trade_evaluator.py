@@ -5,6 +5,8 @@ import time
 from typing import Dict, Optional, List
 import pandas as pd
 
+from brain.bar_view import Bars, bars_to_target
+
 
 class TradeEvaluator:
     """
@@ -160,28 +162,10 @@ class TradeEvaluator:
         Detecta si el precio eventualmente llegó al objetivo DESPUÉS de la expiración.
         Si es así, la entrada era correcta en dirección pero prematura en timing.
         """
-        # ¿Llegó al objetivo durante la expiración?
-        within_exp = df_after.head(exp_minutes)
-        reached_during = False
-        for _, row in within_exp.iterrows():
-            if direction == "CALL" and float(row.get("high", 0)) > entry_price * 1.0003:
-                reached_during = True; break
-            if direction == "PUT" and float(row.get("low", 9999)) < entry_price * 0.9997:
-                reached_during = True; break
-
-        if reached_during:
-            return False  # llegó a tiempo, no fue prematura
-
-        # ¿Llegó después de la expiración?
-        after_exp = df_after.iloc[exp_minutes:]
-        if len(after_exp) == 0:
-            return False
-        for _, row in after_exp.iterrows():
-            if direction == "CALL" and float(row.get("high", 0)) > entry_price * 1.0003:
-                return True   # llegó después → entrada prematura
-            if direction == "PUT" and float(row.get("low", 9999)) < entry_price * 0.9997:
-                return True
-        return False
+        # Primera vela que alcanzó el objetivo: dentro de la expiración = a tiempo,
+        # después = entrada prematura
+        reached = bars_to_target(Bars.from_df(df_after), entry_price, direction)
+        return reached is not None and reached > exp_minutes
 
     def format_for_display(self, diag: Dict) -> List[str]:
         lines = []
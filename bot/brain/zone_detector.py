@@ -4,6 +4,7 @@ Analiza el gráfico completo para encontrar niveles donde el precio reaccionó m
 """
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import List, Dict, Tuple
 
 
@@ -19,7 +20,6 @@ class ZoneDetector:
         if len(df) < 20:
             return []
 
-        df = df.copy()
         pivots = self._find_pivots(df)
         highs = [p for p in pivots if p["type"] == "high"]
         lows = [p for p in pivots if p["type"] == "low"]
@@ -32,9 +32,10 @@ class ZoneDetector:
         current_price = float(df["close"].iloc[-1])
         price_range = float(df["high"].max() - df["low"].min())
 
-        for z in all_zones:
-            z["avg_reaction_pips"] = self._estimate_reaction_pips(df, z["level"], z["type"])
-            z["holds"], z["breaks"] = self._count_holds_breaks(df, z["level"], z["type"])
+        reaction_pips, holds, breaks = self._reaction_stats(df, all_zones)
+        for k, z in enumerate(all_zones):
+            z["avg_reaction_pips"] = reaction_pips[k]
+            z["holds"], z["breaks"] = holds[k], breaks[k]
             touches = z["holds"] + z["breaks"]
             z["touches"] = max(touches, z.get("raw_touches", 1))
             z["hold_rate"] = z["holds"] / z["touches"] if z["touches"] > 0 else 0.5
@@ -53,7 +54,11 @@ class ZoneDetector:
         zones_m5 = self.detect_from_candles(df_m5)
         zones_m15 = self.detect_from_candles(df_m15)
         zones_h1 = self.detect_from_candles(df_h1) if df_h1 is not None and len(df_h1) >= 10 else []
+        return self.merge_multi_tf(zones_m5, zones_m15, zones_h1)
 
+    def merge_multi_tf(self, zones_m5: List[Dict], zones_m15: List[Dict],
+                       zones_h1: List[Dict]) -> List[Dict]:
+        """Fusiona zonas de M5/M15/H1 (modifica los dicts recibidos)."""
         combined = []
         for z in zones_h1:
             z["tf_score"] = 3.0
@@ -92,26 +97,27 @@ class ZoneDetector:
 
     def _find_pivots(self, df: pd.DataFrame, left: int = 3, right: int = 3) -> List[Dict]:
         """Encuentra pivot highs y lows en el dataframe."""
-        pivots = []
         highs = df["high"].values
         lows = df["low"].values
-        closes = df["close"].values
         n = len(df)
+        if n < left + right + 1:
+            return []
 
-        for i in range(left, n - right):
-            # Pivot high
-            is_high = all(highs[i] >= highs[i - j] for j in range(1, left + 1)) and \
-                      all(highs[i] >= highs[i + j] for j in range(1, right + 1))
-            if is_high:
+        # Pivot = extremo de su ventana [i-left, i+right] (empates incluidos)
+        center = slice(left, n - right)
+        is_high = highs[center] >= sliding_window_view(highs, left + right + 1).max(axis=1)
+        is_low = lows[center] <= sliding_window_view(lows, left + right + 1).min(axis=1)
+
+        pivots = []
+        for k in np.flatnonzero(is_high | is_low):
+            i = int(k) + left
+            if is_high[k]:
                 pivots.append({
                     "type": "high",
                     "level": float(highs[i]),
                     "idx": i,
                 })
-            # Pivot low
-            is_low = all(lows[i] <= lows[i - j] for j in range(1, left + 1)) and \
-                     all(lows[i] <= lows[i + j] for j in range(1, right + 1))
-            if is_low:
+            if is_low[k]:
                 pivots.append({
                     "type": "low",
                     "level": float(lows[i]),
@@ -160,59 +166,51 @@ class ZoneDetector:
 
     # ── Análisis de reacciones históricas ─────────────────────────────────────
 
-    def _estimate_reaction_pips(self, df: pd.DataFrame, level: float, zone_type: str) -> float:
-        """Cuántos pips en promedio rebota el precio desde esta zona."""
-        reactions = []
-        tol = level * self.cluster_tol * 2
-        highs = df["high"].values
-        lows = df["low"].values
-        closes = df["close"].values
-        n = len(df)
+    def _reaction_stats(self, df: pd.DataFrame,
+                        zones: List[Dict]) -> Tuple[List[float], List[int], List[int]]:
+        """
+        Para todas las zonas a la vez (máscara zona × vela) devuelve:
+        - pips promedio que rebota el precio desde la zona (5.0 si no hay rebotes)
+        - cuántas veces el precio aguantó (hold) y cuántas rompió (break) la zona
 
-        for i in range(1, n - 3):
-            if zone_type == "support":
-                if abs(lows[i] - level) <= tol:
-                    max_after = max(highs[i:i + 5]) if i + 5 < n else highs[i]
-                    reaction = (max_after - lows[i]) / level * 10000
-                    if reaction > 0:
-                        reactions.append(reaction)
-            else:
-                if abs(highs[i] - level) <= tol:
-                    min_after = min(lows[i:i + 5]) if i + 5 < n else lows[i]
-                    reaction = (highs[i] - min_after) / level * 10000
-                    if reaction > 0:
-                        reactions.append(reaction)
-
-        return float(np.mean(reactions)) if reactions else 5.0
-
-    def _count_holds_breaks(self, df: pd.DataFrame, level: float,
-                             zone_type: str) -> Tuple[int, int]:
-        """Cuenta cuántas veces el precio aguantó (hold) y cuántas rompió (break) la zona."""
-        holds = 0
-        breaks = 0
-        tol = level * self.cluster_tol * 2
-        highs = df["high"].values
-        lows = df["low"].values
-        closes = df["close"].values
+        Toque en la vela i (1 <= i < n-3): low (soporte) o high (resistencia) a
+        menos de 2x cluster_tol del nivel. La reacción se mide contra el extremo
+        de las 5 velas siguientes y el hold/break contra el cierre 2 velas después.
+        """
+        if not zones:
+            return [], [], []
+        highs = df["high"].values.astype(float)
+        lows = df["low"].values.astype(float)
+        closes = df["close"].values.astype(float)
         n = len(df)
-
-        for i in range(1, n - 3):
-            if zone_type == "support":
-                if abs(lows[i] - level) <= tol:
-                    close_after = closes[i + 2] if i + 2 < n else closes[i]
-                    if close_after > level:
-                        holds += 1
-                    else:
-                        breaks += 1
-            else:
-                if abs(highs[i] - level) <= tol:
-                    close_after = closes[i + 2] if i + 2 < n else closes[i]
-                    if close_after < level:
-                        holds += 1
-                    else:
-                        breaks += 1
-
-        return holds, breaks
+        if n < 5:
+            return [5.0] * len(zones), [0] * len(zones), [0] * len(zones)
+
+        # Extremos de highs[i:i+5] / lows[i:i+5]; cerca del final, la propia vela
+        fwd_max, fwd_min = highs.copy(), lows.copy()
+        fwd_max[:n - 5] = sliding_window_view(highs, 5).max(axis=1)[:n - 5]
+        fwd_min[:n - 5] = sliding_window_view(lows, 5).min(axis=1)[:n - 5]
+
+        bars = slice(1, n - 3)
+        levels = np.array([z["level"] for z in zones], dtype=float)[:, None]
+        support = np.array([z["type"] == "support" for z in zones])[:, None]
+        tol = levels * self.cluster_tol * 2
+
+        touch_px = np.where(support, lows[bars], highs[bars])
+        touched = np.abs(touch_px - levels) <= tol
+
+        reaction = np.where(support, fwd_max[bars] - lows[bars],
+                            highs[bars] - fwd_min[bars]) / levels * 10000
+        rebounds = touched & (reaction > 0)
+
+        close_after = closes[3:n - 1]
+        held = np.where(support, close_after > levels, close_after < levels)
+        holds = (touched & held).sum(axis=1)
+        breaks = touched.sum(axis=1) - holds
+
+        reaction_pips = [float(np.mean(reaction[k, rebounds[k]])) if rebounds[k].any() else 5.0
+                         for k in range(len(zones))]
+        return reaction_pips, holds.tolist(), breaks.tolist()
 
     def _zone_strength(self, z: Dict) -> float:
         touch_score = min(z["touches"] / 5.0, 1.0)
@@ -10,12 +10,15 @@ Para cada toque registra:
 - ¿Cuál era la sesión de mercado?
 - ¿Era primera visita o revisita?
 """
-import json
 import os
+import threading
 import time
+from collections import OrderedDict
 from typing import Dict, List, Optional
 from dataclasses import dataclass, asdict, field
 
+from brain.brain_store import BrainStore, get_brain_store
+
 
 @dataclass
 class ZoneTouchEvent:
@@ -40,7 +43,7 @@ class ZoneProfile:
     asset: str
     level: float
     zone_type: str               # support, resistance
-    touch_events: List[dict] = field(default_factory=list)
+    touch_events: List[dict] = field(default_factory=list)   # solo los más recientes
 
     # Estadísticas calculadas
     total_touches: int = 0
@@ -64,62 +67,60 @@ class ZoneProfile:
     last_touch_ts: float = 0.0
     last_result: str = "UNKNOWN"
 
+    # Acumuladores para actualizar en O(1): sumas de pips/velas en holds y
+    # conteos (total, holds) por grupo first_visit/revisit/with_pattern/without_pattern
+    tallies: Dict = field(default_factory=dict)
+
+    RECENT_EVENTS = 20
+
     def add_touch(self, event: ZoneTouchEvent):
-        """Registra un nuevo toque y recalcula estadísticas"""
+        """Registra un nuevo toque y actualiza las estadísticas de forma incremental"""
         self.touch_events.append(asdict(event))
+        del self.touch_events[:-self.RECENT_EVENTS]
         self.last_touch_ts = event.timestamp
         self.last_result = event.result
-        self._recalculate_stats()
-
-    def _recalculate_stats(self):
-        """Recalcula todas las estadísticas desde los eventos"""
-        if not self.touch_events:
-            return
-
-        events = self.touch_events
-        self.total_touches = len(events)
-        holds = [e for e in events if e["result"] == "HOLD"]
-        breaks = [e for e in events if e["result"] == "BREAK"]
-        self.successful_holds = len(holds)
-        self.breaks = len(breaks)
-
-        if holds:
-            self.avg_pips_on_hold = sum(e["pips_moved"] for e in holds) / len(holds)
-            self.avg_candles_to_move = sum(e["candles_to_move"] for e in holds) / len(holds)
+        self._accumulate(self.touch_events[-1])
+
+    def _accumulate(self, e: dict):
+        t = self.tallies
+        hold = e["result"] == "HOLD"
+        self.total_touches += 1
+        if hold:
+            self.successful_holds += 1
+            t["hold_pips"] = t.get("hold_pips", 0.0) + e["pips_moved"]
+            t["hold_candles"] = t.get("hold_candles", 0.0) + e["candles_to_move"]
+            self.avg_pips_on_hold = t["hold_pips"] / self.successful_holds
+            self.avg_candles_to_move = t["hold_candles"] / self.successful_holds
+        elif e["result"] == "BREAK":
+            self.breaks += 1
 
         # Estadísticas por sesión
+        sess = self.session_stats.setdefault(e.get("session", "UNKNOWN"),
+                                             {"holds": 0, "breaks": 0, "total": 0})
+        sess["total"] += 1
+        if hold:
+            sess["holds"] += 1
+        elif e["result"] == "BREAK":
+            sess["breaks"] += 1
+
+        # Primera visita vs revisita / con patrón vs sin patrón
+        visit = "first_visit" if e.get("was_first_visit", True) else "revisit"
+        pattern = "with_pattern" if e.get("had_pattern", False) else "without_pattern"
+        for group in (visit, pattern):
+            total, holds = t.get(group, (0, 0))
+            total, holds = total + 1, holds + int(hold)
+            t[group] = (total, holds)
+            setattr(self, f"{group}_hold_rate", holds / total)
+
+    def rebuild_from_events(self):
+        """Reconstruye los acumuladores desde touch_events (perfiles importados del JSON)."""
+        events = self.touch_events
+        self.total_touches = self.successful_holds = self.breaks = 0
         self.session_stats = {}
+        self.tallies = {}
         for e in events:
-            sess = e.get("session", "UNKNOWN")
-            if sess not in self.session_stats:
-                self.session_stats[sess] = {"holds": 0, "breaks": 0, "total": 0}
-            self.session_stats[sess]["total"] += 1
-            if e["result"] == "HOLD":
-                self.session_stats[sess]["holds"] += 1
-            elif e["result"] == "BREAK":
-                self.session_stats[sess]["breaks"] += 1
-
-        # Primera visita vs revisita
-        first_visits = [e for e in events if e.get("was_first_visit", True)]
-        revisits = [e for e in events if not e.get("was_first_visit", True)]
-
-        if first_visits:
-            fv_holds = sum(1 for e in first_visits if e["result"] == "HOLD")
-            self.first_visit_hold_rate = fv_holds / len(first_visits)
-        if revisits:
-            rv_holds = sum(1 for e in revisits if e["result"] == "HOLD")
-            self.revisit_hold_rate = rv_holds / len(revisits)
-
-        # Con patrón vs sin patrón
-        with_pat = [e for e in events if e.get("had_pattern", False)]
-        without_pat = [e for e in events if not e.get("had_pattern", False)]
-
-        if with_pat:
-            wp_holds = sum(1 for e in with_pat if e["result"] == "HOLD")
-            self.with_pattern_hold_rate = wp_holds / len(with_pat)
-        if without_pat:
-            wop_holds = sum(1 for e in without_pat if e["result"] == "HOLD")
-            self.without_pattern_hold_rate = wop_holds / len(without_pat)
+            self._accumulate(e)
+        self.touch_events = events[-self.RECENT_EVENTS:]
 
     def get_hold_rate(self) -> float:
         if self.total_touches == 0:
@@ -189,28 +190,72 @@ class ZoneProfile:
 class ZoneReactionHistory:
     """
     Gestiona el historial de reacciones de todas las zonas.
-    Persiste en JSON junto con el estado de aprendizaje.
+    Persiste en el BrainStore: cada toque agrega una fila al log de eventos
+    (append-only) y actualiza solo el perfil de su zona. Los perfiles se leen
+    bajo demanda por su clave indexada y se mantienen en una caché LRU, así
+    que el arranque no carga el historial completo.
     """
 
-    def __init__(self, persist_path: str = "brain/zone_reactions.json"):
+    CACHE_SIZE = 512
+    COMPACT_EVERY = 200          # toques entre compactaciones del log
+    KEEP_EVENTS = 100            # eventos por zona que sobreviven a la compactación
+
+    def __init__(self, persist_path: str = "brain/zone_reactions.json",
+                 store: Optional[BrainStore] = None):
+        # persist_path: JSON heredado que se importa una vez al store
         self.persist_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), "..", persist_path
         )
-        self.profiles: Dict[str, Dict[str, ZoneProfile]] = {}
-        # key: "ASSET_level" -> ZoneProfile
+        self.store = store or get_brain_store()
+        # key: "ASSET_level" -> ZoneProfile (caché LRU de lo leído del store)
+        self.profiles: "OrderedDict[str, ZoneProfile]" = OrderedDict()
+        self._missing = set()            # claves sin historial ya consultadas
+        self._lock = threading.RLock()
+        self._touches_since_compact = 0
+        self._compactor: Optional[threading.Thread] = None
         self._load()
 
     def _zone_key(self, asset: str, level: float) -> str:
         return f"{asset}_{level:.5f}"
 
+    def _profile(self, key: str) -> Optional[ZoneProfile]:
+        """Perfil desde la caché o, si falta, desde el índice del store."""
+        with self._lock:
+            profile = self.profiles.get(key)
+            if profile is not None:
+                self.profiles.move_to_end(key)
+                return profile
+            if key in self._missing:
+                return None
+            try:
+                d = self.store.load_zone_profile(key, events=ZoneProfile.RECENT_EVENTS)
+            except Exception:
+                d = None
+            if d is None:
+                if len(self._missing) > 4 * self.CACHE_SIZE:
+                    self._missing.clear()
+                self._missing.add(key)
+                return None
+            profile = self._build_profile(key, d)
+            self._cache(key, profile)
+            return profile
+
+    def _cache(self, key: str, profile: ZoneProfile):
+        self.profiles[key] = profile
+        self.profiles.move_to_end(key)
+        self._missing.discard(key)
+        while len(self.profiles) > self.CACHE_SIZE:
+            self.profiles.popitem(last=False)
+
     def get_or_create_profile(self, asset: str, level: float,
                                zone_type: str) -> ZoneProfile:
         key = self._zone_key(asset, level)
-        if key not in self.profiles:
-            self.profiles[key] = ZoneProfile(
-                asset=asset, level=level, zone_type=zone_type
-            )
-        return self.profiles[key]
+        with self._lock:
+            profile = self._profile(key)
+            if profile is None:
+                profile = ZoneProfile(asset=asset, level=level, zone_type=zone_type)
+                self._cache(key, profile)
+            return profile
 
     def record_touch(self, asset: str, level: float, zone_type: str,
                       result: str, pips_moved: float, candles_to_move: int,
@@ -218,27 +263,28 @@ class ZoneReactionHistory:
                       session: str, rsi: float, trend_aligned: bool,
                       price_at_touch: float):
         """Registra un toque de zona con resultado conocido"""
-        profile = self.get_or_create_profile(asset, level, zone_type)
-
-        # Detectar si es primera visita (no tocada en últimas 3 velas M5)
-        was_first = not profile.was_recently_touched(within_candles_m5=3)
-
-        event = ZoneTouchEvent(
-            timestamp=time.time(),
-            price_at_touch=price_at_touch,
-            direction_expected="CALL" if zone_type == "support" else "PUT",
-            result=result,
-            pips_moved=pips_moved,
-            candles_to_move=candles_to_move,
-            had_pattern=had_pattern,
-            pattern_name=pattern_name,
-            session=session,
-            was_first_visit=was_first,
-            rsi_at_touch=rsi,
-            trend_aligned=trend_aligned,
-        )
-        profile.add_touch(event)
-        self._save()
+        with self._lock:
+            profile = self.get_or_create_profile(asset, level, zone_type)
+
+            # Detectar si es primera visita (no tocada en últimas 3 velas M5)
+            was_first = not profile.was_recently_touched(within_candles_m5=3)
+
+            event = ZoneTouchEvent(
+                timestamp=time.time(),
+                price_at_touch=price_at_touch,
+                direction_expected="CALL" if zone_type == "support" else "PUT",
+                result=result,
+                pips_moved=pips_moved,
+                candles_to_move=candles_to_move,
+                had_pattern=had_pattern,
+                pattern_name=pattern_name,
+                session=session,
+                was_first_visit=was_first,
+                rsi_at_touch=rsi,
+                trend_aligned=trend_aligned,
+            )
+            profile.add_touch(event)
+            self._save(self._zone_key(asset, level), profile)
 
     def get_zone_analysis(self, asset: str, level: float,
                            zone_type: str, session: str = None) -> Dict:
@@ -246,8 +292,8 @@ class ZoneReactionHistory:
         Obtiene el análisis histórico de una zona.
         Si no hay historial, retorna valores conservadores.
         """
-        key = self._zone_key(asset, level)
-        if key not in self.profiles:
+        profile = self._profile(self._zone_key(asset, level))
+        if profile is None:
             return {
                 "hold_rate": 0.5,
                 "recent_hold_rate": 0.5,
@@ -264,78 +310,104 @@ class ZoneReactionHistory:
                 "last_broke": False,
                 "no_history": True,
             }
-        profile = self.profiles[key]
         return profile.get_analysis_summary(session)
 
     def is_first_visit(self, asset: str, level: float, zone_type: str) -> bool:
         """¿Es la primera visita a esta zona en las últimas 15 minutos?"""
-        key = self._zone_key(asset, level)
-        if key not in self.profiles:
+        profile = self._profile(self._zone_key(asset, level))
+        if profile is None:
             return True
-        return not self.profiles[key].was_recently_touched(within_candles_m5=3)
+        return not profile.was_recently_touched(within_candles_m5=3)
 
     def get_optimal_expiration(self, asset: str, level: float,
                                 zone_type: str, pips_per_minute: float) -> int:
         """Expiración óptima basada en historial de esta zona específica"""
-        key = self._zone_key(asset, level)
-        if key not in self.profiles:
+        profile = self._profile(self._zone_key(asset, level))
+        if profile is None:
             return 120  # 2 minutos por defecto
-        return self.profiles[key].get_optimal_expiration(pips_per_minute)
+        return profile.get_optimal_expiration(pips_per_minute)
+
+    # ── Persistencia ──────────────────────────────────────────────────────────
 
-    def _save(self):
+    def _save(self, key: str, profile: ZoneProfile):
+        """Agrega el último evento al log y actualiza solo el perfil de la zona."""
         try:
-            os.makedirs(os.path.dirname(self.persist_path), exist_ok=True)
-            data = {}
-            for key, profile in self.profiles.items():
-                data[key] = {
-                    "asset": profile.asset,
-                    "level": profile.level,
-                    "zone_type": profile.zone_type,
-                    "touch_events": profile.touch_events[-100:],  # últimos 100
-                    "total_touches": profile.total_touches,
-                    "successful_holds": profile.successful_holds,
-                    "breaks": profile.breaks,
-                    "avg_pips_on_hold": profile.avg_pips_on_hold,
-                    "avg_candles_to_move": profile.avg_candles_to_move,
-                    "session_stats": profile.session_stats,
-                    "first_visit_hold_rate": profile.first_visit_hold_rate,
-                    "revisit_hold_rate": profile.revisit_hold_rate,
-                    "with_pattern_hold_rate": profile.with_pattern_hold_rate,
-                    "without_pattern_hold_rate": profile.without_pattern_hold_rate,
-                    "last_touch_ts": profile.last_touch_ts,
-                    "last_result": profile.last_result,
-                }
-            with open(self.persist_path, "w") as f:
-                json.dump(data, f, indent=2)
+            with self.store.transaction():
+                self.store.append_touch(key, profile.touch_events[-1])
+                self._save_profile(key, profile)
         except Exception:
-            pass
+            return
+        self._touches_since_compact += 1
+        if self._touches_since_compact >= self.COMPACT_EVERY:
+            self._touches_since_compact = 0
+            self._compact_in_background()
+
+    def _save_profile(self, key: str, profile: ZoneProfile):
+        self.store.upsert_zone_profile(key, profile.asset, profile.level, profile.zone_type, {
+            "total_touches": profile.total_touches,
+            "successful_holds": profile.successful_holds,
+            "breaks": profile.breaks,
+            "avg_pips_on_hold": profile.avg_pips_on_hold,
+            "avg_candles_to_move": profile.avg_candles_to_move,
+            "session_stats": profile.session_stats,
+            "first_visit_hold_rate": profile.first_visit_hold_rate,
+            "revisit_hold_rate": profile.revisit_hold_rate,
+            "with_pattern_hold_rate": profile.with_pattern_hold_rate,
+            "without_pattern_hold_rate": profile.without_pattern_hold_rate,
+            "last_touch_ts": profile.last_touch_ts,
+            "last_result": profile.last_result,
+            "tallies": profile.tallies,
+        })
+
+    def _compact_in_background(self):
+        """Recorta el log a los últimos KEEP_EVENTS por zona sin bloquear el trade."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+
+        def compact():
+            try:
+                self.store.compact_touch_events(self.KEEP_EVENTS)
+            except Exception:
+                pass
+
+        self._compactor = threading.Thread(target=compact, name="zone-log-compact", daemon=True)
+        self._compactor.start()
+
+    def _build_profile(self, key: str, d: dict) -> ZoneProfile:
+        profile = ZoneProfile(
+            asset=d["asset"],
+            level=d["level"],
+            zone_type=d["zone_type"],
+            touch_events=d.get("touch_events", []),
+            total_touches=d.get("total_touches", 0),
+            successful_holds=d.get("successful_holds", 0),
+            breaks=d.get("breaks", 0),
+            avg_pips_on_hold=d.get("avg_pips_on_hold", 0.0),
+            avg_candles_to_move=d.get("avg_candles_to_move", 0.0),
+            session_stats=d.get("session_stats", {}),
+            first_visit_hold_rate=d.get("first_visit_hold_rate", 0.0),
+            revisit_hold_rate=d.get("revisit_hold_rate", 0.0),
+            with_pattern_hold_rate=d.get("with_pattern_hold_rate", 0.0),
+            without_pattern_hold_rate=d.get("without_pattern_hold_rate", 0.0),
+            last_touch_ts=d.get("last_touch_ts", 0.0),
+            last_result=d.get("last_result", "UNKNOWN"),
+            tallies=d.get("tallies", {}),
+        )
+        if not profile.tallies and profile.total_touches:
+            # Perfil importado del JSON sin acumuladores: reconstruir una vez
+            # desde los eventos guardados, como hacía el recálculo completo
+            profile.touch_events = self.store.load_zone_profile(key, events=self.KEEP_EVENTS)["touch_events"]
+            profile.rebuild_from_events()
+            try:
+                with self.store.transaction():
+                    self._save_profile(key, profile)
+            except Exception:
+                pass
+        return profile
 
     def _load(self):
-        if not os.path.exists(self.persist_path):
-            return
         try:
-            with open(self.persist_path, "r") as f:
-                data = json.load(f)
-            for key, d in data.items():
-                profile = ZoneProfile(
-                    asset=d["asset"],
-                    level=d["level"],
-                    zone_type=d["zone_type"],
-                    touch_events=d.get("touch_events", []),
-                    total_touches=d.get("total_touches", 0),
-                    successful_holds=d.get("successful_holds", 0),
-                    breaks=d.get("breaks", 0),
-                    avg_pips_on_hold=d.get("avg_pips_on_hold", 0.0),
-                    avg_candles_to_move=d.get("avg_candles_to_move", 0.0),
-                    session_stats=d.get("session_stats", {}),
-                    first_visit_hold_rate=d.get("first_visit_hold_rate", 0.0),
-                    revisit_hold_rate=d.get("revisit_hold_rate", 0.0),
-                    with_pattern_hold_rate=d.get("with_pattern_hold_rate", 0.0),
-                    without_pattern_hold_rate=d.get("without_pattern_hold_rate", 0.0),
-                    last_touch_ts=d.get("last_touch_ts", 0.0),
-                    last_result=d.get("last_result", "UNKNOWN"),
-                )
-                self.profiles[key] = profile
+            self.store.import_zone_reactions(self.persist_path)
         except Exception:
             pass
 
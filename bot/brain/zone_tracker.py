@@ -0,0 +1,221 @@
+"""
+Zone Tracker — Mantenimiento incremental de zonas, vela cerrada a vela cerrada
+En lugar de re-detectar todas las zonas sobre la ventana completa cada 5 minutos,
+cada vela cerrada nueva:
+- confirma el pivot de hace `right` velas cuando su ventana derecha se completa
+- registra toques solo en las zonas dentro de tolerancia (bisect sobre niveles)
+- resuelve hold/break (cierre 2 velas después) y pips de reacción (5 velas)
+- descarta zonas sin actividad durante `max_idle_bars`
+
+Las zonas salen en el mismo formato que ZoneDetector.detect_multi_tf.
+"""
+import bisect
+from collections import deque
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from brain.zone_detector import ZoneDetector
+
+
+class TimeframeZones:
+    """Zonas de un activo en un timeframe."""
+
+    def __init__(self, detector: ZoneDetector, left: int = 3, right: int = 3,
+                 max_idle_bars: int = 500):
+        self.detector = detector
+        self.left = left
+        self.right = right
+        self.max_idle_bars = max_idle_bars
+        self.zones: Dict[str, List[dict]] = {"support": [], "resistance": []}
+        self._levels: Dict[str, List[float]] = {"support": [], "resistance": []}
+        # Últimas velas cerradas (n, high, low, close): ventana de pivot y de reacción
+        self._bars = deque(maxlen=max(left + right + 1, 5))
+        self._pending: List[tuple] = []       # (zona, n del toque)
+        self._n = -1                          # índice de la última vela cerrada
+        self._last_ts = None
+        self.last_close = 0.0
+
+    def update(self, df: pd.DataFrame) -> bool:
+        """Procesa las velas cerradas nuevas de `df` (la última está en formación)."""
+        if df is None or len(df) < 2:
+            return False
+        closed = df.iloc[:-1]
+        if self._last_ts is not None:
+            closed = closed[closed.index > self._last_ts]
+        if closed.empty:
+            return False
+        changed = False
+        for high, low, close in zip(closed["high"].to_numpy(dtype=float),
+                                    closed["low"].to_numpy(dtype=float),
+                                    closed["close"].to_numpy(dtype=float)):
+            changed |= self._on_bar(high, low, close)
+        self._last_ts = closed.index[-1]
+        return changed
+
+    def _on_bar(self, high: float, low: float, close: float) -> bool:
+        self._n += 1
+        n = self._n
+        self._bars.append((n, high, low, close))
+        self.last_close = close
+        changed = self._resolve_pending()
+
+        # Toques de la vela nueva: solo zonas a menos de 2x cluster_tol
+        for zone_type, px in (("support", low), ("resistance", high)):
+            for z in self._near(zone_type, px):
+                self._pending.append((z, n))
+                z["last_bar"] = n
+
+        # Pivot de hace `right` velas, ya con su ventana derecha completa
+        width = self.left + self.right + 1
+        if len(self._bars) >= width:
+            window = list(self._bars)[-width:]
+            _, c_high, c_low, _ = window[self.left]
+            if c_high >= max(b[1] for b in window):
+                self._add_pivot("resistance", c_high)
+                changed = True
+            if c_low <= min(b[2] for b in window):
+                self._add_pivot("support", c_low)
+                changed = True
+
+        return self._decay() or changed
+
+    def _near(self, zone_type: str, px: float) -> List[dict]:
+        levels = self._levels[zone_type]
+        if not levels:
+            return []
+        # Tolerancia relativa al nivel: acotar con el mayor nivel posible
+        band = px * self.detector.cluster_tol * 2 / (1 - self.detector.cluster_tol * 2)
+        i = bisect.bisect_left(levels, px - band)
+        j = bisect.bisect_right(levels, px + band)
+        zones = self.zones[zone_type]
+        return [z for z in zones[i:j]
+                if abs(px - z["level"]) <= z["level"] * self.detector.cluster_tol * 2]
+
+    def _resolve_pending(self) -> bool:
+        """Hold/break con el cierre 2 velas después; reacción con el extremo de 5 velas."""
+        if not self._pending:
+            return False
+        bars = {b[0]: b for b in self._bars}
+        keep, changed = [], False
+        for z, n in self._pending:
+            if self._n < n + 4:
+                keep.append((z, n))
+                if self._n == n + 2:
+                    close_after = bars[n + 2][3]
+                    held = close_after > z["level"] if z["type"] == "support" else close_after < z["level"]
+                    z["holds" if held else "breaks"] += 1
+                    changed = True
+                continue
+            window = [bars[k] for k in range(n, n + 5)]
+            if z["type"] == "support":
+                reaction = (max(b[1] for b in window) - window[0][2]) / z["level"] * 10000
+            else:
+                reaction = (window[0][1] - min(b[2] for b in window)) / z["level"] * 10000
+            if reaction > 0:
+                z["reaction_sum"] += reaction
+                z["reaction_n"] += 1
+                changed = True
+        self._pending = keep
+        return changed
+
+    def _add_pivot(self, zone_type: str, level: float):
+        tol = self.detector.cluster_tol
+        zones, levels = self.zones[zone_type], self._levels[zone_type]
+        i = bisect.bisect_left(levels, level)
+        best = None
+        for z in zones[max(0, i - 1):i + 1]:
+            if abs(level - z["level"]) / max(z["level"], 0.0001) <= tol and \
+                    (best is None or abs(level - z["level"]) < abs(level - best["level"])):
+                best = z
+        if best is not None:
+            best["pivot_sum"] += level
+            best["raw_touches"] += 1
+            best["level"] = best["pivot_sum"] / best["raw_touches"]
+            best["last_bar"] = self._n
+            zones.sort(key=lambda z: z["level"])
+        else:
+            zones.insert(i, {
+                "level": level, "type": zone_type, "pivot_sum": level, "raw_touches": 1,
+                "holds": 0, "breaks": 0, "reaction_sum": 0.0, "reaction_n": 0,
+                "last_bar": self._n,
+            })
+        self._levels[zone_type] = [z["level"] for z in zones]
+
+    def _decay(self) -> bool:
+        """Quita zonas sin pivots ni toques en las últimas `max_idle_bars` velas."""
+        if self._n % 16:
+            return False
+        removed = False
+        for zone_type, zones in self.zones.items():
+            alive = [z for z in zones if self._n - z["last_bar"] <= self.max_idle_bars]
+            if len(alive) != len(zones):
+                removed = True
+                self.zones[zone_type] = alive
+                self._levels[zone_type] = [z["level"] for z in alive]
+                alive_ids = {id(z) for z in alive}
+                self._pending = [(z, n) for z, n in self._pending
+                                 if z["type"] != zone_type or id(z) in alive_ids]
+        return removed
+
+    def snapshot(self) -> List[Dict]:
+        """Zonas actuales en el formato de ZoneDetector.detect_from_candles."""
+        price = self.last_close
+        out = []
+        for z in self.zones["resistance"] + self.zones["support"]:
+            touches = max(z["holds"] + z["breaks"], z["raw_touches"])
+            zone = {
+                "level": float(z["level"]),
+                "type": z["type"],
+                "raw_touches": z["raw_touches"],
+                "touches": touches,
+                "holds": z["holds"],
+                "breaks": z["breaks"],
+                "hold_rate": z["holds"] / touches if touches > 0 else 0.5,
+                "strength": 0.5,
+                "avg_reaction_pips": z["reaction_sum"] / z["reaction_n"] if z["reaction_n"] else 5.0,
+                "distance_pct": abs(z["level"] - price) / price if price > 0 else 1.0,
+                "multi_tf": False,
+                "tf_score": 1.0,
+            }
+            zone["strength"] = self.detector._zone_strength(zone)
+            if zone["strength"] >= 0.25:
+                out.append(zone)
+        out.sort(key=lambda z: z["strength"], reverse=True)
+        return out
+
+
+class ZoneTracker:
+    """
+    Zonas multi-timeframe de un activo. update() devuelve solo las zonas
+    fusionadas cuyo nivel o contadores cambiaron desde la última llamada.
+    """
+
+    TIMEFRAMES = (300, 900, 3600)
+
+    def __init__(self, detector: Optional[ZoneDetector] = None):
+        self.detector = detector or ZoneDetector()
+        self.frames = {tf: TimeframeZones(self.detector) for tf in self.TIMEFRAMES}
+        self._emitted: Dict[tuple, tuple] = {}
+
+    def update(self, frames: Dict[int, Optional[pd.DataFrame]]) -> List[Dict]:
+        changed = False
+        for tf, tracker in self.frames.items():
+            changed |= tracker.update(frames.get(tf))
+        if not changed:
+            return []
+
+        merged = self.detector.merge_multi_tf(
+            self.frames[300].snapshot(),
+            self.frames[900].snapshot(),
+            self.frames[3600].snapshot(),
+        )
+        emitted, out = {}, []
+        for z in merged:
+            key = (z["type"], round(z["level"], 6))
+            signature = (z["touches"], z["holds"], z["breaks"], round(z["avg_reaction_pips"], 3))
+            if self._emitted.get(key) != signature:
+                out.append(z)
+            emitted[key] = signature
+        self._emitted = emitted
+        return out
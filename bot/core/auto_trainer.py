@@ -1,7 +1,5 @@
 import pandas as pd
-from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv
-from trading_gym.trading_env import BinaryOptionsEnv
+from core.background_retrainer import BackgroundRetrainer
 from strategies.technical import FeatureEngineer
 from config import Config
 import os
@@ -11,9 +9,13 @@ class AutoTrainer:
         self.market_data = market_data
         self.feature_engineer = feature_engineer
         self.model_path = Config.MODEL_PATH
+        self.retrainer = BackgroundRetrainer(self.model_path)
 
-    def train_on_recent_data(self, asset, num_candles=1000):
-        """Descarga datos recientes y re-entrena el modelo."""
+    def train_on_recent_data(self, asset, num_candles=1000, on_done=None):
+        """
+        Descarga datos recientes y lanza el re-entrenamiento en segundo plano.
+        on_done(model) se llama con el modelo nuevo cuando ya está guardado.
+        """
         print(f"🔄 Iniciando Auto-Entrenamiento para {asset}...")
         
         # 1. Obtener datos recientes
@@ -28,26 +30,10 @@ class AutoTrainer:
             print("❌ Datos insuficientes después del procesamiento.")
             return False
 
-        # 3. Crear entorno temporal
-        env = DummyVecEnv([lambda: BinaryOptionsEnv(df)])
-
-        # 4. Cargar o Crear Modelo
-        try:
-            if os.path.exists(self.model_path + ".zip"):
-                model = PPO.load(self.model_path, env=env)
-                print("Modelo existente cargado. Refinando...")
-            else:
-                model = PPO("MlpPolicy", env, verbose=0)
-                print("Creando nuevo modelo...")
-            
-            # 5. Entrenar (pocos pasos para adaptación rápida)
-            model.learn(total_timesteps=2000)
-            
-            # 6. Guardar
-            model.save(self.model_path)
-            print("✅ Auto-Entrenamiento completado y modelo guardado.")
-            return True
-
-        except Exception as e:
-            print(f"❌ Error durante el entrenamiento: {e}")
+        # 3. Entrenar en segundo plano (VecEnv vectorizado) y publicar el modelo atómicamente
+        if not self.retrainer.submit(df, timesteps=2000, on_done=on_done):
+            print("⚠️ Ya hay un auto-entrenamiento en curso.")
             return False
+
+        print("🎓 Auto-Entrenamiento lanzado en segundo plano.")
+        return True
@@ -0,0 +1,95 @@
+"""
+Background Retrainer - Re-entrenamiento PPO fuera del hilo de trading
+El hilo que opera solo prepara los datos y lanza el trabajo; el entrenamiento
+corre en un hilo aparte sobre el VecEnv vectorizado (o SubprocVecEnv) y el
+modelo nuevo se publica con un reemplazo atómico del archivo .zip, así que
+nadie llega a leer un modelo a medio escribir. on_done recibe el modelo para
+cambiarlo en memoria.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+from stable_baselines3 import PPO
+
+from core.trading_env import make_vec_env
+
+
+def save_model_atomic(model, path: str) -> None:
+    """Guarda `model` en `path`.zip escribiendo antes a un temporal."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    model.save(tmp)                          # stable-baselines3 añade .zip
+    os.replace(tmp + ".zip", path + ".zip")
+
+
+class BackgroundRetrainer:
+    """Un trabajo de re-entrenamiento a la vez, en segundo plano."""
+
+    def __init__(self, model_path: str, n_envs: int = None, use_subprocess: bool = None,
+                 policy: str = "MlpPolicy"):
+        self.model_path = model_path
+        self.n_envs = n_envs or int(os.getenv("RL_TRAIN_ENVS", "8"))
+        if use_subprocess is None:
+            use_subprocess = os.getenv("RL_TRAIN_SUBPROC", "0").lower() in ("1", "true", "yes")
+        self.use_subprocess = use_subprocess
+        self.policy = policy
+        self.last_result: Optional[Dict] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, data: pd.DataFrame, timesteps: int,
+               on_done: Optional[Callable] = None) -> bool:
+        """Lanza el re-entrenamiento; False si ya hay uno en curso."""
+        with self._lock:
+            if self.busy:
+                return False
+            self._thread = threading.Thread(target=self._run, args=(data, timesteps, on_done),
+                                            name="rl-retrain", daemon=True)
+            self._thread.start()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera al trabajo en curso; True si ya no hay ninguno."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.busy
+
+    def _run(self, data: pd.DataFrame, timesteps: int, on_done: Optional[Callable]):
+        start = time.time()
+        env = None
+        try:
+            env = make_vec_env(data, n_envs=self.n_envs, use_subprocess=self.use_subprocess)
+            model = self._load_or_create(env)
+            model.learn(total_timesteps=timesteps)
+            save_model_atomic(model, self.model_path)
+            elapsed = time.time() - start
+            self.last_result = {"ok": True, "timesteps": timesteps, "seconds": elapsed}
+            print(f"✅ Re-entrenamiento en segundo plano completado en {elapsed:.1f}s ({self.n_envs} entornos)")
+            if on_done is not None:
+                on_done(model)
+        except Exception as e:
+            self.last_result = {"ok": False, "error": str(e), "seconds": time.time() - start}
+            print(f"❌ Error en re-entrenamiento en segundo plano: {e}")
+        finally:
+            if env is not None:
+                env.close()
+
+    def _load_or_create(self, env):
+        # Rollouts de ~2048 pasos en total, repartidos entre los entornos
+        n_steps = max(64, 2048 // self.n_envs)
+        if os.path.exists(self.model_path + ".zip"):
+            try:
+                return PPO.load(self.model_path, env=env, n_steps=n_steps)
+            except Exception as e:
+                # Nunca reemplazar un modelo existente con uno recién creado
+                raise RuntimeError(f"no se pudo cargar {self.model_path}.zip ({e}); "
+                                   f"re-entrenamiento cancelado, el modelo actual se conserva") from e
+        return PPO(self.policy, env, n_steps=n_steps, verbose=0)
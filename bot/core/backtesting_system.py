@@ -4,7 +4,7 @@ Permite validar estrategias sin riesgo con datos histricos y en tiempo real
 """
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
@@ -110,23 +110,32 @@ class BacktestingSystem:
             'default_expiration': 300,  # 5 minutos
             'min_score_to_trade': 65,
             'position_size_pct': 0.02,  # 2% por operacin
+            'score_window': 200,  # velas por llamada a score() sin score_frame()
         }
+        self.verbose = True
 
     def run_backtest(
         self,
         df: pd.DataFrame,
         scoring_engine,
         asset: str = "EUR/USD",
-        initial_balance: Optional[float] = None
+        initial_balance: Optional[float] = None,
+        verbose: bool = True
     ) -> BacktestStats:
         """
         Ejecutar backtest con datos histricos
 
+        Los indicadores se calculan una sola vez sobre toda la serie. Si el motor
+        expone score_frame() todas las velas se puntuan de forma vectorizada;
+        si no, cada vela se puntua con una ventana fija (sin copiar el prefijo).
+        Los trades se liquidan contra los arrays de velas futuras.
+
         Args:
             df: DataFrame con velas histricas (debe tener columnas: timestamp, open, high, low, close)
             scoring_engine: Motor de scoring para generar seales
             asset: Nombre del activo
             initial_balance: Balance inicial (opcional)
+            verbose: Imprimir cada operacion
 
         Returns:
             BacktestStats con estadsticas completas
@@ -136,46 +145,161 @@ class BacktestingSystem:
             self.current_balance = initial_balance
             self.peak_balance = initial_balance
 
+        self.verbose = verbose
         self.trades = []
         self.pending_trades = []
+        df = self._prepare_frame(df)
         self.balance_history = [(df.iloc[0]['timestamp'], self.initial_balance)]
 
-        print(f" Ejecutando backtest en {asset}...")
-        print(f"  Datos: {len(df)} velas")
-        print(f"  Periodo: {df['timestamp'].min()} a {df['timestamp'].max()}")
-        print(f"  Balance inicial: ${self.initial_balance:.2f}")
-
-        # Iterar sobre velas (dejando suficientes para calcular indicadores)
-        for i in range(50, len(df) - 1):
-            # Verificar trades pendientes
-            self._check_pending_trades(df.iloc[i])
-
-            if not self.pending_trades:  # Solo operar si no hay trades pendientes
-                # Generar seal
-                signal = self._generate_signal(
-                    df.iloc[:i+1].copy(),
-                    scoring_engine,
-                    asset
-                )
-
-                if signal and signal.get('should_trade'):
-                    self._execute_backtest_trade(
-                        signal=signal,
-                        entry_time=df.iloc[i]['timestamp'],
-                        entry_price=df.iloc[i]['close'],
-                        asset=asset
-                    )
-
-        # Esperar a que cierren todos los trades pendientes
-        if self.pending_trades:
-            last_row = df.iloc[-1]
-            self._check_pending_trades(last_row, force_close=True)
+        if verbose:
+            print(f" Ejecutando backtest en {asset}...")
+            print(f"  Datos: {len(df)} velas")
+            print(f"  Periodo: {df['timestamp'].min()} a {df['timestamp'].max()}")
+            print(f"  Balance inicial: ${self.initial_balance:.2f}")
+
+        times = pd.to_datetime(df['timestamp']).to_numpy()
+        expiry = np.timedelta64(int(self.config['default_expiration']), 's')
+        last_bar = len(df) - 2  # ultima vela en la que se abre operacion
+        next_signal = self._signal_source(df, scoring_engine, asset, last_bar)
+
+        # Una operacion a la vez: la siguiente entrada es la primera senal
+        # desde la vela en la que venci la anterior
+        entries, exits, signals = [], [], []
+        i = 50
+        while i <= last_bar:
+            i, signal = next_signal(i)
+            if signal is None:
+                break
+            j = int(np.searchsorted(times, times[i] + expiry, side='left'))
+            j = max(j, i + 1)
+            if j > last_bar:
+                j = len(df) - 1  # cierre forzado en la ultima vela
+            entries.append(i)
+            exits.append(j)
+            signals.append(signal)
+            i = j
+
+        self._settle_backtest_trades(df, entries, exits, signals, asset)
 
         # Calcular estadsticas finales
         self._calculate_stats()
 
         return self.stats
 
+    def _prepare_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calcular una sola vez los indicadores que falten (RSI 14, MACD 12/26/9)"""
+        if 'rsi' in df.columns and 'macd' in df.columns and 'macd_signal' in df.columns:
+            return df
+        df = df.copy()
+        if 'rsi' not in df.columns:
+            delta = df['close'].diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+            rs = gain / loss
+            df['rsi'] = 100 - (100 / (1 + rs))
+        if 'macd' not in df.columns or 'macd_signal' not in df.columns:
+            exp1 = df['close'].ewm(span=12, adjust=False).mean()
+            exp2 = df['close'].ewm(span=26, adjust=False).mean()
+            df['macd'] = exp1 - exp2
+            df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+        return df
+
+    def _signal_source(self, df: pd.DataFrame, scoring_engine, asset: str, last_bar: int):
+        """Devuelve next_signal(i) -> (indice, senal) de la primera senal en [i, last_bar]"""
+        if hasattr(scoring_engine, 'score_frame'):
+            scores = scoring_engine.score_frame(df)
+            tradeable = ((scores['recommendation'] == "TRADE")
+                         & (scores['total_score'] >= self.config['min_score_to_trade'])).to_numpy()
+            candidates = np.flatnonzero(tradeable)
+
+            def next_signal(i):
+                pos = np.searchsorted(candidates, i)
+                if pos >= len(candidates) or candidates[pos] > last_bar:
+                    return last_bar + 1, None
+                k = int(candidates[pos])
+                row = scores.iloc[k]
+                reasons = []
+                if row['rsi'] < 30:
+                    reasons.append(f"RSI sobreventa ({row['rsi']:.1f})")
+                elif row['rsi'] > 70:
+                    reasons.append(f"RSI sobrecompra ({row['rsi']:.1f})")
+                return k, {
+                    'signal': row['signal'],
+                    'score': float(row['total_score']),
+                    'confidence': float(row['confidence']),
+                    'reasons': reasons,
+                }
+            return next_signal
+
+        window = self.config['score_window']
+
+        def next_signal(i):
+            for k in range(i, last_bar + 1):
+                signal = self._generate_signal(df.iloc[max(0, k - window + 1):k + 1], scoring_engine, asset)
+                if signal and signal.get('should_trade', True):
+                    return k, signal
+            return last_bar + 1, None
+        return next_signal
+
+    def _settle_backtest_trades(
+        self,
+        df: pd.DataFrame,
+        entries: List[int],
+        exits: List[int],
+        signals: List[Dict],
+        asset: str
+    ):
+        """Liquidar de una vez todas las operaciones contra sus velas de vencimiento"""
+        if not entries:
+            return
+
+        close = df['close'].to_numpy(dtype=float)
+        entry_idx = np.asarray(entries)
+        exit_idx = np.asarray(exits)
+        entry_px = close[entry_idx]
+        exit_px = close[exit_idx]
+        is_call = np.array([s['signal'] == "CALL" for s in signals])
+
+        price_change = np.where(is_call, exit_px - entry_px, entry_px - exit_px) / entry_px
+        outcome = np.select([price_change > 0.0001, price_change < -0.0001], [1, -1], 0)
+        returns = np.where(outcome == 1, self.payout_percent / 100, np.where(outcome == -1, -1.0, 0.0))
+
+        # Tamano de posicion = % del balance vigente -> balance compuesto
+        pct = self.config['position_size_pct']
+        balance_after = self.current_balance * np.cumprod(1 + pct * returns)
+        balance_before = np.concatenate(([self.current_balance], balance_after[:-1]))
+        amounts = balance_before * pct
+        pnls = amounts * returns
+
+        results = {1: TradeResult.WIN, -1: TradeResult.LOSS, 0: TradeResult.BREAKEVEN}
+        timestamps = df['timestamp']
+        for n, signal in enumerate(signals):
+            trade = BacktestTrade(
+                id=f"BT_{n + 1:04d}",
+                asset=asset,
+                direction="call" if is_call[n] else "put",
+                entry_time=timestamps.iloc[entry_idx[n]],
+                entry_price=float(entry_px[n]),
+                amount=float(amounts[n]),
+                expiration_seconds=self.config['default_expiration'],
+                exit_time=timestamps.iloc[exit_idx[n]],
+                exit_price=float(exit_px[n]),
+                result=results[int(outcome[n])],
+                pnl=float(pnls[n]),
+                score=signal['score'],
+                confidence=signal['confidence'],
+                reasons=signal.get('reasons', []),
+            )
+            self.trades.append(trade)
+            self.balance_history.append((trade.exit_time, float(balance_after[n])))
+
+            if self.verbose:
+                print(f"   {trade.entry_time}: {trade.direction.upper()} en {trade.entry_price:.5f} (${trade.amount:.2f})")
+                print(f"     {trade.id}: {trade.result.value} | PnL: ${trade.pnl:+.2f} | Balance: ${balance_after[n]:.2f}")
+
+        self.current_balance = float(balance_after[-1])
+        self.peak_balance = max(self.peak_balance, float(balance_after.max()))
+
     def _generate_signal(
         self,
         df: pd.DataFrame,
@@ -191,7 +315,7 @@ class BacktestingSystem:
                 asset=asset
             )
 
-            if result.recommendation == "TRADE" and result.confidence >= self.config['min_score_to_trade']:
+            if result.recommendation == "TRADE" and result.total_score >= self.config['min_score_to_trade']:
                 return {
                     'signal': result.signal_type.value,
                     'score': result.total_score,
@@ -204,88 +328,6 @@ class BacktestingSystem:
 
         return None
 
-    def _execute_backtest_trade(
-        self,
-        signal: Dict,
-        entry_time: datetime,
-        entry_price: float,
-        asset: str
-    ):
-        """Ejecutar operacin en backtest"""
-        # Calcular tamao de posicin
-        position_size = self.current_balance * self.config['position_size_pct']
-
-        # Crear trade
-        trade = BacktestTrade(
-            id=f"BT_{len(self.trades) + 1:04d}",
-            asset=asset,
-            direction="call" if signal['signal'] == "CALL" else "put",
-            entry_time=entry_time,
-            entry_price=entry_price,
-            amount=position_size,
-            expiration_seconds=self.config['default_expiration'],
-            score=signal['score'],
-            confidence=signal['confidence'],
-            reasons=signal.get('reasons', []),
-        )
-
-        self.pending_trades.append(trade)
-        print(f"   {entry_time}: {trade.direction.upper()} en {entry_price:.5f} (${position_size:.2f})")
-
-    def _check_pending_trades(
-        self,
-        current_candle: pd.Series,
-        force_close: bool = False
-    ):
-        """Verificar y cerrar trades pendientes"""
-        current_time = current_candle['timestamp']
-        current_price = current_candle['close']
-
-        trades_to_remove = []
-
-        for trade in self.pending_trades:
-            # Verificar si expir
-            expiry_time = trade.entry_time + timedelta(seconds=trade.expiration_seconds)
-
-            if current_time >= expiry_time or force_close:
-                # Calcular resultado
-                if trade.direction == "call":
-                    price_change = (current_price - trade.entry_price) / trade.entry_price
-                else:
-                    price_change = (trade.entry_price - current_price) / trade.entry_price
-
-                # Determinar resultado (umbral pequeo para breakeven)
-                if price_change > 0.0001:  # Gan
-                    trade.result = TradeResult.WIN
-                    trade.pnl = trade.amount * (self.payout_percent / 100)
-                elif price_change < -0.0001:  # Perdi
-                    trade.result = TradeResult.LOSS
-                    trade.pnl = -trade.amount
-                else:  # Breakeven
-                    trade.result = TradeResult.BREAKEVEN
-                    trade.pnl = 0.0
-
-                trade.exit_time = current_time
-                trade.exit_price = current_price
-
-                # Actualizar balance
-                self.current_balance += trade.pnl
-                self.balance_history.append((current_time, self.current_balance))
-
-                if self.current_balance > self.peak_balance:
-                    self.peak_balance = self.current_balance
-
-                trades_to_remove.append(trade)
-                self.trades.append(trade)
-
-                # Log
-                emoji = "" if trade.result == TradeResult.WIN else "" if trade.result == TradeResult.LOSS else ""
-                print(f"    {emoji} {trade.id}: {trade.result.value} | PnL: ${trade.pnl:+.2f} | Balance: ${self.current_balance:.2f}")
-
-        # Remover trades cerrados
-        for trade in trades_to_remove:
-            self.pending_trades.remove(trade)
-
     def _calculate_stats(self):
         """Calcular estadsticas completas"""
         if not self.trades:
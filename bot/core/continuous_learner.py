@@ -3,9 +3,7 @@ Continuous Learner - Aprende continuamente de operaciones reales
 """
 import numpy as np
 import pandas as pd
-from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv
-from trading_gym.trading_env import BinaryOptionsEnv
+from core.background_retrainer import BackgroundRetrainer
 from core.experience_buffer import ExperienceBuffer
 
 class ContinuousLearner:
@@ -18,6 +16,8 @@ class ContinuousLearner:
         self.feature_engineer = feature_engineer
         self.market_data = market_data
         self.experience_buffer = ExperienceBuffer()
+        # Re-entrenamiento PPO fuera del hilo de trading (VecEnv vectorizado)
+        self.retrainer = BackgroundRetrainer(getattr(agent, "model_path", "models/rl_agent"))
         
         # Configuración OPTIMIZADA para mayor rentabilidad
         self.min_experiences_to_train = 10  # Mínimo 10 experiencias
@@ -30,7 +30,7 @@ class ContinuousLearner:
         self.max_consecutive_losses = 3  # REDUCIDO: 3 pérdidas (antes 4)
         
         # Control de re-entrenamientos
-        self.last_retrain_count = len(self.experience_buffer.experiences)
+        self.last_retrain_count = len(self.experience_buffer)
         self.retraining_in_progress = False
         self.last_retrain_time = 0
         self.retrain_cooldown = 180  # Cooldown de 3 minutos después de re-entrenar
@@ -72,7 +72,7 @@ class ContinuousLearner:
         print(f"📝 Experiencia agregada: Action={action}, Reward=${profit:.2f}")
         
         # EVALUACIÓN CONTINUA cada N experiencias
-        total_exp = len(self.experience_buffer.experiences)
+        total_exp = len(self.experience_buffer)
         
         # Evitar re-entrenamientos si ya se hizo uno recientemente
         if self.retraining_in_progress:
@@ -132,7 +132,7 @@ class ContinuousLearner:
             evaluation = self.evaluate_performance()
             if not evaluation['should_retrain']:
                 print(f"\n✅ Rendimiento aceptable, no se necesita re-entrenamiento")
-                self.last_retrain_count = len(self.experience_buffer.experiences)
+                self.last_retrain_count = len(self.experience_buffer)
                 return True
 
             # Intentar re-entrenamiento inteligente basado en experiencias
@@ -143,7 +143,7 @@ class ContinuousLearner:
                 success = self._train_on_experiences(experiences)
                 if success:
                     print("✅ Re-entrenamiento con experiencias exitoso")
-                    self.last_retrain_count = len(self.experience_buffer.experiences)
+                    self.last_retrain_count = len(self.experience_buffer)
                     return True
 
             # Fallback: re-entrenar con datos frescos
@@ -151,7 +151,7 @@ class ContinuousLearner:
             result = self.retrain_with_fresh_data()
 
             # Actualizar contador de último re-entrenamiento
-            self.last_retrain_count = len(self.experience_buffer.experiences)
+            self.last_retrain_count = len(self.experience_buffer)
             
             # IMPORTANTE: Actualizar timestamp del último re-entrenamiento
             import time
@@ -195,42 +195,14 @@ class ContinuousLearner:
 
             print(f"✅ Indicadores calculados ({df_processed.shape[1]} features)")
             
-            # Crear entorno
-            env = DummyVecEnv([lambda: BinaryOptionsEnv(
-                data=df_processed,
-                feature_engineer=self.feature_engineer
-            )])
-            
-            # Re-entrenar con timeout de seguridad
-            print(f"🎓 Re-entrenando por {self.retrain_timesteps} pasos (con timeout)...")
-
-            # Actualizar entorno del agente
-            self.agent.env = env
-
-            # Timeout más corto para re-entrenamiento (2 minutos máximo)
-            timeout_seconds = 120
-
-            # Si el modelo existe, continuar entrenamiento
-            if self.agent.model is not None:
-                print("📦 Actualizando modelo existente...")
-                self.agent.model.set_env(env)
-                # Entrenar directamente
-                success = self.agent.train(timesteps=self.retrain_timesteps, timeout_seconds=timeout_seconds)
-            else:
-                print("📦 Creando nuevo modelo...")
-                # Crear nuevo modelo
-                success = self.agent.train(timesteps=self.retrain_timesteps, timeout_seconds=timeout_seconds)
-
-            if not success:
-                print("⚠️ Re-entrenamiento falló, pero continuando con modelo anterior...")
+            # Re-entrenar en segundo plano; el modelo nuevo se publica al terminar
+            print(f"🎓 Re-entrenando por {self.retrain_timesteps} pasos en segundo plano "
+                  f"({self.retrainer.n_envs} entornos)...")
+            if not self.retrainer.submit(df_processed, self.retrain_timesteps,
+                                         on_done=self._on_retrain_done):
+                print("⚠️ Ya hay un re-entrenamiento en segundo plano, continuando con modelo actual...")
                 return False
-            
-            # Guardar
-            print("💾 Guardando modelo...")
-            self.agent.save()
-            
-            print("✅ Re-entrenamiento completado exitosamente")
-            
+
             # Mostrar estadísticas de experiencias
             stats = self.experience_buffer.get_statistics()
             print(f"\n📊 Experiencias acumuladas:")
@@ -239,7 +211,7 @@ class ContinuousLearner:
             print(f"   Profit Total: ${stats['total_profit']:.2f}")
             
             # IMPORTANTE: Actualizar contador para evitar bucle
-            self.last_retrain_count = len(self.experience_buffer.experiences)
+            self.last_retrain_count = len(self.experience_buffer)
             
             # IMPORTANTE: Actualizar timestamp del último re-entrenamiento
             import time
@@ -256,6 +228,11 @@ class ContinuousLearner:
             traceback.print_exc()
             return False
     
+    def _on_retrain_done(self, model):
+        """Cambia el modelo en memoria del agente por el recién entrenado (ya guardado)."""
+        self.agent.model = model
+        print("✅ Modelo re-entrenado activo")
+
     def get_learning_stats(self):
         """Obtiene estadísticas del aprendizaje"""
         return self.experience_buffer.get_statistics()
@@ -1,25 +1,47 @@
 ﻿"""
 Ensemble ML Predictor - Sistema de Prediccin con Mltiples Modelos
 Combina Random Forest, XGBoost, y otros modelos para mayor precisin
+
+Entrenamiento: la matriz de features se cachea en disco por activo (y solo se
+calculan las velas nuevas), los modelos y sus folds temporales se ajustan en un
+pool de procesos, y warm_start amplia con las velas nuevas a los modelos que
+lo permiten (arboles adicionales en RF/GB/XGBoost, partial_fit en el MLP).
+
+Modo de inferencia en vivo (predict_batch / predict con asset): las features de
+la vela nueva se calculan desde un estado movil por activo (EMAs recursivas,
+ventanas cortas de cierres/rangos) en lugar de recalcular todo el DataFrame, y
+todos los activos del escaneo se evaluan en una sola matriz por modelo. Se mide
+la latencia de cada modelo y, con un presupuesto (ENSEMBLE_LATENCY_BUDGET_MS),
+se omiten los modelos mas lentos cuando no caben.
 """
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
 import json
 import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 import joblib
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, VotingClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC
 from sklearn.neural_network import MLPClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import cross_val_score
+from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.utils import Bunch
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 import warnings
 warnings.filterwarnings('ignore')
 
+from brain.indicator_service import get_indicator_service
+from core.latency_profiler import LatencyProfiler
+
 
 @dataclass
 class ModelPrediction:
@@ -39,6 +61,193 @@ class EnsemblePrediction:
     agreement_score: float  # Cuntos modelos coinciden (0-1)
     recommended_action: str  # "CALL", "PUT", "WAIT"
     expected_accuracy: float  # Accuracy esperada basada en validacin
+    latency_ms: Dict[str, float] = field(default_factory=dict)  # Latencia por modelo en este lote
+    dropped_models: List[str] = field(default_factory=list)  # Omitidos por presupuesto de latencia
+
+
+# Features calculadas por prepare_features (en su orden de columnas)
+COMPUTED_FEATURES = (
+    'ema_9', 'ema_21', 'ema_50', 'ema_9_21_diff', 'ema_9_50_diff', 'macd', 'macd_signal',
+    'rsi', 'bb_middle', 'bb_std', 'bb_upper', 'bb_lower', 'bb_position',
+    'return_1', 'return_5', 'return_10', 'return_20', 'momentum_5', 'momentum_10',
+    'roc_5', 'roc_10', 'atr', 'atr_pct', 'volatility_10', 'volatility_20',
+    'candle_range', 'candle_range_avg',
+)
+VOLUME_FEATURES = ('volume_ma_20', 'volume_ratio', 'obv')
+
+
+def _window(tail: deque, x: float, n: int) -> Optional[np.ndarray]:
+    """Ultimos n valores (cola + x) o None si aun no hay n."""
+    if len(tail) < n - 1:
+        return None
+    vals = list(tail)[len(tail) - (n - 1):]
+    vals.append(x)
+    return np.array(vals, dtype=float)
+
+
+# Datos de entrenamiento compartidos por cada proceso del pool (se envian una vez)
+_FIT_X: Optional[np.ndarray] = None
+_FIT_Y: Optional[np.ndarray] = None
+_FIT_SINGLE_THREAD = False   # True en los procesos del pool: ya hay uno por CPU
+
+
+def _init_fit_worker(X: Optional[np.ndarray], y: Optional[np.ndarray],
+                     single_thread: bool = False):
+    global _FIT_X, _FIT_Y, _FIT_SINGLE_THREAD
+    _FIT_X, _FIT_Y, _FIT_SINGLE_THREAD = X, y, single_thread
+
+
+def _fit_task(model, train_end: int, test_start: int, test_end: int,
+              keep_model: bool) -> Tuple[object, np.ndarray]:
+    """Ajusta una copia del modelo con las filas [0, train_end) y predice [test_start, test_end)."""
+    model = clone(model)
+    n_jobs = model.get_params().get('n_jobs')
+    if _FIT_SINGLE_THREAD and n_jobs not in (None, 1):
+        model.set_params(n_jobs=1)
+    model.fit(_FIT_X[:train_end], _FIT_Y[:train_end])
+    if _FIT_SINGLE_THREAD and n_jobs not in (None, 1):
+        model.set_params(n_jobs=n_jobs)   # el modelo final predice con todos los hilos
+    X_test = _FIT_X[test_start:test_end]
+    if hasattr(model, 'predict_proba'):
+        proba = np.asarray(model.predict_proba(X_test), dtype=float)
+    else:
+        pred = np.asarray(model.predict(X_test), dtype=float)
+        proba = np.column_stack([1 - pred, pred])
+    return (model if keep_model else None), proba
+
+
+class _FeatureState:
+    """
+    Estado movil de un activo: reproduce la ultima fila de prepare_features
+    a partir de las velas ya procesadas, sin recalcular la ventana completa.
+    Las EMAs y el OBV acumulan toda la historia vista (como en entrenamiento),
+    no solo la ventana que llega en cada llamada.
+    """
+
+    def __init__(self, has_volume: bool):
+        self.has_volume = has_volume
+        self.last_ts = None
+        self.ema = {p: (0.0, 0.0) for p in (9, 21, 50)}   # ewm adjust=True: (num, den)
+        self.macd = None                                  # (fast, slow, signal) adjust=False
+        self.obv = 0.0
+        self.prev_close = None
+        self.closes = deque(maxlen=20)      # para retornos hasta 20 velas y Bollinger
+        self.gains = deque(maxlen=13)
+        self.losses = deque(maxlen=13)
+        self.tr = deque(maxlen=13)
+        self.ret1 = deque(maxlen=19)
+        self.crange = deque(maxlen=9)
+        self.volume = deque(maxlen=19)
+        self.filled: Dict[str, float] = {}  # ultimo valor finito por columna (ffill)
+
+    def _compute(self, o: float, h: float, l: float, c: float, v: float) -> Tuple[Dict, tuple]:
+        """Features de la vela (o, h, l, c, v) sobre el estado actual, sin modificarlo."""
+        f: Dict[str, float] = {}
+        nan = np.nan
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # EMAs (ewm adjust=True)
+            ema = {}
+            for p, (num, den) in self.ema.items():
+                a = 1 - 2.0 / (p + 1)
+                ema[p] = (c + a * num, 1.0 + a * den)
+                f[f'ema_{p}'] = ema[p][0] / ema[p][1]
+            f['ema_9_21_diff'] = f['ema_9'] - f['ema_21']
+            f['ema_9_50_diff'] = f['ema_9'] - f['ema_50']
+
+            # MACD (ewm adjust=False, sembrado con la primera vela)
+            if self.macd is None:
+                macd = (c, c, 0.0)
+            else:
+                fast, slow, sig = self.macd
+                fast += (c - fast) * 2.0 / 13
+                slow += (c - slow) * 2.0 / 27
+                sig += ((fast - slow) - sig) * 2.0 / 10
+                macd = (fast, slow, sig)
+            f['macd'] = macd[0] - macd[1]
+            f['macd_signal'] = macd[2]
+
+            # RSI (medias simples de 14; la primera diferencia cuenta como 0)
+            delta = 0.0 if self.prev_close is None else c - self.prev_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            g, lo = _window(self.gains, gain, 14), _window(self.losses, loss, 14)
+            f['rsi'] = 100 - 100 / (1 + np.float64(g.mean()) / lo.mean()) if g is not None else nan
+
+            # Bollinger
+            closes = _window(self.closes, c, 20)
+            if closes is not None:
+                mid, std = closes.mean(), closes.std(ddof=1)
+                f['bb_middle'], f['bb_std'] = mid, std
+                f['bb_upper'], f['bb_lower'] = mid + std * 2, mid - std * 2
+                f['bb_position'] = (c - f['bb_lower']) / np.float64(f['bb_upper'] - f['bb_lower'])
+            else:
+                for k in ('bb_middle', 'bb_std', 'bb_upper', 'bb_lower', 'bb_position'):
+                    f[k] = nan
+
+            # Momentum
+            def back(k: int) -> float:
+                return self.closes[-k] if len(self.closes) >= k else nan
+            for k in (1, 5, 10, 20):
+                f[f'return_{k}'] = c / np.float64(back(k)) - 1
+            for k in (5, 10):
+                f[f'momentum_{k}'] = c - back(k)
+                f[f'roc_{k}'] = ((c - back(k)) / np.float64(back(k))) * 100
+
+            # Volatilidad
+            tr = h - l
+            if self.prev_close is not None:
+                tr = max(tr, abs(h - self.prev_close), abs(l - self.prev_close))
+            trs = _window(self.tr, tr, 14)
+            f['atr'] = trs.mean() if trs is not None else nan
+            f['atr_pct'] = (f['atr'] / np.float64(c)) * 100
+            ret1 = f['return_1']
+            for k in (10, 20):
+                r = _window(self.ret1, ret1, k)
+                f[f'volatility_{k}'] = r.std(ddof=1) if r is not None else nan
+            crange = (h - l) / np.float64(c)
+            f['candle_range'] = crange
+            cr = _window(self.crange, crange, 10)
+            f['candle_range_avg'] = cr.mean() if cr is not None else nan
+
+            # Volumen
+            obv = self.obv
+            if self.has_volume:
+                vols = _window(self.volume, v, 20)
+                f['volume_ma_20'] = vols.mean() if vols is not None else nan
+                f['volume_ratio'] = v / np.float64(f['volume_ma_20'])
+                if self.prev_close is not None:
+                    step = np.sign(delta) * v
+                    obv += 0.0 if np.isnan(step) else step
+                f['obv'] = obv
+
+        nxt = (ema, macd, obv, gain, loss, tr, ret1, crange)
+        return f, nxt
+
+    def row(self, bar: tuple, raw: Dict[str, float]) -> Dict[str, float]:
+        """Fila de features (con ffill/0 como prepare_features) de una vela, sin consolidarla."""
+        f, _ = self._compute(*bar)
+        return self._fill({**raw, **f})
+
+    def commit(self, bar: tuple, raw: Dict[str, float], ts) -> None:
+        """Incorpora una vela cerrada al estado."""
+        f, (ema, macd, obv, gain, loss, tr, ret1, crange) = self._compute(*bar)
+        self.filled = self._fill({**raw, **f})
+        self.ema, self.macd, self.obv = ema, macd, obv
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self.tr.append(tr)
+        self.ret1.append(ret1)
+        self.crange.append(crange)
+        self.closes.append(bar[3])
+        self.volume.append(bar[4])
+        self.prev_close = bar[3]
+        self.last_ts = ts
+
+    def _fill(self, values: Dict[str, float]) -> Dict[str, float]:
+        out = {}
+        for k, x in values.items():
+            x = float(x)
+            out[k] = x if np.isfinite(x) else self.filled.get(k, 0.0)
+        return out
 
 
 class EnsembleMLPredictor:
@@ -56,15 +265,31 @@ class EnsembleMLPredictor:
     El ensemble usa voting suave (promedio de probabilidades) para mayor estabilidad
     """
 
+    FEATURE_WARMUP = 500      # velas de solapamiento al extender la cache de features
+    MIN_WARM_SAMPLES = 50     # muestras nuevas minimas para un reentrenamiento incremental
+    WARM_ESTIMATORS = {'random_forest': 20, 'gradient_boosting': 10, 'xgboost': 10}
+
     def __init__(
         self,
         use_xgboost: bool = False,
         n_estimators: int = 100,
-        max_depth: int = 10
+        max_depth: int = 10,
+        latency_budget_ms: Optional[float] = None,
+        cache_dir: str = "data/ml_features"
     ):
         self.use_xgboost = use_xgboost
         self.n_estimators = n_estimators
         self.max_depth = max_depth
+        self.cache_dir = cache_dir
+
+        # Inferencia en vivo: estado de features por activo y latencia por modelo
+        if latency_budget_ms is None:
+            latency_budget_ms = float(os.getenv("ENSEMBLE_LATENCY_BUDGET_MS", "0")) or None
+        self.latency_budget_ms = latency_budget_ms
+        self.latency = LatencyProfiler(enabled=True, window=256)
+        self._feature_states: Dict[str, _FeatureState] = {}
+        self._states_lock = threading.Lock()
+        self.feature_cols: Optional[List[str]] = None
 
         # Modelos
         self.models: Dict[str, object] = {}
@@ -79,6 +304,7 @@ class EnsembleMLPredictor:
         self.is_trained = False
         self.last_training_date: Optional[datetime] = None
         self.training_samples: int = 0
+        self.trained_until: Optional[pd.Timestamp] = None  # ultima vela usada (warm start)
 
         # Intentar importar XGBoost
         self.xgboost_available = False
@@ -185,39 +411,88 @@ class EnsembleMLPredictor:
 
         # Eliminar NaN/Inf
         feature_df = feature_df.replace([np.inf, -np.inf], np.nan)
-        feature_df = feature_df.fillna(method='ffill').fillna(0)
+        feature_df = feature_df.ffill().fillna(0)
 
         return feature_df
 
+    def prepare_features_cached(self, df: pd.DataFrame, asset: str) -> pd.DataFrame:
+        """
+        prepare_features con cache en disco por activo y ultima vela.
+
+        Si el historico solo ha crecido desde la ultima llamada, se calculan las
+        velas nuevas (con FEATURE_WARMUP velas previas para EMAs y ventanas) y se
+        anaden a la matriz guardada; la ultima vela cacheada se recalcula por si
+        estaba en formacion o le faltaba el target.
+        """
+        path = self._feature_cache_path(asset)
+        cached = None
+        try:
+            if os.path.exists(path):
+                cached = pd.read_pickle(path)
+        except Exception:
+            cached = None
+
+        features = None
+        if cached is not None and len(cached) and len(df) and isinstance(df.index, pd.DatetimeIndex) \
+                and cached.index[0] <= df.index[0]:
+            cached = cached[cached.index >= df.index[0]]
+            # Cache sin solape con el historico actual (vieja o de otra serie): recalcular
+            last = cached.index[-1] if len(cached) else None
+            pos = df.index.searchsorted(last) if last is not None else len(df)
+            if pos < len(df) and df.index[:pos + 1].equals(cached.index):
+                if pos == len(df) - 1 and df.index[-1] == last and cached.notna().iloc[-1].all():
+                    return cached
+                start = max(0, pos - self.FEATURE_WARMUP)
+                tail = self.prepare_features(df.iloc[start:])
+                if list(tail.columns) == list(cached.columns):
+                    new_rows = tail.iloc[pos - start:].copy()
+                    if 'obv' in new_rows.columns:
+                        # OBV es acumulado: continuar desde el valor cacheado
+                        new_rows['obv'] += cached['obv'].iloc[start]
+                    features = pd.concat([cached.iloc[:-1], new_rows])
+
+        if features is None:
+            features = self.prepare_features(df)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = path + ".tmp"
+            features.to_pickle(tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f" No se pudo guardar la cache de features {asset}: {e}")
+        return features
+
+    def _feature_cache_path(self, asset: str) -> str:
+        return os.path.join(self.cache_dir, re.sub(r'[^\w.-]', '_', asset) + ".pkl")
+
     def _add_technical_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Agregar features tcnicos"""
+        indicators = get_indicator_service()
+
         # EMAs
-        df['ema_9'] = df['close'].ewm(span=9).mean()
-        df['ema_21'] = df['close'].ewm(span=21).mean()
-        df['ema_50'] = df['close'].ewm(span=50).mean()
+        df['ema_9'] = indicators.ema(df, 9, kind="ewm", adjust=True)
+        df['ema_21'] = indicators.ema(df, 21, kind="ewm", adjust=True)
+        df['ema_50'] = indicators.ema(df, 50, kind="ewm", adjust=True)
 
         # Diferencias de EMAs
         df['ema_9_21_diff'] = df['ema_9'] - df['ema_21']
         df['ema_9_50_diff'] = df['ema_9'] - df['ema_50']
 
         # MACD
-        exp1 = df['close'].ewm(span=12, adjust=False)
-        exp2 = df['close'].ewm(span=26, adjust=False)
-        df['macd'] = exp1.mean() - exp2.mean()
-        df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+        macd, macd_signal, _ = indicators.macd(df, 12, 26, 9, kind="ewm", adjust=False)
+        df['macd'] = macd
+        df['macd_signal'] = macd_signal
 
         # RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        df['rsi'] = indicators.rsi(df, 14, kind="sma")
 
         # Bollinger Bands
-        df['bb_middle'] = df['close'].rolling(window=20).mean()
+        bb_upper, bb_lower, bb_middle = indicators.bollinger(df, 20, 2)
+        df['bb_middle'] = bb_middle
         df['bb_std'] = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (df['bb_std'] * 2)
-        df['bb_lower'] = df['bb_middle'] - (df['bb_std'] * 2)
+        df['bb_upper'] = bb_upper
+        df['bb_lower'] = bb_lower
         df['bb_position'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
 
         return df
@@ -277,7 +552,10 @@ class EnsembleMLPredictor:
         df: pd.DataFrame,
         target_column: str = 'next_candle_direction',
         test_size: float = 0.2,
-        cross_validation_folds: int = 5
+        cross_validation_folds: int = 5,
+        asset: Optional[str] = None,
+        n_jobs: Optional[int] = None,
+        warm_start: bool = False
     ):
         """
         Entrenar todos los modelos
@@ -286,71 +564,131 @@ class EnsembleMLPredictor:
             df: DataFrame con datos histricos
             target_column: Nombre de la columna objetivo (1=CALL, 0=PUT)
             test_size: Proporcin para test
-            cross_validation_folds: Folds para cross-validation
+            cross_validation_folds: Folds para cross-validation (temporales)
+            asset: Si se indica, las features se cachean en disco para ese activo
+            n_jobs: Procesos para entrenar/validar en paralelo (None = ML_TRAIN_JOBS o CPUs)
+            warm_start: Reentrenar solo con las velas posteriores al ultimo entrenamiento
         """
         print(" Entrenando Ensemble ML Predictor...")
 
         # Preparar features
-        feature_df = self.prepare_features(df)
+        feature_df = self.prepare_features_cached(df, asset) if asset else self.prepare_features(df)
+        self._fit(feature_df, target_column, test_size, cross_validation_folds, n_jobs, warm_start)
+
+    def train_assets(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        target_column: str = 'next_candle_direction',
+        test_size: float = 0.2,
+        cross_validation_folds: int = 5,
+        n_jobs: Optional[int] = None,
+        warm_start: bool = False
+    ):
+        """
+        Entrenar con el historico de varios activos a la vez.
+
+        Las features de cada activo salen de la cache en disco y se unen en orden
+        temporal, de modo que el split train/test y los folds respetan el tiempo
+        en todos los activos.
+        """
+        print(f" Entrenando Ensemble ML Predictor ({len(frames)} activos)...")
 
+        parts = []
+        for asset, df in frames.items():
+            try:
+                parts.append(self.prepare_features_cached(df, asset))
+            except Exception as e:
+                print(f"     Error preparando features {asset}: {e}")
+
+        if not parts:
+            print(" Sin datos para entrenar")
+            return
+
+        feature_df = pd.concat(parts).sort_index(kind='stable')
+        self._fit(feature_df, target_column, test_size, cross_validation_folds, n_jobs, warm_start)
+
+    def _fit(
+        self,
+        feature_df: pd.DataFrame,
+        target_column: str,
+        test_size: float,
+        cross_validation_folds: int,
+        n_jobs: Optional[int],
+        warm_start: bool
+    ):
         # Eliminar filas con NaN
         feature_df = feature_df.dropna()
 
+        if warm_start and self.is_trained and self.trained_until is not None:
+            self._warm_refit(feature_df, target_column, test_size)
+            return
+
         if len(feature_df) < 100:
             print(" Datos insuficientes para entrenar (mnimo 100 muestras)")
             return
 
         # Separar features y target
         feature_cols = [c for c in feature_df.columns if c != target_column]
+        self.feature_cols = feature_cols
+        self._feature_states.clear()
         X = feature_df[feature_cols]
-        y = feature_df[target_column]
+        y = feature_df[target_column].to_numpy()
 
         # Split train/test
         split_idx = int(len(X) * (1 - test_size))
-        X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
-        y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
+        y_train, y_test = y[:split_idx], y[split_idx:]
 
-        print(f"  Muestras train: {len(X_train)}, test: {len(X_test)}")
+        print(f"  Muestras train: {split_idx}, test: {len(X) - split_idx}")
 
         # Escalar features
         self.scaler = StandardScaler()
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-
-        self.training_samples = len(X_train)
+        self.scaler.fit(X.iloc[:split_idx])
+        X_scaled = self.scaler.transform(X)
 
-        # Entrenar cada modelo individualmente
-        self.model_metrics = {}
+        self.training_samples = split_idx
 
+        # Tareas: ajuste final de cada modelo + cada fold temporal (TimeSeriesSplit)
+        folds = [(int(tr[-1]) + 1, int(te[0]), int(te[-1]) + 1)
+                 for tr, te in TimeSeriesSplit(n_splits=cross_validation_folds).split(X_scaled[:split_idx])]
+        tasks = []
         for name, model in self.models.items():
-            print(f"  Entrenando {name}...")
+            tasks.append((name, -1, model, split_idx, split_idx, len(X_scaled)))
+            for k, (train_end, test_start, test_end) in enumerate(folds):
+                tasks.append((name, k, model, train_end, test_start, test_end))
 
-            try:
-                model.fit(X_train_scaled, y_train)
+        print(f"  Entrenando {len(self.models)} modelos x {len(folds) + 1} ajustes...")
+        outputs, errors = self._run_fit_tasks(tasks, X_scaled, y, n_jobs)
 
-                # Predicciones en test
-                y_pred = model.predict(X_test_scaled)
-                y_proba = model.predict_proba(X_test_scaled)[:, 1] if hasattr(model, 'predict_proba') else y_pred
-
-                # Mtricas
-                accuracy = accuracy_score(y_test, y_pred)
-                precision = precision_score(y_test, y_pred, zero_division=0)
-                recall = recall_score(y_test, y_pred, zero_division=0)
-                f1 = f1_score(y_test, y_pred, zero_division=0)
+        # Mtricas por modelo
+        self.model_metrics = {}
+        test_probas: Dict[str, np.ndarray] = {}
+        fold_probas: Dict[str, Dict[int, np.ndarray]] = {}
 
-                # Cross-validation
-                cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=cross_validation_folds, scoring='accuracy')
+        for name in self.models:
+            try:
+                if name in errors:
+                    raise errors[name]
+                fitted, y_proba = outputs[name][-1]
+                self.models[name] = fitted
+                test_probas[name] = y_proba
+                fold_probas[name] = {k: p for k, (_, p) in outputs[name].items() if k >= 0}
+
+                y_pred = y_proba.argmax(axis=1)
+                cv_scores = np.array([
+                    accuracy_score(y[test_start:test_end], fold_probas[name][k].argmax(axis=1))
+                    for k, (_, test_start, test_end) in enumerate(folds)
+                ])
 
                 self.model_metrics[name] = {
-                    'accuracy': accuracy,
-                    'precision': precision,
-                    'recall': recall,
-                    'f1': f1,
+                    'accuracy': accuracy_score(y_test, y_pred),
+                    'precision': precision_score(y_test, y_pred, zero_division=0),
+                    'recall': recall_score(y_test, y_pred, zero_division=0),
+                    'f1': f1_score(y_test, y_pred, zero_division=0),
                     'cv_mean': cv_scores.mean(),
                     'cv_std': cv_scores.std(),
                 }
 
-                print(f"     {name}: Accuracy={accuracy*100:.1f}%, CV={cv_scores.mean()*100:.1f}%")
+                print(f"     {name}: Accuracy={self.model_metrics[name]['accuracy']*100:.1f}%, CV={cv_scores.mean()*100:.1f}%")
 
             except Exception as e:
                 print(f"     Error entrenando {name}: {e}")
@@ -359,25 +697,22 @@ class EnsembleMLPredictor:
                     'error': str(e)
                 }
 
-        # Crear ensemble con voting suave
-        estimators = [
-            (name, model) for name, model in self.models.items()
-            if name in self.model_metrics and 'error' not in self.model_metrics.get(name, {})
-        ]
+        # Ensemble con voting suave sobre los modelos ya ajustados (sin reentrenar)
+        names = [n for n in test_probas if 'error' not in self.model_metrics[n]]
 
-        if len(estimators) >= 2:
-            self.ensemble = VotingClassifier(
-                estimators=estimators,
-                voting='soft',
-                weights=[self.model_metrics[n]['cv_mean'] for n, _ in estimators]
-            )
-            self.ensemble.fit(X_train_scaled, y_train)
+        if len(names) >= 2:
+            weights = [self.model_metrics[n]['cv_mean'] for n in names]
+            self.ensemble = self._assemble_ensemble(names, weights, y_train)
+
+            def vote(probas: List[np.ndarray]) -> np.ndarray:
+                return np.average(probas, axis=0, weights=weights).argmax(axis=1)
 
-            # Mtricas del ensemble
-            ensemble_pred = self.ensemble.predict(X_test_scaled)
             self.model_metrics['ensemble'] = {
-                'accuracy': accuracy_score(y_test, ensemble_pred),
-                'cv_mean': cross_val_score(self.ensemble, X_train_scaled, y_train, cv=cross_validation_folds).mean(),
+                'accuracy': accuracy_score(y_test, vote([test_probas[n] for n in names])),
+                'cv_mean': np.mean([
+                    accuracy_score(y[test_start:test_end], vote([fold_probas[n][k] for n in names]))
+                    for k, (_, test_start, test_end) in enumerate(folds)
+                ]),
             }
             print(f"   Ensemble: Accuracy={self.model_metrics['ensemble']['accuracy']*100:.1f}%")
 
@@ -386,9 +721,119 @@ class EnsembleMLPredictor:
 
         self.is_trained = True
         self.last_training_date = datetime.now()
+        self.trained_until = feature_df.index[-1] if isinstance(feature_df.index, pd.DatetimeIndex) else None
 
         print(f" Entrenamiento completado ({len(self.models)} modelos)")
 
+    def _run_fit_tasks(self, tasks: List[tuple], X: np.ndarray, y: np.ndarray,
+                       n_jobs: Optional[int]) -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+        """Ejecuta las tareas de ajuste en un pool de procesos (o en serie si n_jobs=1)."""
+        if n_jobs is None:
+            n_jobs = int(os.getenv("ML_TRAIN_JOBS", "0")) or os.cpu_count() or 1
+        n_jobs = max(1, min(n_jobs, len(tasks)))
+
+        outputs: Dict[str, Dict] = {}
+        errors: Dict[str, Exception] = {}
+
+        def collect(task, result=None, error=None):
+            name, fold = task[0], task[1]
+            if error is not None:
+                errors[name] = error
+            else:
+                outputs.setdefault(name, {})[fold] = result
+
+        if n_jobs > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_fit_worker,
+                                         initargs=(X, y, True)) as pool:
+                    futures = {pool.submit(_fit_task, *task[2:], task[1] < 0): task for task in tasks}
+                    for future, task in futures.items():
+                        try:
+                            collect(task, future.result())
+                        except Exception as e:
+                            collect(task, error=e)
+                return outputs, errors
+            except Exception as e:
+                print(f"  Pool de procesos no disponible ({e}), entrenando en serie")
+                outputs.clear()
+                errors.clear()
+
+        _init_fit_worker(X, y)
+        try:
+            for task in tasks:
+                try:
+                    collect(task, _fit_task(*task[2:], task[1] < 0))
+                except Exception as e:
+                    collect(task, error=e)
+        finally:
+            _init_fit_worker(None, None)
+        return outputs, errors
+
+    def _assemble_ensemble(self, names: List[str], weights: List[float],
+                           y_train: np.ndarray) -> VotingClassifier:
+        """VotingClassifier suave con los estimadores ya entrenados."""
+        ensemble = VotingClassifier(
+            estimators=[(n, self.models[n]) for n in names],
+            voting='soft',
+            weights=weights
+        )
+        ensemble.estimators_ = [self.models[n] for n in names]
+        ensemble.named_estimators_ = Bunch(**{n: self.models[n] for n in names})
+        ensemble.le_ = LabelEncoder().fit(y_train)
+        ensemble.classes_ = ensemble.le_.classes_
+        return ensemble
+
+    def _warm_refit(self, feature_df: pd.DataFrame, target_column: str, test_size: float):
+        """
+        Reentrenamiento incremental con las velas posteriores al ultimo entrenamiento.
+        RF/GB/XGBoost anaden arboles entrenados con las velas nuevas y el MLP da una
+        pasada de partial_fit desde sus pesos actuales. LR y SVM no tienen forma de
+        ampliar lo aprendido (refitear solo con las velas nuevas lo descartaria), asi
+        que se mantienen hasta el proximo entrenamiento completo.
+        """
+        new_df = feature_df[feature_df.index > self.trained_until]
+        if len(new_df) < self.MIN_WARM_SAMPLES:
+            print(f" Solo {len(new_df)} muestras nuevas, no se reentrena")
+            return
+
+        X = self.scaler.transform(new_df[self.feature_cols])
+        y = new_df[target_column].to_numpy()
+        split_idx = int(len(X) * (1 - test_size))
+        X_train, X_test = X[:split_idx], X[split_idx:]
+        y_train, y_test = y[:split_idx], y[split_idx:]
+
+        print(f" Reentrenamiento incremental: {len(new_df)} muestras nuevas")
+
+        for name, model in self.models.items():
+            try:
+                if name == 'xgboost':
+                    model.set_params(n_estimators=self.WARM_ESTIMATORS[name])
+                    model.fit(X_train, y_train, xgb_model=model.get_booster())
+                elif name in self.WARM_ESTIMATORS:
+                    model.set_params(warm_start=True,
+                                     n_estimators=model.n_estimators + self.WARM_ESTIMATORS[name])
+                    model.fit(X_train, y_train)
+                elif name == 'mlp':
+                    model.partial_fit(X_train, y_train)
+                else:
+                    continue
+
+                accuracy = accuracy_score(y_test, model.predict(X_test)) if len(y_test) else None
+                if accuracy is not None and name in self.model_metrics:
+                    self.model_metrics[name]['accuracy'] = accuracy
+                print(f"     {name}: actualizado" + (f" (Accuracy={accuracy*100:.1f}%)" if accuracy is not None else ""))
+
+            except Exception as e:
+                print(f"     Error reentrenando {name}: {e}")
+
+        if self.ensemble is not None:
+            names = [n for n, _ in self.ensemble.estimators]
+            self.ensemble = self._assemble_ensemble(names, list(self.ensemble.weights), y_train)
+
+        self.last_training_date = datetime.now()
+        self.trained_until = new_df.index[-1]
+        self.training_samples += split_idx
+
     def _calculate_feature_importance(self, feature_cols: List[str]):
         """Calcular importancia de features"""
         importance_dict = {}
@@ -410,21 +855,24 @@ class EnsembleMLPredictor:
         if total > 0:
             self.feature_importance = {k: v/total for k, v in importance_dict.items()}
 
-    def predict(self, df: pd.DataFrame) -> EnsemblePrediction:
+    def predict(self, df: pd.DataFrame, asset: Optional[str] = None) -> EnsemblePrediction:
         """
         Predecir direccin siguiente usando ensemble
 
         Args:
             df: DataFrame con datos recientes
+            asset: Si se indica, usa el estado incremental de features del activo
 
         Returns:
             EnsemblePrediction con prediccin consolidada
         """
-        if not self.is_trained:
-            raise Exception("Modelo no entrenado. Llamar a train() primero.")
+        self._check_ready()
 
-        if self.scaler is None:
-            raise Exception("Scaler no inicializado")
+        if asset is not None:
+            result = self.predict_batch({asset: df})
+            if asset not in result:
+                raise Exception("No se pudo preparar features vlidas")
+            return result[asset]
 
         # Preparar features
         feature_df = self.prepare_features(df)
@@ -433,22 +881,152 @@ class EnsembleMLPredictor:
         if len(feature_df) == 0:
             raise Exception("No se pudo preparar features vlidas")
 
-        feature_cols = [c for c in feature_df.columns]
-        X = feature_df[feature_cols]
-        X_scaled = self.scaler.transform(X)
+        feature_cols = self.feature_cols or list(feature_df.columns)
+        X = feature_df[feature_cols].to_numpy(dtype=float)
+        return self._predict_matrix(X)[0]
 
-        # Predicciones individuales
-        model_predictions: List[ModelPrediction] = []
-        call_votes = 0
-        put_votes = 0
-        weighted_call_prob = 0
-        weighted_put_prob = 0
-        total_weight = 0
+    def predict_batch(self, frames: Dict[str, pd.DataFrame]) -> Dict[str, EnsemblePrediction]:
+        """
+        Predecir todos los activos de un escaneo con una sola llamada por modelo.
 
-        for name, model in self.models.items():
+        Args:
+            frames: {activo: DataFrame de velas} (la ultima vela puede estar en formacion)
+
+        Returns:
+            {activo: EnsemblePrediction}; los activos sin features validas se omiten
+        """
+        self._check_ready()
+
+        assets, rows = [], []
+        for asset, df in frames.items():
             try:
-                pred = model.predict(X_scaled)[0]
-                proba = model.predict_proba(X_scaled)[0] if hasattr(model, 'predict_proba') else [0.5, 0.5]
+                row = self._latest_features(asset, df)
+            except Exception as e:
+                print(f" Error preparando features {asset}: {e}")
+                continue
+            if row is not None:
+                assets.append(asset)
+                rows.append(row)
+
+        if not rows:
+            return {}
+        return dict(zip(assets, self._predict_matrix(np.vstack(rows))))
+
+    def _check_ready(self):
+        if not self.is_trained:
+            raise Exception("Modelo no entrenado. Llamar a train() primero.")
+
+        if self.scaler is None:
+            raise Exception("Scaler no inicializado")
+
+    # ------------------------------------------------------------------
+    # Features incrementales
+    # ------------------------------------------------------------------
+
+    def _latest_features(self, asset: str, df: pd.DataFrame) -> Optional[np.ndarray]:
+        """Vector de features de la ultima vela de `df` desde el estado movil del activo."""
+        if df is None or len(df) == 0:
+            return None
+
+        # Columnas numericas como select_dtypes(include=[np.number])
+        raw_cols = [k for k, t in df.dtypes.items() if getattr(t, 'kind', 'O') in 'iufc']
+        has_volume = 'volume' in df.columns
+        timed = isinstance(df.index, pd.DatetimeIndex)
+
+        with self._states_lock:
+            state = self._feature_states.get(asset)
+            start = 0
+            # Continuar desde la ultima vela consolidada si sigue en la ventana
+            if state is not None and timed and state.has_volume == has_volume:
+                pos = df.index.searchsorted(state.last_ts)
+                if pos < len(df) and df.index[pos] == state.last_ts:
+                    start = pos + 1
+                else:
+                    state = None
+            if state is None or not timed:
+                state = _FeatureState(has_volume)
+                start = 0
+
+            # Solo las velas que faltan por procesar
+            tail = df.iloc[start:]
+            cols = {k: tail[k].to_numpy(dtype=float) for k in raw_cols}
+            volume = cols['volume'] if has_volume else np.zeros(len(tail))
+            bars = list(zip(cols['open'], cols['high'], cols['low'], cols['close'], volume))
+
+            def raw(i: int) -> Dict[str, float]:
+                return {k: cols[k][i] for k in raw_cols}
+
+            # Consolidar las velas cerradas nuevas; la ultima solo se evalua
+            for i in range(len(tail) - 1):
+                state.commit(bars[i], raw(i), tail.index[i])
+            row = state.row(bars[-1], raw(len(tail) - 1))
+            if timed:
+                self._feature_states[asset] = state
+
+        feature_cols = self.feature_cols or raw_cols + [
+            c for c in COMPUTED_FEATURES + (VOLUME_FEATURES if has_volume else ())
+            if c not in raw_cols
+        ]
+        return np.array([row[c] for c in feature_cols], dtype=float)
+
+    # ------------------------------------------------------------------
+    # Inferencia por lotes
+    # ------------------------------------------------------------------
+
+    def _select_models(self) -> Tuple[List[str], List[str]]:
+        """Modelos a ejecutar dentro del presupuesto (los mas baratos primero por p95)."""
+        names = list(self.models)
+        if not self.latency_budget_ms:
+            return names, []
+
+        stats = self.latency.stats()
+        cost = {n: stats.get(n, {}).get('p95_ms', 0.0) for n in names}
+        selected, dropped, spent = set(), [], 0.0
+        for name in sorted(names, key=lambda n: cost[n]):
+            if selected and spent + cost[name] > self.latency_budget_ms:
+                dropped.append(name)
+                continue
+            selected.add(name)
+            spent += cost[name]
+        return [n for n in names if n in selected], dropped
+
+    def _predict_matrix(self, X: np.ndarray) -> List[EnsemblePrediction]:
+        """Una llamada predict_proba por modelo para todas las filas de X."""
+        X_scaled = self.scaler.transform(X)
+        n_rows = len(X_scaled)
+        names, dropped = self._select_models()
+
+        probas: Dict[str, np.ndarray] = {}
+        latency_ms: Dict[str, float] = {}
+        for name in names:
+            model = self.models[name]
+            try:
+                t0 = time.perf_counter()
+                if hasattr(model, 'predict_proba'):
+                    proba = np.asarray(model.predict_proba(X_scaled), dtype=float)
+                else:
+                    pred = np.asarray(model.predict(X_scaled), dtype=float)
+                    proba = np.column_stack([1 - pred, pred])
+                elapsed = time.perf_counter() - t0
+                self.latency.record(name, "batch", elapsed)
+                latency_ms[name] = elapsed * 1000
+                probas[name] = proba
+            except Exception as e:
+                print(f" Error en prediccin {name}: {e}")
+
+        ensemble_names = [n for n, _ in self.ensemble.estimators] if self.ensemble else []
+        results = []
+        for i in range(n_rows):
+            model_predictions: List[ModelPrediction] = []
+            call_votes = 0
+            put_votes = 0
+            weighted_call_prob = 0
+            weighted_put_prob = 0
+            total_weight = 0
+
+            for name, proba_rows in probas.items():
+                proba = proba_rows[i]
+                pred = 1 if proba[1] > proba[0] else 0
 
                 # Peso basado en CV accuracy
                 weight = self.model_metrics.get(name, {}).get('cv_mean', 0.5)
@@ -464,29 +1042,34 @@ class EnsembleMLPredictor:
 
                 model_predictions.append(ModelPrediction(
                     model_name=name,
-                    prediction=int(pred),
+                    prediction=pred,
                     probability=float(max(proba)),
                     confidence=float(max(proba))
                 ))
 
-            except Exception as e:
-                print(f" Error en prediccin {name}: {e}")
-
-        # Prediccin del ensemble (si disponible)
-        if self.ensemble:
-            ensemble_pred = self.ensemble.predict(X_scaled)[0]
-            ensemble_proba = self.ensemble.predict_proba(X_scaled)[0]
-            final_prediction = int(ensemble_pred)
-            confidence = float(max(ensemble_proba))
-        else:
-            # Votacin ponderada
-            if call_votes > put_votes:
-                final_prediction = 1
-                confidence = weighted_call_prob / total_weight if total_weight > 0 else 0.5
+            # Voto suave del ensemble con las probabilidades ya calculadas
+            voters = [n for n in ensemble_names if n in probas]
+            if voters:
+                weights = [self.model_metrics[n]['cv_mean'] for n in voters]
+                ensemble_proba = np.average([probas[n][i] for n in voters], axis=0, weights=weights)
+                final_prediction = int(np.argmax(ensemble_proba))
+                confidence = float(max(ensemble_proba))
             else:
-                final_prediction = 0
-                confidence = weighted_put_prob / total_weight if total_weight > 0 else 0.5
-
+                # Votacin ponderada
+                if call_votes > put_votes:
+                    final_prediction = 1
+                    confidence = weighted_call_prob / total_weight if total_weight > 0 else 0.5
+                else:
+                    final_prediction = 0
+                    confidence = weighted_put_prob / total_weight if total_weight > 0 else 0.5
+
+            results.append(self._consolidate(model_predictions, final_prediction, confidence,
+                                             latency_ms, dropped))
+        return results
+
+    def _consolidate(self, model_predictions: List[ModelPrediction], final_prediction: int,
+                     confidence: float, latency_ms: Dict[str, float],
+                     dropped: List[str]) -> EnsemblePrediction:
         # Calcular agreement score
         call_count = sum(1 for p in model_predictions if p.prediction == 1)
         put_count = sum(1 for p in model_predictions if p.prediction == 0)
@@ -515,9 +1098,15 @@ class EnsembleMLPredictor:
             model_predictions=model_predictions,
             agreement_score=agreement_score,
             recommended_action=recommended_action,
-            expected_accuracy=expected_accuracy
+            expected_accuracy=expected_accuracy,
+            latency_ms=dict(latency_ms),
+            dropped_models=list(dropped)
         )
 
+    def get_model_latency(self) -> Dict[str, Dict]:
+        """Percentiles de latencia (ms) por modelo en inferencia por lotes."""
+        return self.latency.stats()
+
     def get_model_report(self) -> str:
         """Generar reporte de modelos"""
         report = []
@@ -540,6 +1129,14 @@ class EnsembleMLPredictor:
                 report.append(f"    Accuracy: {metrics.get('accuracy', 0)*100:.1f}%")
                 report.append(f"    CV Mean: {metrics.get('cv_mean', 0)*100:.1f}% (+/- {metrics.get('cv_std', 0)*3:.1f}%)")
 
+        latency = self.get_model_latency()
+        if latency:
+            report.append("")
+            report.append("LATENCIA DE INFERENCIA (por lote):")
+            report.append("-" * 50)
+            for name, pct in latency.items():
+                report.append(f"  {name:20s} p50={pct['p50_ms']:.2f}ms p95={pct['p95_ms']:.2f}ms")
+
         report.append("")
         report.append("TOP 10 FEATURES MS IMPORTANTES:")
         report.append("-" * 50)
@@ -568,6 +1165,8 @@ class EnsembleMLPredictor:
             'is_trained': self.is_trained,
             'last_training_date': self.last_training_date,
             'training_samples': self.training_samples,
+            'feature_cols': self.feature_cols,
+            'trained_until': self.trained_until,
         }
 
         joblib.dump(model_data, filepath)
@@ -590,6 +1189,9 @@ class EnsembleMLPredictor:
             self.is_trained = model_data.get('is_trained', False)
             self.last_training_date = model_data.get('last_training_date')
             self.training_samples = model_data.get('training_samples', 0)
+            self.feature_cols = model_data.get('feature_cols')
+            self.trained_until = model_data.get('trained_until')
+            self._feature_states.clear()
 
             print(f" Modelo cargado desde {filepath}")
             return True
@@ -1,29 +1,100 @@
 """
 Experience Buffer - Almacena experiencias reales de trading
 Para entrenamiento continuo con datos reales de Exnova
+
+Buffer circular de capacidad fija sobre arrays NumPy preasignados y mapeados
+a disco (np.memmap vía archivos .npy): state/next_state como matrices float32,
+action, reward, done y prioridad por slot. Guardar es un flush de las páginas
+modificadas, no reescribir todo el buffer. La metadata (activo, timestamp...)
+va en una tabla SQLite aparte indexada por slot.
+
+El JSON anterior (experiences.json) se importa una sola vez si el buffer está vacío.
 """
-import pandas as pd
-import numpy as np
-from datetime import datetime
-import os
 import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
 
 class ExperienceBuffer:
     """
     Almacena experiencias de trading real para re-entrenamiento
     """
-    def __init__(self, max_size=10000, save_path="data/experiences.csv"):
+
+    SAVE_EVERY = 10
+
+    def __init__(self, max_size=10000, save_path="data/experiences.csv", state_dim=None):
         self.max_size = max_size
         self.save_path = save_path
-        self.experiences = []
-        
+        self.dir = os.path.splitext(save_path)[0] + "_buffer"
+        self.state_dim = state_dim
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._head = 0          # próximo slot a escribir
+        self._count = 0
+        self._added = 0
+        self._autosave = True
+        self.truncated = 0      # estados recortados por ser más anchos que state_dim
+        self._db: Optional[sqlite3.Connection] = None
+
         # Cargar experiencias previas si existen
         self.load()
-    
+
+    # ── Almacenamiento ────────────────────────────────────────────────────────
+
+    def _open_db(self):
+        if self._db is None:
+            os.makedirs(self.dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.dir, "meta.db"), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT);"
+                "CREATE TABLE IF NOT EXISTS experience_meta ("
+                " slot INTEGER PRIMARY KEY, timestamp TEXT, metadata TEXT);"
+            )
+        return self._db
+
+    def _allocate(self, state_dim: int, mode: str = "w+"):
+        """Crea (o abre con mode='r+') los arrays mapeados a disco."""
+        os.makedirs(self.dir, exist_ok=True)
+        n, d = self.max_size, state_dim
+        specs = {
+            "state":      ((n, d), np.float32),
+            "next_state": ((n, d), np.float32),
+            "state_len":  ((n,), np.int32),
+            "next_len":   ((n,), np.int32),
+            "action":     ((n,), np.int8),
+            "reward":     ((n,), np.float32),
+            "done":       ((n,), np.bool_),
+            "priority":   ((n,), np.float32),
+        }
+        self._arrays = {
+            name: np.lib.format.open_memmap(os.path.join(self.dir, f"{name}.npy"),
+                                            mode=mode, dtype=dtype, shape=shape if mode == "w+" else None)
+            for name, (shape, dtype) in specs.items()
+        }
+        self.state_dim = d
+
+    def _put_vector(self, name: str, length_name: str, slot: int, vec) -> None:
+        v = np.asarray(vec, dtype=np.float32).ravel()
+        if len(v) > self.state_dim:
+            self.truncated += 1
+            print(f"⚠️ Ancho de estado distinto: {len(v)} valores, el buffer guarda {self.state_dim}; "
+                  f"se recortan ({self.truncated} recortes)")
+        k = min(len(v), self.state_dim)
+        row = self._arrays[name][slot]
+        row[:k] = v[:k]
+        row[k:] = 0.0
+        self._arrays[length_name][slot] = k
+
+    # ── API ───────────────────────────────────────────────────────────────────
+
     def add_experience(self, state, action, reward, next_state, done, metadata=None):
         """
         Agrega una experiencia de trading real
-        
+
         Args:
             state: Estado del mercado (indicadores) antes de la operación
             action: Acción tomada (0=HOLD, 1=CALL, 2=PUT)
@@ -32,65 +103,207 @@ class ExperienceBuffer:
             done: Si terminó el episodio
             metadata: Info adicional (activo, timestamp, etc.)
         """
-        experience = {
-            'timestamp': datetime.now().isoformat(),
-            'state': state.tolist() if hasattr(state, 'tolist') else state,
-            'action': int(action),
-            'reward': float(reward),
-            'next_state': next_state.tolist() if hasattr(next_state, 'tolist') else next_state,
-            'done': bool(done),
-            'metadata': metadata or {}
-        }
-        
-        self.experiences.append(experience)
-        
-        # Limitar tamaño del buffer
-        if len(self.experiences) > self.max_size:
-            self.experiences = self.experiences[-self.max_size:]
-        
+        if not self._arrays:
+            self._allocate(self.state_dim or len(np.ravel(state)))
+
+        slot = self._head
+        self._put_vector("state", "state_len", slot, state)
+        self._put_vector("next_state", "next_len", slot, next_state)
+        self._arrays["action"][slot] = int(action)
+        self._arrays["reward"][slot] = float(reward)
+        self._arrays["done"][slot] = bool(done)
+        # Experiencia nueva: prioridad máxima para que se muestree al menos una vez
+        self._arrays["priority"][slot] = self._max_priority()
+
+        # Sobrescribe el slot más antiguo cuando el buffer está lleno
+        self._open_db().execute(
+            "INSERT OR REPLACE INTO experience_meta (slot, timestamp, metadata) VALUES (?, ?, ?)",
+            (slot, datetime.now().isoformat(), json.dumps(metadata or {}, default=str)))
+
+        self._head = (self._head + 1) % self.max_size
+        self._count = min(self._count + 1, self.max_size)
+        self._added += 1
+
         # Auto-guardar cada 10 experiencias
-        if len(self.experiences) % 10 == 0:
+        if self._autosave and self._added % self.SAVE_EVERY == 0:
             self.save()
-    
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _slots(self, n: Optional[int] = None) -> np.ndarray:
+        """Slots en orden cronológico (los `n` más recientes si se indica)."""
+        n = self._count if n is None else min(n, self._count)
+        return (self._head - n + np.arange(n)) % self.max_size
+
+    def _max_priority(self) -> float:
+        if self._count == 0:
+            return 1.0
+        return float(self._arrays["priority"][self._slots()].max())
+
+    def _to_dicts(self, slots: np.ndarray) -> List[dict]:
+        if len(slots) == 0:
+            return []
+        a = self._arrays
+        meta = {slot: (ts, md) for slot, ts, md in self._open_db().execute(
+            f"SELECT slot, timestamp, metadata FROM experience_meta "
+            f"WHERE slot IN ({','.join('?' * len(slots))})", [int(s) for s in slots])}
+        out = []
+        for s in slots:
+            s = int(s)
+            ts, md = meta.get(s, (None, "{}"))
+            out.append({
+                "timestamp": ts,
+                "state": np.array(a["state"][s, :a["state_len"][s]]),
+                "action": int(a["action"][s]),
+                "reward": float(a["reward"][s]),
+                "next_state": np.array(a["next_state"][s, :a["next_len"][s]]),
+                "done": bool(a["done"][s]),
+                "metadata": json.loads(md) if md else {},
+            })
+        return out
+
     def get_recent_experiences(self, n=100):
         """Obtiene las últimas N experiencias"""
-        return self.experiences[-n:] if len(self.experiences) >= n else self.experiences
-    
+        return self._to_dicts(self._slots(n))
+
     def get_all_experiences(self):
         """Obtiene todas las experiencias"""
-        return self.experiences
-    
+        return self._to_dicts(self._slots())
+
+    @property
+    def experiences(self) -> List[dict]:
+        """Vista de compatibilidad (lista de dicts); para contar usar len(buffer)."""
+        return self.get_all_experiences()
+
+    def sample(self, batch_size: int, prioritized: bool = False,
+               alpha: float = 0.6, beta: float = 0.4,
+               rng: Optional[np.random.Generator] = None) -> Dict[str, np.ndarray]:
+        """
+        Lote aleatorio para entrenamiento, uniforme o por prioridad (PER).
+        Devuelve arrays apilados más `indices` (para update_priorities) y
+        `weights` de importance sampling (1.0 en muestreo uniforme).
+        """
+        if self._count == 0:
+            raise ValueError("ExperienceBuffer vacío")
+        rng = rng or np.random.default_rng()
+        valid = self._slots()
+        if prioritized:
+            p = self._arrays["priority"][valid].astype(np.float64) ** alpha
+            p /= p.sum()
+            pick = rng.choice(len(valid), size=batch_size, p=p)
+            weights = (len(valid) * p[pick]) ** -beta
+            weights = (weights / weights.max()).astype(np.float32)
+        else:
+            pick = rng.integers(0, len(valid), size=batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        idx = valid[pick]
+        a = self._arrays
+        return {
+            "state": a["state"][idx], "action": a["action"][idx].astype(np.int64),
+            "reward": a["reward"][idx], "next_state": a["next_state"][idx],
+            "done": a["done"][idx], "indices": idx, "weights": weights,
+        }
+
+    def update_priorities(self, indices, td_errors, eps: float = 1e-6):
+        """Actualiza la prioridad de los slots muestreados con |td_error| + eps."""
+        self._arrays["priority"][np.asarray(indices)] = np.abs(np.asarray(td_errors)) + eps
+
+    # ── Persistencia ──────────────────────────────────────────────────────────
+
     def save(self):
         """Guarda experiencias en disco"""
         try:
-            # Crear directorio si no existe
-            os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
-            
-            # Guardar como JSON
-            with open(self.save_path.replace('.csv', '.json'), 'w') as f:
-                json.dump(self.experiences, f, indent=2)
-            
-            print(f"{len(self.experiences)} experiencias guardadas")
+            for arr in self._arrays.values():
+                arr.flush()
+            db = self._open_db()
+            db.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('ring', ?)",
+                       (json.dumps({"head": self._head, "count": self._count,
+                                    "max_size": self.max_size, "state_dim": self.state_dim}),))
+            db.commit()
+            print(f"{self._count} experiencias guardadas")
         except Exception as e:
             print(f"Error guardando experiencias: {e}")
-    
+
     def load(self):
         """Carga experiencias desde disco"""
         try:
-            json_path = self.save_path.replace('.csv', '.json')
-            if os.path.exists(json_path):
-                with open(json_path, 'r') as f:
-                    self.experiences = json.load(f)
-                print(f"{len(self.experiences)} experiencias cargadas")
-            else:
+            ring = None
+            if os.path.exists(os.path.join(self.dir, "meta.db")):
+                row = self._open_db().execute("SELECT value FROM info WHERE key = 'ring'").fetchone()
+                ring = json.loads(row[0]) if row else None
+            if ring and ring.get("state_dim") and ring.get("max_size") == self.max_size:
+                self._allocate(ring["state_dim"], mode="r+")
+                self._head, self._count = ring["head"], ring["count"]
+                print(f"{self._count} experiencias cargadas")
+            elif ring and ring.get("state_dim"):
+                self._resize_ring(ring)
+            elif not self._import_legacy_json():
                 print("No hay experiencias previas")
         except Exception as e:
             print(f"Error cargando experiencias: {e}")
-            self.experiences = []
-    
+            self._arrays, self._head, self._count = {}, 0, 0
+
+    def _resize_ring(self, ring: dict):
+        """Reabre un buffer guardado con otro max_size conservando las más recientes."""
+        old_size = ring["max_size"]
+        self.max_size, wanted = old_size, self.max_size
+        self._allocate(ring["state_dim"], mode="r+")
+        self._head, self._count = ring["head"], ring["count"]
+
+        keep = self._slots(min(self._count, wanted))
+        # Copia en memoria antes de recrear los archivos con el tamaño nuevo
+        rows = {name: np.array(arr[keep]) for name, arr in self._arrays.items()}
+        db = self._open_db()
+        meta = {slot: (ts, md) for slot, ts, md in db.execute(
+            "SELECT slot, timestamp, metadata FROM experience_meta")}
+        self._arrays = {}
+
+        self.max_size = wanted
+        self._allocate(ring["state_dim"])
+        n = len(keep)
+        for name, values in rows.items():
+            self._arrays[name][:n] = values
+        db.execute("DELETE FROM experience_meta")
+        db.executemany(
+            "INSERT INTO experience_meta (slot, timestamp, metadata) VALUES (?, ?, ?)",
+            [(i, *meta.get(int(old), (None, "{}"))) for i, old in enumerate(keep)])
+        self._head, self._count = n % wanted, n
+        self.save()
+        print(f"{n} experiencias cargadas (buffer redimensionado de {old_size} a {wanted})")
+
+    def _import_legacy_json(self) -> bool:
+        """Importa una vez el experiences.json anterior (no lo borra)."""
+        json_path = self.save_path.replace('.csv', '.json')
+        if not os.path.exists(json_path):
+            return False
+        with open(json_path, 'r') as f:
+            legacy = json.load(f)
+        legacy = legacy[-self.max_size:]
+        if not legacy:
+            return False
+        self.state_dim = self.state_dim or max(len(e.get('state') or [0]) for e in legacy)
+        self._allocate(self.state_dim)
+        db = self._open_db()
+        # Un solo save() al terminar, no uno cada SAVE_EVERY
+        self._autosave = False
+        try:
+            for e in legacy:
+                slot = self._head
+                self.add_experience(e.get('state') or [], e.get('action', 0), e.get('reward', 0.0),
+                                    e.get('next_state') or [], e.get('done', False), e.get('metadata'))
+                if e.get('timestamp'):
+                    db.execute("UPDATE experience_meta SET timestamp = ? WHERE slot = ?",
+                               (e['timestamp'], slot))
+        finally:
+            self._autosave = True
+        self.save()
+        print(f"{self._count} experiencias importadas de {json_path}")
+        return True
+
     def get_statistics(self):
         """Obtiene estadísticas de las experiencias"""
-        if not self.experiences:
+        if self._count == 0:
             return {
                 'total': 0,
                 'wins': 0,
@@ -99,21 +312,23 @@ class ExperienceBuffer:
                 'avg_reward': 0,
                 'total_profit': 0
             }
-        
-        rewards = [exp['reward'] for exp in self.experiences]
-        wins = sum(1 for r in rewards if r > 0)
-        losses = sum(1 for r in rewards if r < 0)
-        
+
+        rewards = self._arrays["reward"][self._slots()].astype(np.float64)
+        wins = int((rewards > 0).sum())
+        losses = int((rewards < 0).sum())
+
         return {
-            'total': len(self.experiences),
+            'total': self._count,
             'wins': wins,
             'losses': losses,
-            'win_rate': (wins / len(self.experiences)) * 100 if self.experiences else 0,
-            'avg_reward': np.mean(rewards),
-            'total_profit': sum(rewards)
+            'win_rate': (wins / self._count) * 100,
+            'avg_reward': float(rewards.mean()),
+            'total_profit': float(rewards.sum())
         }
-    
+
     def clear(self):
         """Limpia todas las experiencias"""
-        self.experiences = []
+        self._head = self._count = 0
+        if self._db is not None or os.path.exists(os.path.join(self.dir, "meta.db")):
+            self._open_db().execute("DELETE FROM experience_meta")
         self.save()
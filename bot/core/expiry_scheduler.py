@@ -0,0 +1,116 @@
+"""
+Expiry Scheduler - Resolución por lotes de operaciones observadas/simuladas
+ObservationalLearner y ParallelTrainer registran cada elemento con su hora de
+vencimiento en un min-heap compartido. run_due() saca de una vez todo lo
+vencido, pide las velas una sola vez por activo (get_candles_multi, que sirve
+desde el stream o la CandleStore cuando puede) y llama al resolver de cada
+elemento con ese DataFrame. El coste crece con los activos, no con los elementos.
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+class ExpiryScheduler:
+    """Min-heap de (vencimiento, seq, activo, velas necesarias, elemento, resolver)."""
+
+    def __init__(self, market_data, timeframe: int = 60, retry_after: float = 5.0,
+                 max_retries: int = 3):
+        self.market_data = market_data
+        self.timeframe = timeframe
+        self.retry_after = retry_after
+        self.max_retries = max_retries
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"resolved": 0, "batches": 0, "fetches": 0, "retried": 0, "dropped": 0}
+
+    def schedule(self, due_time: float, asset: str, item, resolve: Callable[[object, pd.DataFrame], bool],
+                 candles: int = 5, retries: int = 0):
+        """
+        Programa `item` para `due_time`. resolve(item, df) recibe las velas del
+        activo (vacías si la descarga falló) y devuelve False si no pudo
+        resolverlo; entonces se reintenta hasta max_retries veces.
+        """
+        with self._lock:
+            heapq.heappush(self._heap, (due_time, next(self._seq), asset, candles, item, resolve, retries))
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Resuelve todo lo vencido en un lote; devuelve cuántos elementos se resolvieron."""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+        if not due:
+            return 0
+
+        # Una consulta de velas por activo con la ventana más grande pedida
+        needed: Dict[str, int] = {}
+        for _, _, asset, candles, *_ in due:
+            needed[asset] = max(needed.get(asset, 0), candles)
+        frames = self._fetch(needed)
+        self.stats["batches"] += 1
+
+        resolved = 0
+        for due_time, _, asset, candles, item, resolve, retries in due:
+            df = frames.get(asset)
+            if df is None:
+                df = pd.DataFrame()
+            try:
+                ok = bool(resolve(item, df))
+            except Exception as e:
+                print(f"⚠️ Error resolviendo vencimiento en {asset}: {e}")
+                ok = False
+            if ok:
+                resolved += 1
+            elif retries < self.max_retries:
+                self.schedule(now + self.retry_after, asset, item, resolve, candles, retries + 1)
+                self.stats["retried"] += 1
+            else:
+                self.stats["dropped"] += 1
+        self.stats["resolved"] += resolved
+        return resolved
+
+    def _fetch(self, needed: Dict[str, int]) -> Dict[str, pd.DataFrame]:
+        self.stats["fetches"] += len(needed)
+        tf = int(self.timeframe)
+        try:
+            if hasattr(self.market_data, "get_candles_multi"):
+                frames = self.market_data.get_candles_multi([(a, tf, n) for a, n in needed.items()])
+                return {a: frames.get((a, tf)) for a in needed}
+        except Exception as e:
+            print(f"⚠️ Error descargando velas para vencimientos: {e}")
+            return {}
+        out = {}
+        for asset, n in needed.items():
+            try:
+                out[asset] = self.market_data.get_candles(asset, tf, n)
+            except Exception as e:
+                print(f"⚠️ Error descargando velas de {asset}: {e}")
+        return out
+
+
+# Un scheduler por MarketDataHandler, compartido por los learners que lo usan
+_schedulers: Dict[int, Tuple[object, ExpiryScheduler]] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_expiry_scheduler(market_data) -> ExpiryScheduler:
+    with _schedulers_lock:
+        entry = _schedulers.get(id(market_data))
+        if entry is None or entry[0] is not market_data:
+            entry = (market_data, ExpiryScheduler(market_data))
+            _schedulers[id(market_data)] = entry
+        return entry[1]
@@ -0,0 +1,144 @@
+"""
+Latency Profiler — Tiempos por etapa entre "activo elegido" y "orden enviada"
+Cada análisis abre un StageTimer y marca el fin de cada etapa (descarga de
+velas, zonas, contexto, patrón, IA, sizing...). Se guardan ventanas móviles por
+(etapa, activo) para p50/p95/p99 y se exportan periódicamente a JSONL.
+
+Desactivado (por defecto) timer() devuelve un temporizador nulo compartido:
+cada marca es una llamada vacía, sin reloj ni locks.
+Se activa con LATENCY_PROFILE=1; LATENCY_PROFILE_PATH cambia el archivo.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class _NullTimer:
+    """Temporizador del profiler desactivado: no mide nada."""
+
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+    def total(self, stage: str = "total"):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class StageTimer:
+    """Mide etapas consecutivas: cada mark() registra el tiempo desde la anterior."""
+
+    __slots__ = ("_profiler", "_asset", "_start", "_last")
+
+    def __init__(self, profiler: "LatencyProfiler", asset: str):
+        self._profiler = profiler
+        self._asset = asset
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self._profiler.record(stage, self._asset, now - self._last)
+        self._last = now
+
+    def total(self, stage: str = "total"):
+        """Registra el tiempo total desde la creación del timer."""
+        self._profiler.record(stage, self._asset, time.perf_counter() - self._start)
+
+
+class LatencyProfiler:
+    """Ventanas móviles de latencia por (etapa, activo), seguras entre hilos."""
+
+    def __init__(self, enabled: bool = False, window: int = 512,
+                 export_path: Optional[str] = None, export_every: float = 60.0):
+        self.enabled = enabled
+        self.window = window
+        self.export_path = export_path
+        self.export_every = export_every
+        self._samples: Dict[Tuple[str, str], deque] = {}
+        self._lock = threading.Lock()
+        self._last_export = time.time()
+
+    def timer(self, asset: str = ""):
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self, asset)
+
+    def record(self, stage: str, asset: str, seconds: float):
+        key = (stage, asset)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    # ── Consultas ─────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _percentiles(samples) -> Dict:
+        ms = np.fromiter(samples, dtype=float) * 1000
+        p50, p95, p99 = np.percentile(ms, (50, 95, 99))
+        return {"n": len(ms), "p50_ms": float(p50), "p95_ms": float(p95),
+                "p99_ms": float(p99), "max_ms": float(ms.max())}
+
+    def stats(self, by_asset: bool = False) -> Dict[str, Dict]:
+        """Percentiles por etapa (todos los activos juntos) o por 'etapa|activo'."""
+        with self._lock:
+            if by_asset:
+                groups = {f"{stage}|{asset}": list(s) for (stage, asset), s in self._samples.items()}
+            else:
+                groups: Dict[str, List[float]] = {}
+                for (stage, _), s in self._samples.items():
+                    groups.setdefault(stage, []).extend(s)
+        return {name: self._percentiles(s) for name, s in groups.items() if s}
+
+    def top_stages(self, n: int = 4, exclude: Tuple[str, ...] = ()) -> List[Tuple[str, Dict]]:
+        """Las `n` etapas con mayor p95."""
+        ranked = [(k, v) for k, v in self.stats().items() if k not in exclude]
+        ranked.sort(key=lambda kv: kv[1]["p95_ms"], reverse=True)
+        return ranked[:n]
+
+    # ── Exportación ───────────────────────────────────────────────────────────
+
+    def export(self, path: Optional[str] = None):
+        """Añade una línea JSONL por (etapa, activo) con sus percentiles actuales."""
+        path = path or self.export_path
+        if not path:
+            return
+        ts = time.time()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for name, pct in sorted(self.stats(by_asset=True).items()):
+                    stage, asset = name.split("|", 1)
+                    f.write(json.dumps({"ts": ts, "stage": stage, "asset": asset, **pct}) + "\n")
+        except Exception:
+            pass
+        self._last_export = ts
+
+    def maybe_export(self):
+        if self.enabled and time.time() - self._last_export >= self.export_every:
+            self.export()
+
+
+# Singleton
+_profiler: Optional[LatencyProfiler] = None
+
+
+def get_latency_profiler() -> LatencyProfiler:
+    global _profiler
+    if _profiler is None:
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    "..", "..", "logs", "latency.jsonl")
+        _profiler = LatencyProfiler(
+            enabled=os.getenv("LATENCY_PROFILE", "0").lower() in ("1", "true", "yes"),
+            export_path=os.getenv("LATENCY_PROFILE_PATH", default_path),
+        )
+    return _profiler
@@ -5,6 +5,7 @@ Analiza oportunidades que NO se ejecutaron y aprende de ellas
 import time
 import pandas as pd
 from datetime import datetime
+from core.expiry_scheduler import get_expiry_scheduler
 
 class ObservationalLearner:
     """
@@ -14,10 +15,15 @@ class ObservationalLearner:
     - Aprende de los resultados
     """
     
-    def __init__(self, continuous_learner, market_data, feature_engineer):
+    def __init__(self, continuous_learner, market_data, feature_engineer, scheduler=None):
         self.continuous_learner = continuous_learner
         self.market_data = market_data
         self.feature_engineer = feature_engineer
+
+        # Vencimientos compartidos con ParallelTrainer (una descarga por activo)
+        self.scheduler = scheduler or get_expiry_scheduler(market_data)
+        self._learned = 0
+        self._state_cache = {}  # activo -> (última vela, features preparadas)
         
         # Registro de oportunidades observadas
         self.observed_opportunities = []
@@ -48,9 +54,19 @@ class ObservationalLearner:
         
         self.observed_opportunities.append(observation)
         
-        # Limitar tamaño
+        # Limitar tamaño (las descartadas ya no se verifican)
         if len(self.observed_opportunities) > self.max_observations:
+            for old in self.observed_opportunities[:-self.max_observations]:
+                old['expired'] = True
             self.observed_opportunities = self.observed_opportunities[-self.max_observations:]
+
+        self.scheduler.schedule(
+            observation['timestamp'] + self.observation_duration,
+            observation['asset'],
+            observation,
+            self._resolve_observation,
+            candles=200
+        )
         
         print(f"👁️ Oportunidad observada: {observation['action']} en {observation['asset']}")
         print(f"   Razón no ejecutada: {reason_not_executed}")
@@ -60,40 +76,43 @@ class ObservationalLearner:
         Verifica resultados de oportunidades observadas
         y aprende de ellas
         """
-        current_time = time.time()
-        learned_count = 0
-        
-        for obs in self.observed_opportunities:
-            # Solo verificar observaciones no checadas y con tiempo suficiente
-            if not obs['checked'] and (current_time - obs['timestamp']) >= self.observation_duration:
-                result = self._check_observation_result(obs)
-                
-                if result:
-                    # Agregar como experiencia de aprendizaje
-                    self._add_observation_experience(obs, result)
-                    obs['checked'] = True
-                    learned_count += 1
+        # Resuelve en lote todo lo vencido (también simulaciones de ParallelTrainer)
+        self.scheduler.run_due()
+
+        learned_count, self._learned = self._learned, 0
         
         if learned_count > 0:
             print(f"📚 Aprendidas {learned_count} observaciones")
         
         return learned_count
+
+    def _resolve_observation(self, obs, df):
+        """Resolver del scheduler: False para reintentar más tarde."""
+        if obs['checked'] or obs.get('expired'):
+            return True
+
+        result = self._check_observation_result(obs, df)
+        if not result:
+            return False
+
+        # Agregar como experiencia de aprendizaje
+        self._add_observation_experience(obs, result, df)
+        obs['checked'] = True
+        self._learned += 1
+        return True
     
-    def _check_observation_result(self, observation):
+    def _check_observation_result(self, observation, df):
         """
         Verifica qué habría pasado si se hubiera ejecutado la operación
         
+        Args:
+            observation: observación registrada
+            df: velas recientes del activo (compartidas por el lote)
+
         Returns:
             dict con resultado o None si no se puede verificar
         """
         try:
-            # Obtener precio actual
-            df = self.market_data.get_candles(
-                observation['asset'],
-                60,
-                2  # Solo necesitamos 2 velas
-            )
-            
             if df.empty or len(df) < 2:
                 return None
             
@@ -120,22 +139,16 @@ class ObservationalLearner:
             print(f"⚠️ Error verificando observación: {e}")
             return None
     
-    def _add_observation_experience(self, observation, result):
+    def _add_observation_experience(self, observation, result, df_after):
         """
         Agrega la observación como experiencia de aprendizaje
         """
         try:
-            # Obtener estado después
-            df_after = self.market_data.get_candles(
-                observation['asset'],
-                60,
-                200
-            )
-            
+            # Estado después: features de las velas del lote, una vez por activo y vela
             if df_after.empty:
                 return
             
-            df_after = self.feature_engineer.prepare_for_rl(df_after)
+            df_after = self._prepared_state(observation['asset'], df_after)
             
             if df_after.empty or len(df_after) < 10:
                 return
@@ -173,6 +186,14 @@ class ObservationalLearner:
         except Exception as e:
             print(f"⚠️ Error agregando experiencia observacional: {e}")
     
+    def _prepared_state(self, asset, df):
+        key = (df.index[-1], len(df))
+        cached = self._state_cache.get(asset)
+        if cached is None or cached[0] != key:
+            cached = (key, self.feature_engineer.prepare_for_rl(df))
+            self._state_cache[asset] = cached
+        return cached[1]
+
     def get_statistics(self):
         """
         Obtiene estadísticas de aprendizaje observacional
@@ -7,6 +7,7 @@ import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional
 from database.db_manager import db
+from core.expiry_scheduler import get_expiry_scheduler
 import json
 
 class ParallelTrainer:
@@ -15,14 +16,15 @@ class ParallelTrainer:
     Analiza TODAS las oportunidades (reversiones y continuaciones)
     """
     
-    def __init__(self, market_data, feature_engineer, agent, llm_client=None):
+    def __init__(self, market_data, feature_engineer, agent, llm_client=None, scheduler=None):
         self.market_data = market_data
         self.feature_engineer = feature_engineer
         self.agent = agent
         self.llm_client = llm_client
         
-        # Operaciones simuladas en seguimiento
+        # Operaciones simuladas en seguimiento (resueltas por vencimiento en el scheduler)
         self.simulated_trades = []
+        self.scheduler = scheduler or get_expiry_scheduler(market_data)
         
         # Estadísticas de entrenamiento
         self.training_stats = {
@@ -343,6 +345,13 @@ class ParallelTrainer:
             }
             
             self.simulated_trades.append(trade)
+            self.scheduler.schedule(
+                trade['entry_time'] + trade['duration'] + 10,
+                asset,
+                trade,
+                self._resolve_simulated,
+                candles=5
+            )
             self.training_stats['total_simulated'] += 1
             
             print(f"[TRAINING] Simulando {strategy.upper()}: {direction.upper()} en {asset}")
@@ -352,22 +361,19 @@ class ParallelTrainer:
     
     def check_simulated_trades(self):
         """Verifica resultados de operaciones simuladas"""
-        completed = []
-        
-        for trade in self.simulated_trades:
-            # Verificar si ya pasó el tiempo
-            if time.time() - trade['entry_time'] >= trade['duration'] + 10:
-                completed.append(trade)
-        
-        for trade in completed:
-            self.simulated_trades.remove(trade)
-            self._process_simulated_result(trade)
+        # Un lote por llamada: velas una vez por activo para todo lo vencido
+        self.scheduler.run_due()
+    
+    def _resolve_simulated(self, trade: Dict, df: pd.DataFrame) -> bool:
+        """Resolver del scheduler: la simulación se cierra aunque no haya velas."""
+        self.simulated_trades = [t for t in self.simulated_trades if t is not trade]
+        self._process_simulated_result(trade, df)
+        return True
     
-    def _process_simulated_result(self, trade: Dict):
+    def _process_simulated_result(self, trade: Dict, df: pd.DataFrame):
         """Procesa el resultado de una operación simulada"""
         try:
-            # Obtener precio de salida
-            df = self.market_data.get_candles(trade['asset'], 60, 5)
+            # Precio de salida: última vela del lote
             if df.empty:
                 return
             
@@ -0,0 +1,338 @@
+"""
+Replay Harness - Walk-forward offline del IntelligentEngine
+Reproduce el camino de decisión en vivo (IntelligentEngine.analyze con
+ZoneDetector, ContextAnalyzer, MarketAI y AdaptiveLearner) contra velas M1
+grabadas en Parquet/CSV, con un reloj simulado y sin conexión al broker.
+
+Uso:
+    python -m core.replay_harness --data data/history --assets EURUSD-OTC GBPUSD-OTC --processes 2
+
+Cada archivo <data>/<ASSET>.parquet (o .csv) debe tener columnas
+timestamp|from, open, high|max, low|min, close y opcionalmente volume.
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SimClock:
+    """Reloj simulado: el harness fija `now` antes de cada analyze()."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = float(now)
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CandleArchive:
+    """
+    Velas M1 de un activo en arrays NumPy + M5/M15/H1 precalculadas.
+
+    En el instante `now` (apertura de una vela M1) solo son visibles las velas
+    cerradas antes de `now`; la vela en formación de cada timeframe se arma con
+    los M1 ya cerrados del periodo más la apertura de la vela actual, igual que
+    la vería el bot en vivo, sin mirar el futuro.
+    """
+
+    _RENAME = {'from': 'timestamp', 'max': 'high', 'min': 'low'}
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.rename(columns=self._RENAME)
+        if 'timestamp' not in df.columns:
+            df = df.reset_index().rename(columns={df.index.name or 'index': 'timestamp'})
+        ts = df['timestamp']
+        if np.issubdtype(ts.dtype, np.number):
+            epoch = ts.to_numpy(dtype=np.int64)
+        else:
+            epoch = pd.to_datetime(ts).astype('int64').to_numpy() // 10**9
+        if 'volume' not in df.columns:
+            df['volume'] = 0.0
+
+        order = np.argsort(epoch, kind='stable')
+        self.ts = epoch[order]
+        self.cols = {c: df[c].to_numpy(dtype=float)[order]
+                     for c in ('open', 'high', 'low', 'close', 'volume')}
+        self._htf: Dict[int, Dict[str, np.ndarray]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "CandleArchive":
+        if path.endswith('.parquet'):
+            return cls(pd.read_parquet(path))
+        return cls(pd.read_csv(path))
+
+    def __len__(self):
+        return len(self.ts)
+
+    def _resampled(self, tf: int) -> Dict[str, np.ndarray]:
+        """Velas completas de `tf` segundos agregadas desde M1 (una sola vez)."""
+        if tf not in self._htf:
+            bucket = self.ts // tf * tf
+            starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+            ends = np.r_[starts[1:], len(bucket)]
+            self._htf[tf] = {
+                'ts': bucket[starts],
+                'open': self.cols['open'][starts],
+                'high': np.maximum.reduceat(self.cols['high'], starts),
+                'low': np.minimum.reduceat(self.cols['low'], starts),
+                'close': self.cols['close'][ends - 1],
+                'volume': np.add.reduceat(self.cols['volume'], starts),
+            }
+        return self._htf[tf]
+
+    def frame(self, tf: int, now: float, n: int) -> pd.DataFrame:
+        """Últimas `n` velas de `tf` visibles en `now`, la última en formación."""
+        k = int(np.searchsorted(self.ts, now, side='left'))
+        if k >= len(self.ts):
+            return pd.DataFrame()
+        current_open = self.cols['open'][k]
+
+        start = int(now) // tf * tf
+        bars = self._resampled(tf) if tf > 60 else dict(self.cols, ts=self.ts)
+        done = int(np.searchsorted(bars['ts'], start, side='left'))
+        lo = max(0, done - (n - 1))
+
+        # Vela en formación: M1 cerrados del periodo + apertura de la actual
+        i0 = int(np.searchsorted(self.ts, start, side='left'))
+        if i0 < k:
+            forming = (
+                self.cols['open'][i0],
+                max(self.cols['high'][i0:k].max(), current_open),
+                min(self.cols['low'][i0:k].min(), current_open),
+                current_open,
+                self.cols['volume'][i0:k].sum(),
+            )
+        else:
+            forming = (current_open, current_open, current_open, current_open, 0.0)
+
+        data = {c: np.append(bars[c][lo:done], v)
+                for c, v in zip(('open', 'high', 'low', 'close', 'volume'), forming)}
+        index = pd.to_datetime(np.append(bars['ts'][lo:done], start), unit='s')
+        index.name = 'timestamp'
+        return pd.DataFrame(data, index=index)
+
+    def price_at(self, t: float) -> Optional[float]:
+        """Precio en el instante t = cierre de la última M1 cerrada antes de t."""
+        if not len(self.ts) or t > self.ts[-1] + 60:
+            return None
+        k = int(np.searchsorted(self.ts, t - 60, side='right')) - 1
+        return float(self.cols['close'][k]) if k >= 0 else None
+
+
+class ReplayMarketData:
+    """market_data falso para IntelligentEngine: sirve ventanas al reloj simulado."""
+
+    connected = True
+    api = None
+
+    def __init__(self, archives: Dict[str, CandleArchive], clock: SimClock):
+        self.archives = archives
+        self.clock = clock
+
+    def get_candles(self, asset, timeframe, num_candles, end_time=None):
+        archive = self.archives.get(asset)
+        if archive is None:
+            return pd.DataFrame()
+        now = self.clock() if end_time is None else end_time
+        df = archive.frame(int(timeframe), now, int(num_candles))
+        df.attrs.update(asset=asset, timeframe=int(timeframe))
+        return df
+
+    def get_candles_multi(self, queries):
+        return {(a, int(tf)): self.get_candles(a, tf, n) for a, tf, n in queries}
+
+    def get_current_price(self, asset):
+        archive = self.archives.get(asset)
+        return archive.price_at(self.clock()) if archive else None
+
+
+@dataclass
+class ReplayReport:
+    asset: str
+    bars: int = 0
+    signals: int = 0
+    trades: int = 0
+    wins: int = 0
+    losses: int = 0
+    draws: int = 0
+    unsettled: int = 0
+    win_rate: float = 0.0
+    latency_ms_mean: float = 0.0
+    latency_ms_p50: float = 0.0
+    latency_ms_p95: float = 0.0
+    latency_ms_max: float = 0.0
+    bars_per_sec: float = 0.0
+    elapsed_sec: float = 0.0
+    trade_log: List[Dict] = field(default_factory=list)
+
+
+def _build_engine(clock: SimClock, workdir: str):
+    """IntelligentEngine aislado: memoria e historial de zonas en un directorio temporal."""
+    from engine.intelligent_engine import IntelligentEngine
+    from brain.brain_store import BrainStore
+    from brain.market_memory import MarketMemory
+    from brain.market_session import MarketSession
+    from brain.zone_reaction_history import ZoneReactionHistory
+
+    engine = IntelligentEngine(clock=clock)
+    store = BrainStore(os.path.join(workdir, "brain_state.db"))
+    engine.memory = MarketMemory(os.path.join(workdir, "learning_state.json"), store=store)
+    engine.zone_history = ZoneReactionHistory(os.path.join(workdir, "zone_reactions.json"), store=store)
+    engine.session = MarketSession(clock=clock)
+    engine._warmup_seconds = 0
+    return engine
+
+
+def replay_asset(asset: str, path: str, step: int = 1, warmup_bars: int = 300,
+                 min_confidence: float = 0.70, max_bars: Optional[int] = None) -> ReplayReport:
+    """
+    Recorre la historia M1 de `asset` vela a vela (cada `step` velas), llama a
+    analyze() y liquida cada TRADE con el precio real al vencimiento.
+    Una posición abierta por activo, como en vivo.
+    """
+    archive = CandleArchive.load(path)
+    clock = SimClock()
+    market_data = ReplayMarketData({asset: archive}, clock)
+    report = ReplayReport(asset=asset)
+
+    with tempfile.TemporaryDirectory(prefix="replay_") as workdir:
+        engine = _build_engine(clock, workdir)
+        end = len(archive) if max_bars is None else min(len(archive), warmup_bars + max_bars)
+        latencies = []
+        open_until = -np.inf
+        started = time.perf_counter()
+
+        for k in range(warmup_bars, end, max(1, step)):
+            clock.now = float(archive.ts[k])
+            t0 = time.perf_counter()
+            signal = engine.analyze(asset, market_data)
+            latencies.append(time.perf_counter() - t0)
+            report.bars += 1
+
+            if not signal or signal.get("action") != "TRADE":
+                continue
+            report.signals += 1
+            if clock.now < open_until or signal.get("confidence", 0) < min_confidence:
+                continue
+
+            expiration = int(signal.get("expiration", 60))
+            entry = float(archive.cols['open'][k])
+            exit_ = archive.price_at(clock.now + expiration)
+            open_until = clock.now + expiration
+            if exit_ is None:
+                report.unsettled += 1
+                continue
+
+            direction = signal.get("signal", "CALL")
+            move = exit_ - entry if direction == "CALL" else entry - exit_
+            result = "WIN" if move > 0 else "LOSS" if move < 0 else "DRAW"
+            report.trades += 1
+            report.wins += result == "WIN"
+            report.losses += result == "LOSS"
+            report.draws += result == "DRAW"
+            report.trade_log.append({
+                "time": int(clock.now), "direction": direction, "entry": entry,
+                "exit": exit_, "expiration": expiration, "result": result,
+                "confidence": float(signal.get("confidence", 0)),
+                "pattern": signal.get("pattern"), "zone": signal.get("zone"),
+            })
+
+            # Igual que settle_trade en vivo: la zona aprende del resultado
+            zone = signal.get("zone_object")
+            if zone is not None and result != "DRAW":
+                reacted = result == "WIN" and (
+                    (direction == "CALL" and zone.zone_type == "support") or
+                    (direction == "PUT" and zone.zone_type == "resistance"))
+                engine.memory.add_or_update_zone(asset, zone.level, zone.zone_type, reacted)
+
+        report.elapsed_sec = time.perf_counter() - started
+        engine.memory.store.close()
+
+    decided = report.wins + report.losses
+    report.win_rate = report.wins / decided if decided else 0.0
+    if latencies:
+        ms = np.asarray(latencies) * 1000
+        report.latency_ms_mean = float(ms.mean())
+        report.latency_ms_p50 = float(np.percentile(ms, 50))
+        report.latency_ms_p95 = float(np.percentile(ms, 95))
+        report.latency_ms_max = float(ms.max())
+    if report.elapsed_sec > 0:
+        report.bars_per_sec = report.bars / report.elapsed_sec
+    return report
+
+
+def _replay_job(args) -> Dict:
+    return asdict(replay_asset(*args[:2], **args[2]))
+
+
+def run_replay(paths: Dict[str, str], processes: int = 1, **kwargs) -> List[ReplayReport]:
+    """Replay de varios activos; con processes > 1, un proceso por activo."""
+    jobs = [(asset, path, kwargs) for asset, path in paths.items()]
+    if processes <= 1 or len(jobs) <= 1:
+        results = [_replay_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_replay_job, jobs))
+    return [ReplayReport(**r) for r in results]
+
+
+def format_report(reports: List[ReplayReport]) -> str:
+    lines = ["=" * 96,
+             f"{'Activo':<14}{'Velas':>8}{'Trades':>8}{'W/L/D':>12}{'WinRate':>9}"
+             f"{'Lat ms p50':>12}{'p95':>8}{'max':>8}{'velas/s':>10}",
+             "-" * 96]
+    for r in reports:
+        lines.append(
+            f"{r.asset:<14}{r.bars:>8}{r.trades:>8}{f'{r.wins}/{r.losses}/{r.draws}':>12}"
+            f"{r.win_rate * 100:>8.1f}%{r.latency_ms_p50:>12.1f}{r.latency_ms_p95:>8.1f}"
+            f"{r.latency_ms_max:>8.1f}{r.bars_per_sec:>10.1f}"
+        )
+    wins = sum(r.wins for r in reports)
+    decided = wins + sum(r.losses for r in reports)
+    lines.append("-" * 96)
+    lines.append(f"TOTAL trades={sum(r.trades for r in reports)} "
+                 f"win_rate={(wins / decided * 100) if decided else 0:.1f}%")
+    lines.append("=" * 96)
+    return "\n".join(lines)
+
+
+def _find_archive(data_dir: str, asset: str) -> Optional[str]:
+    for ext in (".parquet", ".csv"):
+        path = os.path.join(data_dir, asset + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay offline del IntelligentEngine")
+    parser.add_argument("--data", required=True, help="Directorio con <ASSET>.parquet|csv")
+    parser.add_argument("--assets", nargs="+", required=True)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--step", type=int, default=1, help="Velas M1 entre llamadas a analyze()")
+    parser.add_argument("--warmup", type=int, default=300, help="Velas M1 iniciales sin analizar")
+    parser.add_argument("--max-bars", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = {}
+    for asset in args.assets:
+        path = _find_archive(args.data, asset)
+        if path is None:
+            print(f" Sin datos para {asset} en {args.data}")
+            continue
+        paths[asset] = path
+
+    reports = run_replay(paths, processes=args.processes, step=args.step,
+                         warmup_bars=args.warmup, max_bars=args.max_bars)
+    print(format_report(reports))
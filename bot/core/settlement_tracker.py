@@ -0,0 +1,120 @@
+"""
+Settlement Tracker — Seguimiento asíncrono de posiciones abiertas
+La orden se coloca y el bot sigue escaneando; un hilo monitor resuelve cada
+posición cuando llega su socket-option-closed y el aprendizaje post-trade
+corre en un worker de fondo.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class OpenPosition:
+    order_id: object
+    asset: str
+    direction: str
+    amount: float
+    expiration: int                 # segundos
+    opened_at: float = field(default_factory=time.time)
+    payload: Dict = field(default_factory=dict)   # señal, duración, etc.
+
+    @property
+    def expires_at(self) -> float:
+        return self.opened_at + self.expiration
+
+
+class SettlementTracker:
+    """
+    Posiciones abiertas + límites de exposición.
+
+    resolve_fn(order_id) -> (estado, profit) o None si sigue abierta (no bloquea)
+    on_settled(position, estado, profit) -> callback de aprendizaje; estado None
+        si no hubo confirmación tras `timeout` segundos desde el vencimiento
+    wait_fn(segundos) -> bloquea hasta el próximo evento del broker
+    """
+
+    def __init__(self, resolve_fn: Callable, on_settled: Callable,
+                 wait_fn: Optional[Callable[[float], None]] = None,
+                 max_per_asset: int = 1, max_open: int = 3,
+                 timeout: float = 120.0):
+        self.resolve_fn = resolve_fn
+        self.on_settled = on_settled
+        self.wait_fn = wait_fn or time.sleep
+        self.max_per_asset = max_per_asset
+        self.max_open = max_open
+        self.timeout = timeout
+
+        self._positions: Dict[object, OpenPosition] = {}
+        self._lock = threading.Lock()
+        self._running = True
+        # Un solo worker: el aprendizaje se aplica en orden de cierre
+        self._learning = ThreadPoolExecutor(max_workers=1, thread_name_prefix="settle")
+        self._monitor = threading.Thread(target=self._run, name="settlement", daemon=True)
+        self._monitor.start()
+
+    # ── Exposición ────────────────────────────────────────────────────────────
+
+    def can_open(self, asset: str) -> Optional[str]:
+        """None si se puede abrir otra posición en `asset`; si no, el motivo."""
+        with self._lock:
+            total = len(self._positions)
+            on_asset = sum(1 for p in self._positions.values() if p.asset == asset)
+        if total >= self.max_open:
+            return f"Exposicion total: {total}/{self.max_open} posiciones abiertas"
+        if on_asset >= self.max_per_asset:
+            return f"Exposicion {asset}: {on_asset}/{self.max_per_asset} posiciones abiertas"
+        return None
+
+    def open(self, position: OpenPosition):
+        with self._lock:
+            self._positions[position.order_id] = position
+
+    def open_positions(self) -> List[OpenPosition]:
+        with self._lock:
+            return list(self._positions.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._positions)
+
+    # ── Monitor ───────────────────────────────────────────────────────────────
+
+    def _run(self):
+        while self._running:
+            for position, result in self._collect():
+                status, profit = result if result else (None, None)
+                try:
+                    self._learning.submit(self._settle, position, status, profit)
+                except RuntimeError:
+                    return  # stop() ya cerró el worker
+            self.wait_fn(1.0 if len(self) else 2.0)
+
+    def _collect(self) -> List[Tuple[OpenPosition, Optional[tuple]]]:
+        now = time.time()
+        settled = []
+        for position in self.open_positions():
+            try:
+                result = self.resolve_fn(position.order_id)
+            except Exception:
+                result = None
+            if result is not None or now > position.expires_at + self.timeout:
+                settled.append((position, result))
+        if settled:
+            with self._lock:
+                for position, _ in settled:
+                    self._positions.pop(position.order_id, None)
+        return settled
+
+    def _settle(self, position: OpenPosition, status, profit):
+        try:
+            self.on_settled(position, status, profit)
+        except Exception as e:
+            print(f"⚠️ Error liquidando orden {position.order_id}: {e}")
+
+    def stop(self, wait: bool = True):
+        """Detiene el monitor; con wait=True espera el aprendizaje pendiente."""
+        self._running = False
+        self._learning.shutdown(wait=wait)
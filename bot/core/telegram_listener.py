@@ -1,14 +1,25 @@
 """
 Telegram Signal Listener
 Escucha señales de trading de grupos/canales de Telegram usando Telethon
+
+Pipeline de ingesta (el loop de Telethon nunca espera a la red ni a la orden):
+  1. Filtro por event.chat_id (sin get_chat)
+  2. Parseo en un hilo de trabajo (SmartSignalParser; SignalParser si no hay Groq)
+  3. Deduplicación de la misma señal reenviada por varios canales
+  4. Marca de tiempo al recibir y cola acotada
+  5. Consumidores que ejecutan signal_callback en un pool de hilos
+La latencia señal→orden se registra por canal (get_latency_stats).
 """
 
 import asyncio
 import os
-from typing import Callable, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
 from datetime import datetime
-from telethon import TelegramClient, events
+from telethon import TelegramClient, events, utils
 from telethon.errors import SessionPasswordNeededError
+from core.latency_profiler import LatencyProfiler
 from core.signal_parser import SignalParser
 
 class TelegramListener:
@@ -25,7 +36,10 @@ class TelegramListener:
         api_hash: str,
         phone: str,
         session_name: str = "trading_session",
-        signal_callback: Optional[Callable] = None
+        signal_callback: Optional[Callable] = None,
+        queue_size: int = 100,
+        executor_workers: int = 4,
+        dedup_window: float = 120.0
     ):
         """
         Args:
@@ -34,6 +48,9 @@ class TelegramListener:
             phone: Número de teléfono (formato internacional: +573001234567)
             session_name: Nombre del archivo de sesión
             signal_callback: Función a llamar cuando se detecta una señal
+            queue_size: Máximo de señales esperando ejecución
+            executor_workers: Señales ejecutándose a la vez
+            dedup_window: Segundos en que una señal idéntica se considera duplicada
         """
         self.api_id = api_id
         self.api_hash = api_hash
@@ -41,8 +58,27 @@ class TelegramListener:
         self.session_name = session_name
         self.signal_callback = signal_callback
         
-        # Parser de señales
-        self.parser = SignalParser()
+        # Parser de señales: IA si hay Groq configurado, regex si no
+        try:
+            from core.smart_signal_parser import SmartSignalParser
+            self.parser = SmartSignalParser()
+            self._parse = self.parser.parse_with_ai
+        except Exception as e:
+            print(f"⚠️ SmartSignalParser no disponible ({e}), usando SignalParser")
+            self.parser = SignalParser()
+            self._parse = self.parser.parse
+        
+        # Pipeline de ingesta
+        self.queue_size = queue_size
+        self.executor_workers = executor_workers
+        self.dedup_window = dedup_window
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumers = []
+        self._parse_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tg-parse")
+        self._exec_pool = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="tg-exec")
+        self._recent_signals: Dict[tuple, float] = {}
+        self._chat_titles: Dict[int, str] = {}
+        self.latency = LatencyProfiler(enabled=True, window=256)
         
         # Cliente de Telegram
         self.client = TelegramClient(session_name, api_id, api_hash)
@@ -51,10 +87,12 @@ class TelegramListener:
         self.messages_received = 0
         self.signals_detected = 0
         self.signals_executed = 0
+        self.signals_duplicated = 0
+        self.signals_dropped = 0
         
         # Estado
         self.is_running = False
-        self.monitored_chats = []
+        self.monitored_chats = set()
     
     async def start(self):
         """Inicia el cliente de Telegram"""
@@ -83,8 +121,12 @@ class TelegramListener:
         """
         try:
             entity = await self.client.get_entity(chat_identifier)
-            self.monitored_chats.append(entity.id)
-            print(f"✅ Monitoreando: {entity.title} (ID: {entity.id})")
+            # event.chat_id usa el ID "marcado" (-100... en canales), no entity.id
+            chat_id = utils.get_peer_id(entity)
+            title = getattr(entity, 'title', None) or getattr(entity, 'username', None) or str(chat_id)
+            self.monitored_chats.add(chat_id)
+            self._chat_titles[chat_id] = title
+            print(f"✅ Monitoreando: {title} (ID: {chat_id})")
             return True
         except Exception as e:
             print(f"❌ Error agregando chat {chat_identifier}: {e}")
@@ -96,59 +138,146 @@ class TelegramListener:
     
     async def handle_new_message(self, event):
         """
-        Maneja nuevos mensajes recibidos
+        Maneja nuevos mensajes recibidos: filtra, parsea fuera del loop,
+        deduplica y encola. La ejecución la hacen los consumidores.
         
         Args:
             event: Evento de nuevo mensaje de Telethon
         """
+        received_at = time.time()
         try:
             self.messages_received += 1
             
+            # Solo procesar si es de un chat monitoreado (sin ida y vuelta a la red)
+            chat_id = event.chat_id
+            if self.monitored_chats and chat_id not in self.monitored_chats:
+                return
+            
             # Obtener texto del mensaje
             message_text = event.message.message
+            if not message_text:
+                return
             
-            # Información del chat
-            chat = await event.get_chat()
-            chat_title = getattr(chat, 'title', 'Privado')
+            # Parsear señal en un hilo (el parser IA hace una llamada HTTP)
+            loop = asyncio.get_running_loop()
+            signal = await loop.run_in_executor(self._parse_pool, self._parse, message_text)
             
-            # Solo procesar si es de un chat monitoreado
-            if self.monitored_chats and event.chat_id not in self.monitored_chats:
+            if not signal:
                 return
             
-            # Parsear señal
-            signal = self.parser.parse(message_text)
+            chat_title = self._chat_title(event)
+            self.latency.record("parse", chat_title, time.time() - received_at)
             
-            if signal:
-                self.signals_detected += 1
-                
-                print(f"\n{'='*60}")
-                print(f"🎯 SEÑAL DETECTADA #{self.signals_detected}")
-                print(f"{'='*60}")
-                print(f"📱 Chat: {chat_title}")
-                print(f"💬 Mensaje: {message_text}")
-                print(f"📊 Asset: {signal['asset']}")
-                print(f"📈 Dirección: {signal['direction'].upper()}")
-                print(f"⏱️  Expiración: {signal['expiration']} min")
-                print(f"🕐 Hora: {datetime.now().strftime('%H:%M:%S')}")
-                print(f"{'='*60}\n")
-                
-                # Ejecutar callback si está configurado
-                if self.signal_callback:
-                    try:
-                        # Llamar callback (puede ser sync o async)
-                        if asyncio.iscoroutinefunction(self.signal_callback):
-                            await self.signal_callback(signal)
-                        else:
-                            self.signal_callback(signal)
-                        
-                        self.signals_executed += 1
-                        print(f"✅ Señal ejecutada correctamente\n")
-                    except Exception as e:
-                        print(f"❌ Error ejecutando señal: {e}\n")
+            if self._is_duplicate(signal, received_at):
+                self.signals_duplicated += 1
+                print(f"🔁 Señal duplicada ignorada ({chat_title}): {signal.get('asset')} {str(signal.get('direction', '')).upper()}")
+                return
+            
+            self.signals_detected += 1
+            signal['received_at'] = received_at
+            signal['chat_id'] = chat_id
+            signal['chat_title'] = chat_title
+            posted = getattr(event.message, 'date', None)
+            signal['posted_at'] = posted.timestamp() if posted else None
+            
+            print(f"\n{'='*60}")
+            print(f"🎯 SEÑAL DETECTADA #{self.signals_detected}")
+            print(f"{'='*60}")
+            print(f"📱 Chat: {chat_title}")
+            print(f"💬 Mensaje: {message_text}")
+            print(f"📊 Asset: {signal.get('asset')}")
+            print(f"📈 Dirección: {str(signal.get('direction', '')).upper()}")
+            print(f"⏱️  Expiración: {signal.get('expiration')} min")
+            print(f"🕐 Hora: {datetime.fromtimestamp(received_at).strftime('%H:%M:%S')}")
+            print(f"{'='*60}\n")
+            
+            self._enqueue(signal)
         
         except Exception as e:
             print(f"⚠️ Error procesando mensaje: {e}")
     
+    def _chat_title(self, event) -> str:
+        """Título del chat desde la caché local (event.chat no hace peticiones)."""
+        title = self._chat_titles.get(event.chat_id)
+        if title is None:
+            chat = getattr(event, 'chat', None)
+            title = getattr(chat, 'title', None) or ('Privado' if chat is not None else str(event.chat_id))
+            self._chat_titles[event.chat_id] = title
+        return title
+    
+    def _is_duplicate(self, signal: dict, now: float) -> bool:
+        """Misma señal (activo, dirección, expiración, hora) vista hace menos de dedup_window."""
+        key = (
+            signal.get('asset'),
+            str(signal.get('direction', '')).lower(),
+            signal.get('expiration'),
+            signal.get('entry_time'),
+        )
+        # Purgar entradas vencidas
+        expired = [k for k, t in self._recent_signals.items() if now - t > self.dedup_window]
+        for k in expired:
+            del self._recent_signals[k]
+        
+        if key in self._recent_signals:
+            return True
+        self._recent_signals[key] = now
+        return False
+    
+    def _enqueue(self, signal: dict):
+        """Encola la señal; con la cola llena descarta la más antigua (la más vieja vale menos)."""
+        if self._queue is None:
+            self._start_pipeline()
+        try:
+            self._queue.put_nowait(signal)
+        except asyncio.QueueFull:
+            stale = self._queue.get_nowait()
+            self._queue.task_done()
+            self.signals_dropped += 1
+            print(f"⚠️ Cola de señales llena, descartada: {stale.get('asset')} de {stale.get('chat_title')}")
+            self._queue.put_nowait(signal)
+    
+    def _start_pipeline(self):
+        """Crea la cola y los consumidores en el loop actual."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._consumers = [
+            asyncio.create_task(self._consume(), name=f"tg-signal-{i}")
+            for i in range(self.executor_workers)
+        ]
+    
+    async def _consume(self):
+        """Consumidor: ejecuta señales de la cola sin bloquear el loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            signal = await self._queue.get()
+            try:
+                await self._execute_signal(signal, loop)
+            finally:
+                self._queue.task_done()
+    
+    async def _execute_signal(self, signal: dict, loop):
+        if not self.signal_callback:
+            return
+        channel = signal.get('chat_title', '')
+        self.latency.record("queue", channel, time.time() - signal['received_at'])
+        try:
+            # Llamar callback (puede ser sync o async)
+            if asyncio.iscoroutinefunction(self.signal_callback):
+                await self.signal_callback(signal)
+            else:
+                await loop.run_in_executor(self._exec_pool, self.signal_callback, signal)
+            
+            done = time.time()
+            self.latency.record("signal_to_order", channel, done - signal['received_at'])
+            if signal.get('posted_at'):
+                self.latency.record("post_to_order", channel, done - signal['posted_at'])
+            
+            self.signals_executed += 1
+            print(f"✅ Señal ejecutada correctamente ({(done - signal['received_at']) * 1000:.0f} ms desde recepción)\n")
+        except Exception as e:
+            print(f"❌ Error ejecutando señal: {e}\n")
+    
     async def listen(self, chat_identifiers: list = None):
         """
         Inicia la escucha de mensajes. Se asegura de estar conectado primero.
@@ -168,6 +297,9 @@ class TelegramListener:
         else:
             print("⚠️ Monitoreando TODOS los chats (puede generar muchas notificaciones)")
         
+        # Cola y consumidores antes de recibir mensajes
+        self._start_pipeline()
+        
         # Registrar handler de mensajes
         @self.client.on(events.NewMessage())
         async def message_handler(event):
@@ -188,6 +320,13 @@ class TelegramListener:
         print("\n🛑 Deteniendo Telegram Listener...")
         self.is_running = False
         await self.client.disconnect()
+        
+        for task in self._consumers:
+            task.cancel()
+        self._consumers = []
+        self._queue = None
+        self._parse_pool.shutdown(wait=False)
+        self._exec_pool.shutdown(wait=False)
         print("✅ Desconectado de Telegram")
     
     def get_stats(self) -> dict:
@@ -196,9 +335,16 @@ class TelegramListener:
             'messages_received': self.messages_received,
             'signals_detected': self.signals_detected,
             'signals_executed': self.signals_executed,
+            'signals_duplicated': self.signals_duplicated,
+            'signals_dropped': self.signals_dropped,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
             'is_running': self.is_running,
             'monitored_chats': len(self.monitored_chats)
         }
+    
+    def get_latency_stats(self) -> dict:
+        """Percentiles por 'etapa|canal': parse, queue, signal_to_order, post_to_order."""
+        return self.latency.stats(by_asset=True)
 
 
 # Ejemplo de uso
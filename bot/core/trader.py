@@ -379,7 +379,7 @@ class LiveTrader(QThread):
                             )
                             
                             if success:
-                                self.signals.log_message.emit("✅ Re-entrenamiento completado exitosamente")
+                                self.signals.log_message.emit("✅ Re-entrenamiento lanzado en segundo plano")
                                 self.signals.log_message.emit("🔄 Reanudando operaciones normales...")
                                 # Resetear contador de pérdidas
                                 self.consecutive_losses = 0
@@ -0,0 +1,180 @@
+"""
+Trading Env - Entornos de opciones binarias para entrenar el agente RL
+Las features de prepare_for_rl se guardan una sola vez como matriz float32
+contigua y las recompensas de CALL/PUT por vela se precalculan, así que cada
+paso es indexación NumPy en lugar de leer filas de pandas.
+
+- VecBinaryOptionsEnv: VecEnv de stable-baselines3 que avanza N episodios a la
+  vez en el mismo proceso (un solo paso vectorizado para todos)
+- BinaryOptionsEnv: un episodio (gymnasium.Env), para SubprocVecEnv
+- make_vec_env: elige entre ambos (use_subprocess=True reparte en procesos)
+
+Acciones: 0=HOLD, 1=CALL, 2=PUT. Una operación gana `payout` si el cierre
+`expiry` velas después va a favor, pierde 1 si va en contra y empate = 0.
+"""
+from functools import partial
+from typing import List, Optional, Sequence, Union
+
+import gymnasium as gym
+import numpy as np
+import pandas as pd
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecEnv
+
+
+class MarketTape:
+    """Datos de mercado preparados para los entornos (solo lectura, compartibles)."""
+
+    def __init__(self, data: pd.DataFrame, window: int = 1, expiry: int = 1,
+                 payout: float = 0.85, episode_length: int = 256):
+        numeric = data.select_dtypes(include=[np.number, bool])
+        self.columns = list(numeric.columns)
+        self.features = np.ascontiguousarray(
+            np.nan_to_num(numeric.to_numpy(dtype=np.float32), nan=0.0, posinf=0.0, neginf=0.0))
+        self.window = window
+        self.expiry = expiry
+        self.payout = payout
+
+        close = data["close"].to_numpy(dtype=np.float64)
+        # Solo velas con resultado conocido: la última posición operable es n - expiry - 1
+        self.n_valid = len(close) - expiry
+        if self.n_valid <= window:
+            raise ValueError(f"Datos insuficientes para el entorno ({len(close)} velas)")
+        self.episode_length = min(episode_length, self.n_valid - window + 1)
+
+        move = np.sign(close[expiry:] - close[:-expiry])
+        win = np.where(move != 0, np.float32(payout), np.float32(0.0))
+        loss = np.where(move != 0, np.float32(-1.0), np.float32(0.0))
+        # rewards[acción, vela]
+        self.rewards = np.zeros((3, self.n_valid), dtype=np.float32)
+        self.rewards[1] = np.where(move > 0, win, loss)
+        self.rewards[2] = np.where(move < 0, win, loss)
+
+        self.obs_dim = window * self.features.shape[1]
+        self._offsets = np.arange(-window + 1, 1)
+
+    def start_positions(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        """Vela inicial aleatoria con ventana previa completa y episodio completo por delante."""
+        return rng.integers(self.window - 1, self.n_valid - self.episode_length + 1, size=n)
+
+    def observe(self, pos: np.ndarray) -> np.ndarray:
+        """Observaciones (n, window * features) de las posiciones `pos`."""
+        return self.features[pos[:, None] + self._offsets].reshape(len(pos), self.obs_dim)
+
+    def observation_space(self) -> spaces.Box:
+        return spaces.Box(low=-np.inf, high=np.inf, shape=(self.obs_dim,), dtype=np.float32)
+
+
+def _as_tape(data: Union[pd.DataFrame, MarketTape], **kwargs) -> MarketTape:
+    return data if isinstance(data, MarketTape) else MarketTape(data, **kwargs)
+
+
+class VecBinaryOptionsEnv(VecEnv):
+    """N episodios en paralelo sobre la misma cinta de datos, avanzados en bloque."""
+
+    def __init__(self, data: Union[pd.DataFrame, MarketTape], n_envs: int = 8,
+                 seed: Optional[int] = None, **tape_kwargs):
+        self.tape = _as_tape(data, **tape_kwargs)
+        super().__init__(n_envs, self.tape.observation_space(), spaces.Discrete(3))
+        self._rng = np.random.default_rng(seed)
+        self._pos = np.zeros(n_envs, dtype=np.int64)
+        self._steps = np.zeros(n_envs, dtype=np.int64)
+        self._actions = np.zeros(n_envs, dtype=np.int64)
+
+    def reset(self) -> np.ndarray:
+        self._pos = self.tape.start_positions(self._rng, self.num_envs)
+        self._steps[:] = 0
+        return self.tape.observe(self._pos)
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        tape = self.tape
+        rewards = tape.rewards[self._actions, self._pos]
+        self._pos += 1
+        self._steps += 1
+        dones = self._steps >= tape.episode_length
+        obs = tape.observe(self._pos)
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+
+        done_idx = np.flatnonzero(dones)
+        if len(done_idx):
+            for i in done_idx:
+                infos[i]["terminal_observation"] = obs[i].copy()
+                infos[i]["TimeLimit.truncated"] = True
+            # Auto-reset de los episodios terminados (semántica VecEnv)
+            self._pos[done_idx] = tape.start_positions(self._rng, len(done_idx))
+            self._steps[done_idx] = 0
+            obs[done_idx] = tape.observe(self._pos[done_idx])
+
+        return obs, rewards, dones, infos
+
+    def close(self) -> None:
+        pass
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        self._rng = np.random.default_rng(seed)
+        return [None if seed is None else seed + i for i in range(self.num_envs)]
+
+    # ── API VecEnv: un solo objeto atiende a todos los índices ───────────────
+
+    def _indices(self, indices) -> Sequence[int]:
+        if indices is None:
+            return range(self.num_envs)
+        return [indices] if isinstance(indices, int) else indices
+
+    def get_attr(self, attr_name: str, indices=None) -> List:
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value, indices=None) -> None:
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List:
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False for _ in self._indices(indices)]
+
+
+class BinaryOptionsEnv(gym.Env):
+    """Un episodio sobre la cinta de datos; mismo modelo de recompensa que el VecEnv."""
+
+    metadata = {"render_modes": []}
+
+    def __init__(self, data: Union[pd.DataFrame, MarketTape], feature_engineer=None,
+                 seed: Optional[int] = None, **tape_kwargs):
+        super().__init__()
+        self.tape = _as_tape(data, **tape_kwargs)
+        self.observation_space = self.tape.observation_space()
+        self.action_space = spaces.Discrete(3)
+        self._rng = np.random.default_rng(seed)
+        self._pos = np.zeros(1, dtype=np.int64)
+        self._steps = 0
+
+    def reset(self, *, seed: Optional[int] = None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            self._rng = np.random.default_rng(seed)
+        self._pos = self.tape.start_positions(self._rng, 1)
+        self._steps = 0
+        return self.tape.observe(self._pos)[0], {}
+
+    def step(self, action):
+        reward = float(self.tape.rewards[int(action), self._pos[0]])
+        self._pos += 1
+        self._steps += 1
+        truncated = self._steps >= self.tape.episode_length
+        return self.tape.observe(self._pos)[0], reward, False, truncated, {}
+
+
+def make_vec_env(data: Union[pd.DataFrame, MarketTape], n_envs: int = 8,
+                 use_subprocess: bool = False, seed: Optional[int] = None,
+                 **tape_kwargs) -> VecEnv:
+    """VecEnv para PPO: en proceso (vectorizado) o SubprocVecEnv (un episodio por proceso)."""
+    tape = _as_tape(data, **tape_kwargs)
+    if not use_subprocess:
+        return VecBinaryOptionsEnv(tape, n_envs=n_envs, seed=seed)
+    base = 0 if seed is None else seed
+    return SubprocVecEnv([partial(BinaryOptionsEnv, tape, seed=base + i) for i in range(n_envs)])
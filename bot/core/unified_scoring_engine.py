@@ -36,6 +36,16 @@ class ScoringResult:
 
 
 class UnifiedScoringEngine:
+    # Categorías que no dependen de la vela (sin datos externos)
+    _BASE_SCORES = {
+        'market_structure': 70.0,
+        'smart_money': 60.0,
+        'multi_timeframe': 65.0,
+        'risk_management': 70.0,
+        'temporal_context': 70.0,
+        'market_phase': 60.0,
+    }
+
     def __init__(self, config: Optional[Dict] = None):
         self.config = config or self._default_config()
         self.min_score_to_trade = 72
@@ -94,22 +104,20 @@ class UnifiedScoringEngine:
         macd_score = 75.0 if macd > macd_signal else 65.0 if macd > 0 else 50.0
         self.categories['momentum'].score = macd_score
 
-        ms_score = 70.0
+        ms_score = self._BASE_SCORES['market_structure']
         trend = ms_data.get('trend_direction', 'neutral')
         if trend in ('uptrend', 'downtrend'):
             ms_score = 80.0
             reasons.append(f"Tendencia: {trend}")
         self.categories['market_structure'].score = ms_score
 
-        sm_score = 60.0
+        sm_score = self._BASE_SCORES['smart_money']
         if sm_data.get('order_block_hit'): sm_score = 80.0; reasons.append("Order Block hit")
         if sm_data.get('fvg_hit'): sm_score = 90.0; reasons.append("FVG hit")
         self.categories['smart_money'].score = sm_score
 
-        self.categories['multi_timeframe'].score = 65.0
-        self.categories['risk_management'].score = 70.0
-        self.categories['temporal_context'].score = 70.0
-        self.categories['market_phase'].score = 60.0
+        for key in ('multi_timeframe', 'risk_management', 'temporal_context', 'market_phase'):
+            self.categories[key].score = self._BASE_SCORES[key]
 
         total_score = sum(cat.score * cat.weight for cat in self.categories.values())
 
@@ -148,6 +156,50 @@ class UnifiedScoringEngine:
         )
 
 
+    def score_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        score() vectorizado para todas las velas de df a la vez (sin datos de
+        smart money / estructura). La fila i equivale a score(df.iloc[:i+1]).
+
+        Columnas: total_score, confidence, signal, recommendation, rsi
+        """
+        n = len(df)
+        rsi = df['rsi'].to_numpy(dtype=float) if 'rsi' in df else np.full(n, 50.0)
+        macd = df['macd'].to_numpy(dtype=float) if 'macd' in df else np.zeros(n)
+        macd_signal = df['macd_signal'].to_numpy(dtype=float) if 'macd_signal' in df else np.zeros(n)
+        close = df['close'].to_numpy(dtype=float)
+
+        tech = np.select([rsi < 30, rsi > 70, (rsi < 40) | (rsi > 60)], [85.0, 85.0, 65.0], 50.0)
+        momentum = np.where(macd > macd_signal, 75.0, np.where(macd > 0, 65.0, 50.0))
+
+        weights = {key: cat.weight for key, cat in self.categories.items()}
+        base = {key: self._BASE_SCORES.get(key, 0.0) for key in weights
+                if key not in ('technical_indicators', 'momentum')}
+        total = (tech * weights['technical_indicators'] + momentum * weights['momentum']
+                 + sum(score * weights[key] for key, score in base.items()))
+        high_cats = ((tech >= 65).astype(int) + (momentum >= 65)
+                     + sum(1 for score in base.values() if score >= 65))
+
+        # Sin tendencia externa: CALL/PUT por RSI y, si no, cierre vs 4 velas atrás
+        lagged = np.full(n, np.nan)
+        lagged[4:] = close[:-4]
+        signal = np.select(
+            [rsi < 35, rsi > 65, np.arange(n) >= 4],
+            [SignalType.CALL.value, SignalType.PUT.value,
+             np.where(close > lagged, SignalType.CALL.value, SignalType.PUT.value)],
+            SignalType.NEUTRAL.value,
+        )
+        recommendation = np.where((total >= self.min_score_to_trade) & (high_cats >= 4), "TRADE", "WAIT")
+
+        return pd.DataFrame({
+            'total_score': total,
+            'confidence': total / 100.0,
+            'signal': signal,
+            'recommendation': recommendation,
+            'rsi': rsi,
+        }, index=df.index)
+
+
 _scoring_engine: Optional[UnifiedScoringEngine] = None
 
 
@@ -1,7 +1,10 @@
+import numpy as np
 import pandas as pd
+import threading
 import time
 import sys
 import os
+from typing import Dict, List, Optional, Tuple
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -22,12 +25,117 @@ except ImportError:
     IQ_Option = None
 
 
+_OHLCV = ("open", "high", "low", "close", "volume")
+
+
+class CandleStore:
+    """
+    Ventana rodante de velas por (activo, timeframe).
+
+    En lugar de descargar la ventana completa en cada ciclo, solo se piden al
+    broker las velas desde el último `from` cacheado: la vela en formación se
+    parchea en sitio y las nuevas se añaden al final, descartando las más viejas.
+    La ventana de cada clave crece hasta la mayor petición recibida; peticiones
+    de más de `max_bars` velas no se cachean (ver cacheable()).
+    """
+
+    def __init__(self, max_bars: int = 2000):
+        self.max_bars = max_bars
+        self._lock = threading.Lock()
+        # (asset, timeframe) -> {from_ts: (open, high, low, close, volume)}
+        self._series: Dict[Tuple[str, int], Dict[int, tuple]] = {}
+        # (asset, timeframe) -> tamaño de ventana solicitado más grande
+        self._window: Dict[Tuple[str, int], int] = {}
+
+    def cacheable(self, num_candles: int) -> bool:
+        return num_candles <= self.max_bars
+
+    def is_fresh(self, asset: str, timeframe: int, now: float) -> bool:
+        """True si la última vela cacheada es la que está en formación."""
+        with self._lock:
+            series = self._series.get((asset, int(timeframe)))
+            if not series:
+                return False
+            last_from = next(reversed(series))
+        return now - last_from < timeframe
+
+    def bars_needed(self, asset: str, timeframe: int, num_candles: int,
+                    now: float) -> int:
+        """
+        Cuántas velas hay que pedir para dejar la ventana al día.
+        Devuelve `num_candles` si no hay caché suficiente (descarga completa).
+        """
+        key = (asset, int(timeframe))
+        with self._lock:
+            series = self._series.get(key)
+            if not series or len(series) < num_candles:
+                return num_candles
+            last_from = next(reversed(series))
+        # +1 para re-pedir la vela en formación y cerrarla con sus valores finales
+        elapsed = int((now - last_from) // timeframe) + 1
+        if elapsed >= num_candles:
+            return num_candles
+        return max(1, elapsed)
+
+    def merge(self, asset: str, timeframe: int, candles: List[dict],
+              num_candles: int):
+        """Integra velas crudas del broker (claves from/open/max/min/close/volume)."""
+        key = (asset, int(timeframe))
+        with self._lock:
+            window = max(self._window.get(key, 0), num_candles)
+            self._window[key] = window
+            series = self._series.setdefault(key, {})
+            out_of_order = False
+            for c in candles:
+                try:
+                    ts = int(c["from"])
+                    row = (float(c.get("open", 0.0)), float(c.get("max", c.get("high", 0.0))),
+                           float(c.get("min", c.get("low", 0.0))), float(c.get("close", 0.0)),
+                           float(c.get("volume", 0.0)))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if ts not in series and series and ts < next(reversed(series)):
+                    out_of_order = True       # hueco histórico: reordenar abajo
+                # Parchea la vela en formación o añade la nueva al final
+                series[ts] = row
+            if out_of_order:
+                self._series[key] = series = dict(sorted(series.items()))
+            excess = len(series) - window
+            if excess > 0:
+                for ts in list(series)[:excess]:
+                    del series[ts]
+
+    def frame(self, asset: str, timeframe: int, num_candles: int) -> pd.DataFrame:
+        """Últimas `num_candles` velas como DataFrame (copia independiente)."""
+        key = (asset, int(timeframe))
+        with self._lock:
+            series = self._series.get(key)
+            if not series:
+                return pd.DataFrame()
+            items = list(series.items())[-num_candles:]
+        index = pd.to_datetime(np.fromiter((ts for ts, _ in items), dtype=np.int64,
+                                           count=len(items)), unit="s")
+        index.name = "timestamp"
+        values = np.array([row for _, row in items], dtype=float)
+        df = pd.DataFrame(values, index=index, columns=list(_OHLCV))
+        # Etiqueta para la caché de indicadores (brain.indicator_service)
+        df.attrs.update(asset=asset, timeframe=int(timeframe))
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._window.clear()
+
+
 class MarketDataHandler:
     def __init__(self, broker_name="exnova", account_type="PRACTICE"):
         self.broker_name = broker_name.lower()
         self.account_type = account_type
         self.api = None
         self.connected = False
+        self.candle_store = CandleStore()
+        self._streams = set()
 
     def connect(self, email, password):
         print(f"  Conectando a {self.broker_name.upper()} ({self.account_type})...")
@@ -83,20 +191,139 @@ class MarketDataHandler:
     def get_candles(self, asset, timeframe, num_candles, end_time=None):
         if not self.connected or not self.api:
             return pd.DataFrame()
+
+        # Consultas históricas (end_time explícito) no pasan por la caché
+        if end_time is not None:
+            return self._candles_to_frame(self._fetch_candles(asset, timeframe, num_candles, end_time))
+
+        streamed = self._stream_frame(asset, timeframe, num_candles)
+        if streamed is not None:
+            return streamed
+
+        now = time.time()
+        # Ventanas más grandes que la caché: descarga directa
+        if not self.candle_store.cacheable(num_candles):
+            return self._candles_to_frame(self._fetch_candles(asset, timeframe, num_candles, now))
+
+        needed = self.candle_store.bars_needed(asset, timeframe, num_candles, now)
+        candles = self._fetch_candles(asset, timeframe, needed, now)
+        if candles:
+            self.candle_store.merge(asset, timeframe, candles, num_candles)
+        elif not self.candle_store.is_fresh(asset, timeframe, now):
+            # Sin datos nuevos y caché vieja: vacío, como antes de la caché
+            return pd.DataFrame()
+        return self.candle_store.frame(asset, timeframe, num_candles)
+
+    def get_candles_multi(self, queries) -> Dict[Tuple[str, int], pd.DataFrame]:
+        """
+        Varias ventanas en un solo viaje: queries = [(asset, timeframe, num_candles)].
+        Todas las peticiones salen juntas y se esperan en paralelo.
+        """
+        frames = {}
+        if not self.connected or not self.api:
+            return {(a, int(tf)): pd.DataFrame() for a, tf, _ in queries}
+
+        for asset, timeframe, num_candles in queries:
+            streamed = self._stream_frame(asset, timeframe, num_candles)
+            if streamed is not None:
+                frames[(asset, int(timeframe))] = streamed
+        now = time.time()
+        for asset, timeframe, num_candles in queries:
+            if not self.candle_store.cacheable(num_candles):
+                frames[(asset, int(timeframe))] = self._candles_to_frame(
+                    self._fetch_candles(asset, timeframe, num_candles, now))
+        queries = [q for q in queries if (q[0], int(q[1])) not in frames]
+        if not queries:
+            return frames
+
+        needed = [(a, tf, self.candle_store.bars_needed(a, tf, n, now), now)
+                  for a, tf, n in queries]
+        if hasattr(self.api, "get_candles_many"):
+            try:
+                replies = self.api.get_candles_many(needed)
+            except Exception:
+                replies = [None] * len(needed)
+        else:
+            replies = [self._fetch_candles(a, tf, n, end) for a, tf, n, end in needed]
+
+        for (asset, timeframe, num_candles), candles in zip(queries, replies):
+            if candles and not isinstance(candles, dict):
+                self.candle_store.merge(asset, timeframe, candles, num_candles)
+            elif not self.candle_store.is_fresh(asset, timeframe, now):
+                frames[(asset, int(timeframe))] = pd.DataFrame()
+                continue
+            frames[(asset, int(timeframe))] = self.candle_store.frame(asset, timeframe, num_candles)
+        return frames
+
+    def start_stream(self, asset, timeframe, num_candles=500):
+        """
+        Suscribe el flujo en vivo de velas: el broker las empuja a un ring
+        buffer y get_candles lee de ahí sin ida y vuelta por websocket.
+        """
+        if not self.connected or not hasattr(self.api, "start_candles_stream"):
+            return False
+        try:
+            ok = self.api.start_candles_stream(asset, int(timeframe), int(num_candles))
+        except Exception as e:
+            print(f"⚠️ No se pudo iniciar stream {asset} {timeframe}s: {e}")
+            return False
+        if not ok:
+            # El ring quedó sembrado por REST pero no recibe ticks: no servirlo
+            print(f"⚠️ Suscripción sin respuesta para {asset} {timeframe}s, se usará REST")
+            return False
+        self._streams.add((asset, int(timeframe)))
+        return True
+
+    def stop_stream(self, asset, timeframe):
+        key = (asset, int(timeframe))
+        if key not in self._streams:
+            return
+        self._streams.discard(key)
+        try:
+            self.api.stop_candles_stream(asset, int(timeframe))
+        except Exception:
+            pass
+
+    def _stream_frame(self, asset, timeframe, num_candles) -> Optional[pd.DataFrame]:
+        """DataFrame de las últimas velas del stream o None si no alcanza."""
+        if (asset, int(timeframe)) not in self._streams:
+            return None
+        try:
+            ring = self.api.get_realtime_candle_ring(asset, int(timeframe))
+        except Exception:
+            return None
+        if ring is None or len(ring) < num_candles:
+            return None
+
+        cols = ring.last(num_candles)
+        # Stream detenido (sin ticks desde hace 2 velas): que responda REST
+        if time.time() - float(cols["from"][-1]) > 2 * int(timeframe):
+            return None
+        index = pd.to_datetime(cols["from"].astype(np.int64), unit='s')
+        index.name = 'timestamp'
+        df = pd.DataFrame({
+            'open': cols["open"], 'high': cols["max"], 'low': cols["min"],
+            'close': cols["close"], 'volume': cols["volume"],
+        }, index=index)
+        df.attrs.update(asset=asset, timeframe=int(timeframe))
+        return df
+
+    def _fetch_candles(self, asset, timeframe, num_candles, end_time):
         try:
-            if end_time is None:
-                end_time = time.time()
             try:
                 candles = self.api.get_candles(asset, timeframe, num_candles, end_time)
             except TypeError:
                 candles = self.api.get_candles(asset, timeframe, num_candles)
-        except Exception as e:
-            return pd.DataFrame()
+        except Exception:
+            return []
+        if not candles or isinstance(candles, dict):
+            return []
+        return candles
 
+    @staticmethod
+    def _candles_to_frame(candles) -> pd.DataFrame:
         if not candles:
             return pd.DataFrame()
-        if isinstance(candles, dict):
-            return pd.DataFrame()
 
         df = pd.DataFrame(candles)
         if df.empty:
@@ -168,6 +395,26 @@ class MarketDataHandler:
         except Exception as e:
             return False, str(e)
 
+    def get_trade_result(self, order_id):
+        """(estado, profit) de una orden ya cerrada, o None si sigue abierta. No bloquea."""
+        if not self.api or not hasattr(self.api, "get_option_result"):
+            return None
+        try:
+            status, profit = self.api.get_option_result(order_id)
+        except Exception:
+            return None
+        if status is None:
+            return None
+        return status, profit
+
+    def wait_trade_event(self, timeout):
+        """Espera al próximo mensaje del websocket (o timeout) sin sondear."""
+        inner = getattr(self.api, "api", None)
+        if inner is not None and hasattr(inner, "wait_message"):
+            inner.wait_message(timeout)
+        else:
+            time.sleep(timeout)
+
     def is_really_connected(self):
         if not self.connected or not self.api:
             return False
@@ -181,6 +428,8 @@ class MarketDataHandler:
 
     def reconnect(self, email, password):
         self.connected = False
+        self.candle_store.clear()
+        self._streams.clear()
         time.sleep(2)
         return self.connect(email, password)
 
@@ -216,3 +465,5 @@ class MarketDataHandler:
                 pass
         self.connected = False
         self.api = None
+        self.candle_store.clear()
+        self._streams.clear()
@@ -0,0 +1,145 @@
+"""
+Candle Patterns — Motor columnar de patrones de vela
+Evalúa en una sola pasada vectorizada, para TODAS las velas de un array OHLC,
+las reglas de CandlePatternDetector (pin bar, hammer/shooting star, engulfing,
+morning/evening star, doji de reversión) y de la micro-estructura del motor.
+
+La fila i se lee como vela de señal (cerrada): usa las velas i-2..i para los
+patrones, i-4..i para la micro-estructura y la i+1 como "vela actual" para la
+confirmación. CandlePatternDetector (y con él el replay, que llama a
+IntelligentEngine.analyze vela a vela) lee la fila de df.iloc[-2] de este motor.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+# Orden de evaluación: ante empate de fuerza gana el primero (como el max() escalar)
+PATTERNS = (
+    "pin_bar_bullish", "pin_bar_bearish", "hammer", "shooting_star",
+    "bullish_engulfing", "bearish_engulfing", "morning_star", "evening_star",
+    "doji_reversal_bull", "doji_reversal_bear",
+)
+BULLISH_PATTERNS = frozenset({"pin_bar_bullish", "hammer", "bullish_engulfing",
+                              "doji_reversal_bull", "morning_star"})
+BEARISH_PATTERNS = frozenset({"pin_bar_bearish", "shooting_star", "bearish_engulfing",
+                              "doji_reversal_bear", "evening_star"})
+
+
+def _shift(x: np.ndarray, k: int, fill=np.nan) -> np.ndarray:
+    """x desplazado k posiciones: out[i] = x[i-k] (k>0) o x[i+|k|] (k<0)."""
+    out = np.full(len(x), fill, dtype=x.dtype if fill is not np.nan else float)
+    if k > 0:
+        out[k:] = x[:-k]
+    elif k < 0:
+        out[:k] = x[-k:]
+    else:
+        out[:] = x
+    return out
+
+
+def scan_patterns(o: np.ndarray, h: np.ndarray, l: np.ndarray,
+                  c: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Fuerzas por patrón (0.0 = ausente) y flags auxiliares para cada vela.
+
+    Devuelve las columnas de PATTERNS más:
+    - body_pct / lower_wick_pct / upper_wick_pct de la vela
+    - confirm_call / confirm_put: la vela siguiente confirma la dirección
+    - micro_call / micro_put: micro-estructura de reversión en las 5 velas
+    """
+    o, h, l, c = (np.asarray(a, dtype=float) for a in (o, h, l, c))
+    n = len(c)
+    out: Dict[str, np.ndarray] = {}
+    if n == 0:
+        for name in PATTERNS + ("body_pct", "lower_wick_pct", "upper_wick_pct"):
+            out[name] = np.zeros(0)
+        for name in ("confirm_call", "confirm_put", "micro_call", "micro_put"):
+            out[name] = np.zeros(0, dtype=bool)
+        return out
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        body = np.abs(c - o)
+        full_range = np.where(h > l, h - l, 1e-8)
+        upper = h - np.maximum(o, c)
+        lower = np.minimum(o, c) - l
+        is_bull = c > o
+        is_bear = c < o
+        body_pct = body / full_range
+        lower_pct = lower / full_range
+        upper_pct = upper / full_range
+
+        # ── Pin bar: mecha dominante ≥60%, cuerpo ≤30% ────────────────────────
+        small_body = body_pct <= 0.30
+        tiny_body = body < full_range * 0.15
+        pin_bull = (lower_pct >= 0.60) & small_body & ((lower >= body * 1.8) | tiny_body)
+        pin_bear = (upper_pct >= 0.60) & small_body & ((upper >= body * 1.8) | tiny_body)
+        out["pin_bar_bullish"] = np.where(
+            pin_bull, np.round(0.82 + np.minimum(lower_pct - 0.60, 0.15), 2), 0.0)
+        out["pin_bar_bearish"] = np.where(
+            pin_bear, np.round(0.82 + np.minimum(upper_pct - 0.60, 0.15), 2), 0.0)
+
+        # ── Hammer / Shooting star ────────────────────────────────────────────
+        has_body = body > 0
+        out["hammer"] = np.where(
+            has_body & (lower >= body * 2.2) & (upper <= body * 0.4), 0.78, 0.0)
+        out["shooting_star"] = np.where(
+            has_body & (upper >= body * 2.2) & (lower <= body * 0.4), 0.78, 0.0)
+
+        # ── Engulfing contra la vela anterior ─────────────────────────────────
+        o2, c2 = _shift(o, 1), _shift(c, 1)
+        prev_body = np.maximum(np.abs(c2 - o2), 1e-8)
+        body_ratio = body / prev_body
+        bull_eng = is_bull & (c2 < o2) & (c > o2) & (o <= c2) & (body_ratio >= 1.1)
+        bear_eng = is_bear & (c2 > o2) & (c < o2) & (o >= c2) & (body_ratio >= 1.1)
+        engulf_strength = 0.83 + np.minimum(body_ratio - 1.1, 0.10)
+        out["bullish_engulfing"] = np.where(bull_eng, engulf_strength, 0.0)
+        out["bearish_engulfing"] = np.where(bear_eng, engulf_strength, 0.0)
+
+        # ── Morning / Evening star (3 velas) ──────────────────────────────────
+        o3, c3 = _shift(o, 2), _shift(c, 2)
+        c3_body = np.abs(c3 - o3)
+        c2_small = np.abs(c2 - o2) < c3_body * 0.35
+        big_c3 = c3_body > full_range * 0.5
+        mid_c3 = (o3 + c3) / 2
+        out["morning_star"] = np.where(
+            (c3 < o3) & big_c3 & c2_small & is_bull & (c > mid_c3), 0.92, 0.0)
+        out["evening_star"] = np.where(
+            (c3 > o3) & big_c3 & c2_small & is_bear & (c < mid_c3), 0.92, 0.0)
+
+        # ── Doji de reversión (se filtra por dirección al leer) ───────────────
+        doji = body_pct <= 0.10
+        out["doji_reversal_bull"] = np.where(doji & (lower_pct >= 0.40), 0.62, 0.0)
+        out["doji_reversal_bear"] = np.where(doji & (upper_pct >= 0.40), 0.62, 0.0)
+
+        out["body_pct"] = body_pct
+        out["lower_wick_pct"] = lower_pct
+        out["upper_wick_pct"] = upper_pct
+
+        # ── Confirmación por la vela siguiente ────────────────────────────────
+        o_next, c_next = _shift(o, -1), _shift(c, -1)
+        out["confirm_call"] = (c_next >= o_next) | (c_next > c)
+        out["confirm_put"] = (c_next <= o_next) | (c_next < c)
+
+        # ── Micro-estructura sobre las 5 velas i-4..i ─────────────────────────
+        rng = h - l
+        safe_rng = np.maximum(rng, 1e-8)
+        pair = lambda x: (x + _shift(x, 1)) / 2            # media de las 2 últimas
+        momentum_weakening = pair(body) < _shift(pair(body), 2) * 0.75
+        rejection_call = pair(lower / safe_rng) > 0.25
+        rejection_put = pair(upper / safe_rng) > 0.25
+        indecision = pair(body / safe_rng) < 0.40
+        c_2, c_4 = _shift(c, 2), _shift(c, 4)
+        recent_up = c > c_2
+        earlier_up = c_2 > c_4
+        shift_call = recent_up & ~earlier_up
+        shift_put = ~recent_up & earlier_up
+        quality_call = (rng > 0) & (lower / rng > 0.30) & ((c - l) / rng > 0.60)
+        quality_put = (rng > 0) & (upper / rng > 0.30) & ((h - c) / rng > 0.60)
+        common = momentum_weakening | indecision
+        full_window = np.arange(n) >= 4
+        out["micro_call"] = full_window & (common | rejection_call | shift_call | quality_call)
+        out["micro_put"] = full_window & (common | rejection_put | shift_put | quality_put)
+
+    return out
+
@@ -3,6 +3,7 @@ Intelligent Engine v4.1 — Motor con timing de entrada preciso
 El error previo: detectaba patrones en velas ABIERTAS (aún formándose).
 Fix: solo opera sobre velas CERRADAS + valida que la vela actual confirme el movimiento.
 """
+import threading
 import time
 import numpy as np
 import pandas as pd
@@ -10,11 +11,17 @@ from typing import Dict, Optional, List, Tuple
 
 from brain.market_memory import get_market_memory
 from brain.zone_detector import ZoneDetector
+from brain.zone_tracker import ZoneTracker
 from brain.context_analyzer import ContextAnalyzer
+from brain.indicator_service import get_indicator_service
 from brain.adaptive_learner import get_adaptive_learner
 from brain.market_ai import MarketAI
 from brain.market_session import get_market_session
 from brain.zone_reaction_history import get_zone_history
+from brain.bar_view import Bars, bars_to_target
+from engine.candle_patterns import (BEARISH_PATTERNS, BULLISH_PATTERNS, PATTERNS,
+                                    scan_patterns)
+from core.latency_profiler import NULL_TIMER, get_latency_profiler
 
 
 # ─── Diagnóstico de entrada prematura ────────────────────────────────────────
@@ -30,30 +37,12 @@ class PrematureEntryDiagnostic:
         if candles_after is None or len(candles_after) < 2:
             return {"premature": False, "reason": "sin datos post-trade"}
 
-        target_reached_at = None
+        # Cuánto tardó el precio en llegar al objetivo, y si fue dentro de la ventana revisada
         candles_checked = min(len(candles_after), expiration_minutes * 3)
-
-        for i, (_, row) in enumerate(candles_after.head(candles_checked).iterrows()):
-            if direction == "CALL":
-                if float(row["high"]) > entry_price * 1.0003:
-                    target_reached_at = i + 1
-                    break
-            else:
-                if float(row["low"]) < entry_price * 0.9997:
-                    target_reached_at = i + 1
-                    break
-
-        # Buscar cuánto tardó el precio en llegar al objetivo
-        target_reached_late = None
-        for i, (_, row) in enumerate(candles_after.iterrows()):
-            if direction == "CALL":
-                if float(row["high"]) > entry_price * 1.0003:
-                    target_reached_late = i + 1
-                    break
-            else:
-                if float(row["low"]) < entry_price * 0.9997:
-                    target_reached_late = i + 1
-                    break
+        target_reached_late = bars_to_target(Bars.from_df(candles_after), entry_price, direction)
+        target_reached_at = (target_reached_late
+                             if target_reached_late is not None and target_reached_late <= candles_checked
+                             else None)
 
         was_premature = (target_reached_at is None and target_reached_late is not None and
                           target_reached_late > expiration_minutes)
@@ -87,114 +76,37 @@ class CandlePatternDetector:
     def detect(self, df: pd.DataFrame, expected_direction: str) -> Dict:
         if len(df) < 5:
             return self._no_pattern("Datos insuficientes")
+        # Vela de señal = df.iloc[-2] (última CERRADA); df.iloc[-1] solo confirma
+        cols = scan_patterns(*(df[k].to_numpy(dtype=float)[-5:]
+                               for k in ("open", "high", "low", "close")))
+        return self.read(cols, -2, expected_direction)
 
-        # ── Velas de referencia (todas CERRADAS) ──────────────────────────────
-        anchor = df.iloc[-5]   # vela -5 (contexto)
-        c3     = df.iloc[-4]   # vela -4
-        c2     = df.iloc[-3]   # vela -3
-        signal = df.iloc[-2]   # VELA DE SEÑAL (última cerrada) ← aquí se detecta el patrón
-        current = df.iloc[-1]  # vela actual (solo para confirmar dirección inicial)
-
-        # Datos de la vela de señal (cerrada)
-        o  = float(signal["open"])
-        h  = float(signal["high"])
-        l  = float(signal["low"])
-        c  = float(signal["close"])
-
-        body       = abs(c - o)
-        full_range = h - l if h > l else 1e-8
-        upper_wick = h - max(o, c)
-        lower_wick = min(o, c) - l
-        is_bull    = c > o
-        is_bear    = c < o
-
-        # Datos velas anteriores
-        o2, c2v = float(c2["open"]), float(c2["close"])
-        o3, c3v = float(c3["open"]), float(c3["close"])
-        oa, ca  = float(anchor["open"]), float(anchor["close"])
-
-        # Vela actual (en formación) — solo para confirmar
-        cur_o   = float(current["open"])
-        cur_c   = float(current["close"])
-        cur_moving_up   = cur_c > cur_o
-        cur_moving_down = cur_c < cur_o
-
+    def read(self, cols: Dict[str, np.ndarray], i: int, expected_direction: str) -> Dict:
+        """Resultado de detect() para la vela i de un scan_patterns (vivo o histórico)."""
         patterns = []
-
-        # ── Pin Bar (mecha dominante = rechazo fuerte) ───────────────────────
-        if full_range > 0:
-            # Pin bar alcista: mecha inferior ≥60% del rango, cuerpo ≤30%
-            if lower_wick / full_range >= 0.60 and body / full_range <= 0.30:
-                # La mecha debe ser al menos 2x el cuerpo
-                if lower_wick >= body * 1.8 or body < full_range * 0.15:
-                    strength = 0.82 + min(lower_wick / full_range - 0.60, 0.15)
-                    patterns.append(("pin_bar_bullish", round(strength, 2)))
-
-            # Pin bar bajista: mecha superior ≥60% del rango, cuerpo ≤30%
-            if upper_wick / full_range >= 0.60 and body / full_range <= 0.30:
-                if upper_wick >= body * 1.8 or body < full_range * 0.15:
-                    strength = 0.82 + min(upper_wick / full_range - 0.60, 0.15)
-                    patterns.append(("pin_bar_bearish", round(strength, 2)))
-
-        # ── Hammer / Shooting Star ───────────────────────────────────────────
-        if body > 0:
-            if lower_wick >= body * 2.2 and upper_wick <= body * 0.4:
-                patterns.append(("hammer", 0.78))
-            if upper_wick >= body * 2.2 and lower_wick <= body * 0.4:
-                patterns.append(("shooting_star", 0.78))
-
-        # ── Engulfing fuerte ─────────────────────────────────────────────────
-        # Alcista: vela signal es bull Y envuelve completamente a c2 (bearish)
-        if is_bull and c2v < o2:  # c2 fue bajista
-            if c > o2 and o <= c2v:  # envuelve completamente
-                body_ratio = body / max(abs(c2v - o2), 1e-8)
-                if body_ratio >= 1.1:
-                    patterns.append(("bullish_engulfing", 0.83 + min(body_ratio - 1.1, 0.10)))
-        # Bajista: vela signal es bear Y envuelve completamente a c2 (bullish)
-        if is_bear and c2v > o2:  # c2 fue alcista
-            if c < o2 and o >= c2v:
-                body_ratio = body / max(abs(c2v - o2), 1e-8)
-                if body_ratio >= 1.1:
-                    patterns.append(("bearish_engulfing", 0.83 + min(body_ratio - 1.1, 0.10)))
-
-        # ── Morning Star / Evening Star (3 velas cerradas) ───────────────────
-        # Morning Star: c3 bearish grande → c2 pequeña → signal bullish
-        c3_bear  = c3v < o3 and abs(c3v - o3) > full_range * 0.5
-        c2_small = abs(c2v - o2) < abs(c3v - o3) * 0.35
-        sig_bull = is_bull and c > (o3 + c3v) / 2
-        if c3_bear and c2_small and sig_bull:
-            patterns.append(("morning_star", 0.92))
-
-        # Evening Star: c3 bullish grande → c2 pequeña → signal bearish
-        c3_bull  = c3v > o3 and abs(c3v - o3) > full_range * 0.5
-        sig_bear = is_bear and c < (o3 + c3v) / 2
-        if c3_bull and c2_small and sig_bear:
-            patterns.append(("evening_star", 0.92))
-
-        # ── Doji de reversión (señal ambigua, solo si muy extremo) ───────────
-        if full_range > 0 and body / full_range <= 0.10:
-            if expected_direction == "CALL" and lower_wick / full_range >= 0.40:
-                patterns.append(("doji_reversal_bull", 0.62))
-            elif expected_direction == "PUT" and upper_wick / full_range >= 0.40:
-                patterns.append(("doji_reversal_bear", 0.62))
+        for name in PATTERNS:
+            strength = float(cols[name][i])
+            if strength <= 0:
+                continue
+            # El doji de reversión solo cuenta en la dirección esperada
+            if name == "doji_reversal_bull" and expected_direction != "CALL":
+                continue
+            if name == "doji_reversal_bear" and expected_direction != "PUT":
+                continue
+            patterns.append((name, strength))
 
         if not patterns:
             return self._no_pattern("Sin patrón en vela cerrada", signal_candle_info={
-                "body_pct": body / full_range if full_range > 0 else 0,
-                "lower_wick_pct": lower_wick / full_range if full_range > 0 else 0,
-                "upper_wick_pct": upper_wick / full_range if full_range > 0 else 0,
+                "body_pct": float(cols["body_pct"][i]),
+                "lower_wick_pct": float(cols["lower_wick_pct"][i]),
+                "upper_wick_pct": float(cols["upper_wick_pct"][i]),
             })
 
         # ── Filtrar por dirección esperada ────────────────────────────────────
-        bullish_patterns = {"pin_bar_bullish", "hammer", "bullish_engulfing",
-                            "doji_reversal_bull", "morning_star"}
-        bearish_patterns = {"pin_bar_bearish", "shooting_star", "bearish_engulfing",
-                            "doji_reversal_bear", "evening_star"}
-
         if expected_direction == "CALL":
-            valid = [(p, s) for p, s in patterns if p in bullish_patterns]
+            valid = [(p, s) for p, s in patterns if p in BULLISH_PATTERNS]
         elif expected_direction == "PUT":
-            valid = [(p, s) for p, s in patterns if p in bearish_patterns]
+            valid = [(p, s) for p, s in patterns if p in BEARISH_PATTERNS]
         else:
             valid = patterns
 
@@ -210,8 +122,8 @@ class CandlePatternDetector:
         # La vela actual (abierta) debe estar comenzando a moverse en la dirección correcta
         # Si va en contra, el patrón aún no está confirmado por el mercado
         candle_confirming = (
-            (expected_direction == "CALL" and (cur_c >= cur_o or cur_c > c)) or
-            (expected_direction == "PUT"  and (cur_c <= cur_o or cur_c < c))
+            (expected_direction == "CALL" and bool(cols["confirm_call"][i])) or
+            (expected_direction == "PUT"  and bool(cols["confirm_put"][i]))
         )
 
         # Para patrones fuertes, la confirmación de vela actual es opcional
@@ -354,7 +266,9 @@ class IntelligentEngine:
     8. Decidir — si pasa todos los filtros, entrar
     """
 
-    def __init__(self):
+    def __init__(self, clock=None):
+        # Reloj inyectable: el replay offline avanza un reloj simulado
+        self.clock            = clock or time.time
         self.memory           = get_market_memory()
         self.zone_detector    = ZoneDetector()
         self.context_analyzer = ContextAnalyzer()
@@ -364,27 +278,40 @@ class IntelligentEngine:
         self.market_ai        = MarketAI()
         self.session          = get_market_session()
         self.zone_history     = get_zone_history()
-        self._last_zone_scan: Dict[str, float] = {}
-        self._zone_scan_interval = 300
-        self._start_time = time.time()
+        self.profiler         = get_latency_profiler()
+        self._zone_trackers: Dict[str, ZoneTracker] = {}
+        self._start_time = self.clock()
         self._warmup_seconds = 90  # 90s de observación antes de operar
+        # Un lock por activo: varios activos se analizan en paralelo, pero el
+        # estado de un mismo activo (_zone_trackers, zonas) nunca se pisa
+        self._asset_locks: Dict[str, threading.Lock] = {}
+        self._asset_locks_guard = threading.Lock()
+
+    def _asset_lock(self, asset: str) -> threading.Lock:
+        with self._asset_locks_guard:
+            return self._asset_locks.setdefault(asset, threading.Lock())
 
     def analyze(self, asset: str, market_data, fe=None) -> Optional[Dict]:
+        with self._asset_lock(asset):
+            timer = self.profiler.timer(asset)
+            try:
+                return self._analyze(asset, market_data, fe, timer)
+            finally:
+                timer.total("analyze")
+
+    def _analyze(self, asset: str, market_data, fe=None, timer=NULL_TIMER) -> Optional[Dict]:
         try:
             # ── 0. Warm-up — no operar inmediatamente al arrancar ────────────
-            if time.time() - self._start_time < self._warmup_seconds:
-                remaining = int(self._warmup_seconds - (time.time() - self._start_time))
+            if self.clock() - self._start_time < self._warmup_seconds:
+                remaining = int(self._warmup_seconds - (self.clock() - self._start_time))
                 return self._wait(f"Warm-up: observando mercado {remaining}s más", asset)
 
             # ── 1. Datos multi-timeframe ─────────────────────────────────────
-            df_m1 = market_data.get_candles(asset, 60, 200)
+            df_m1, df_m5, df_m15, df_h1 = self._fetch_frames(asset, market_data)
+            timer.mark("fetch_candles")
             if df_m1 is None or len(df_m1) < 30:
                 return self._wait("Datos M1 insuficientes", asset)
 
-            df_m5  = market_data.get_candles(asset, 300, 120)
-            df_m15 = market_data.get_candles(asset, 900, 60)
-            df_h1  = market_data.get_candles(asset, 3600, 30)
-
             if df_m5 is None or len(df_m5) < 20:
                 return self._wait("Datos M5 insuficientes", asset)
 
@@ -393,11 +320,9 @@ class IntelligentEngine:
             if current_price <= 0:
                 return self._wait("Precio inválido", asset)
 
-            # ── 2. Escanear zonas ────────────────────────────────────────────
-            last_scan = self._last_zone_scan.get(asset, 0)
-            if time.time() - last_scan > self._zone_scan_interval:
-                self._rescan_zones(asset, df_m5, df_m15, df_h1)
-                self._last_zone_scan[asset] = time.time()
+            # ── 2. Mantener zonas con las velas cerradas nuevas ──────────────
+            self._update_zones(asset, df_m5, df_m15, df_h1)
+            timer.mark("zones")
 
             # ── 3. Sesión de mercado — adaptar parámetros al horario actual ──
             session_name, session_params = self.session.get_current_session()
@@ -412,6 +337,7 @@ class IntelligentEngine:
                 self.learner.get_threshold("min_zone_strength", 0.35),
                 session_params.get("min_zone_strength", 0.35)
             )
+            timer.mark("session")
 
             # ── 4. ¿Está el precio EN una zona fuerte? ───────────────────────
             soft_penalties = 0.0
@@ -419,6 +345,7 @@ class IntelligentEngine:
                 asset, current_price, tolerance_pct=zone_tolerance
             )
             zone_context_summary = self.memory.get_zone_context(asset, current_price)
+            timer.mark("zone_lookup")
 
             if nearest_zone is None or nearest_zone.strength < min_zone_strength:
                 # ¿Hay zona aunque esté lejos (hasta 1.2%)? Si sí, permitir con penalización
@@ -450,6 +377,7 @@ class IntelligentEngine:
                 zone=nearest_zone,
                 current_price=current_price,
             )
+            timer.mark("context")
             expected_dir = context.get("expected_direction", "NEUTRAL")
             phase = context.get("market_phase", "unknown")
 
@@ -503,6 +431,7 @@ class IntelligentEngine:
 
             # ── 5. Detectar patrón en vela CERRADA (df.iloc[-2]) ────────────
             pattern = self.pattern_detector.detect(df_m1, expected_dir)
+            timer.mark("pattern")
 
             # ── 6. Validar timing — BLOQUEANTE ───────────────────────────────
             # Sin rechazo visible en la zona = no entrar. Sin excepciones.
@@ -511,6 +440,7 @@ class IntelligentEngine:
                 df_m1, nearest_zone.level, nearest_zone.zone_type,
                 expected_dir, zone_distance_pct=zone_dist_pct
             )
+            timer.mark("timing")
             if not timing["valid"]:
                 issue = timing.get("issue", "")
                 reason = timing.get("reason", "Timing inválido")
@@ -610,6 +540,7 @@ class IntelligentEngine:
             is_first_visit = self.zone_history.is_first_visit(
                 asset, nearest_zone.level, nearest_zone.zone_type
             )
+            timer.mark("zone_history")
             # Si la zona rompió la última vez, ser más cauteloso
             if zone_history_analysis.get("last_broke", False):
                 if nearest_zone.strength < 0.80:
@@ -638,6 +569,7 @@ class IntelligentEngine:
                 ai_label     = ai_verdict.setup_label
                 ai_narrative = ai_verdict.narrative
                 ai_should    = ai_verdict.should_trade
+                timer.mark("market_ai")
 
                 # La IA NO puede cambiar la dirección de la zona — solo puede bloquear
                 # Si la IA dice dirección contraria a la zona con score alto → SKIP
@@ -666,6 +598,7 @@ class IntelligentEngine:
 
             # ── 9. Puntuación combinada ───────────────────────────────────────
             adaptive_score, breakdown = self.learner.score_conditions(conditions)
+            timer.mark("learner")
             min_score = self.learner.get_min_score()
 
             # Bonus por primera visita a la zona (señal más limpia)
@@ -788,6 +721,19 @@ class IntelligentEngine:
         except Exception as e:
             return self._wait(f"Error en análisis: {e}", asset)
 
+    # ── Datos multi-timeframe ─────────────────────────────────────────────────
+
+    _TIMEFRAMES = ((60, 200), (300, 120), (900, 60), (3600, 30))
+
+    def _fetch_frames(self, asset: str, market_data) -> Tuple:
+        """M1/M5/M15/H1 en una sola ronda si el proveedor lo soporta."""
+        if hasattr(market_data, "get_candles_multi"):
+            frames = market_data.get_candles_multi(
+                [(asset, tf, n) for tf, n in self._TIMEFRAMES]
+            )
+            return tuple(frames.get((asset, tf)) for tf, _ in self._TIMEFRAMES)
+        return tuple(market_data.get_candles(asset, tf, n) for tf, n in self._TIMEFRAMES)
+
     # ── Micro-estructura: análisis fino de velas para detectar reversión ─────
 
     def _check_micro_structure(self, df_m1: pd.DataFrame, expected_dir: str) -> bool:
@@ -803,115 +749,28 @@ class IntelligentEngine:
         """
         if len(df_m1) < 8:
             return False
-            
+
         try:
-            # Últimas 5 velas cerradas (no incluir la actual en formación)
-            recent = df_m1.iloc[-6:-1]  # velas -6 a -2
-            signal_candle = df_m1.iloc[-2]  # vela de señal
-            
-            # Datos básicos
-            opens  = recent["open"].astype(float).values
-            highs  = recent["high"].astype(float).values  
-            lows   = recent["low"].astype(float).values
-            closes = recent["close"].astype(float).values
-            
-            # Análisis de momentum decreciente
-            bodies = np.abs(closes - opens)
-            ranges = highs - lows
-            
-            # 1. ¿Las velas se están haciendo más pequeñas? (momentum perdiendo fuerza)
-            momentum_weakening = False
-            if len(bodies) >= 3:
-                # Comparar últimas 2 velas con las 2 anteriores
-                recent_avg = np.mean(bodies[-2:])
-                earlier_avg = np.mean(bodies[-4:-2])
-                if recent_avg < earlier_avg * 0.75:  # 25% más pequeñas
-                    momentum_weakening = True
-            
-            # 2. Análisis de mechas acumulativas (rechazo creciente)
-            rejection_building = False
-            if expected_dir == "CALL":
-                # Para CALL, buscar mechas inferiores crecientes
-                lower_wicks = np.minimum(opens, closes) - lows
-                wick_ratios = lower_wicks / np.maximum(ranges, 1e-8)
-                # ¿Las últimas 2 velas tienen mechas inferiores significativas?
-                if len(wick_ratios) >= 2 and np.mean(wick_ratios[-2:]) > 0.25:
-                    rejection_building = True
-            else:  # PUT
-                # Para PUT, buscar mechas superiores crecientes  
-                upper_wicks = highs - np.maximum(opens, closes)
-                wick_ratios = upper_wicks / np.maximum(ranges, 1e-8)
-                if len(wick_ratios) >= 2 and np.mean(wick_ratios[-2:]) > 0.25:
-                    rejection_building = True
-            
-            # 3. Patrón de indecisión creciente
-            indecision_pattern = False
-            if len(bodies) >= 3:
-                # Cuerpos cada vez más pequeños relativos al rango
-                body_ratios = bodies / np.maximum(ranges, 1e-8)
-                if np.mean(body_ratios[-2:]) < 0.40:  # Últimas velas con cuerpos <40% del rango
-                    indecision_pattern = True
-            
-            # 4. Cambio en la dirección de cierre
-            direction_shift = False
-            if len(closes) >= 4:
-                # ¿Las últimas 2 velas cerraron en dirección opuesta a las 2 anteriores?
-                recent_direction = "up" if closes[-1] > closes[-3] else "down"
-                earlier_direction = "up" if closes[-3] > closes[-5] else "down"
-                expected_recent = "up" if expected_dir == "CALL" else "down"
-                
-                if recent_direction == expected_recent and recent_direction != earlier_direction:
-                    direction_shift = True
-            
-            # 5. Análisis de la vela de señal específica
-            signal_quality = False
-            s_open = float(signal_candle["open"])
-            s_high = float(signal_candle["high"])
-            s_low = float(signal_candle["low"])
-            s_close = float(signal_candle["close"])
-            s_body = abs(s_close - s_open)
-            s_range = s_high - s_low
-            
-            if s_range > 0:
-                if expected_dir == "CALL":
-                    # Para CALL: vela con mecha inferior prominente y cierre en parte alta
-                    lower_wick = min(s_open, s_close) - s_low
-                    close_position = (s_close - s_low) / s_range  # 0=low, 1=high
-                    if lower_wick / s_range > 0.30 and close_position > 0.60:
-                        signal_quality = True
-                else:  # PUT
-                    # Para PUT: vela con mecha superior prominente y cierre en parte baja
-                    upper_wick = s_high - max(s_open, s_close)
-                    close_position = (s_high - s_close) / s_range  # 0=high, 1=low
-                    if upper_wick / s_range > 0.30 and close_position > 0.60:
-                        signal_quality = True
-            
-            # Decisión: necesitamos al menos 1 de las 5 condiciones (más permisivo para generar señales)
-            conditions_met = sum([
-                momentum_weakening,
-                rejection_building, 
-                indecision_pattern,
-                direction_shift,
-                signal_quality
-            ])
-            
-            return conditions_met >= 1
-            
+            # Velas -6..-2 cerradas + la actual; la señal es df_m1.iloc[-2].
+            # Basta con 1 de las 5 condiciones (ver candle_patterns.scan_patterns)
+            cols = scan_patterns(*(df_m1[k].to_numpy(dtype=float)[-6:]
+                                   for k in ("open", "high", "low", "close")))
+            return bool(cols["micro_call" if expected_dir == "CALL" else "micro_put"][-2])
         except Exception:
             return False
 
-    # ── Escaneo de zonas ──────────────────────────────────────────────────────
+    # ── Mantenimiento de zonas ────────────────────────────────────────────────
 
-    def _rescan_zones(self, asset: str, df_m5: pd.DataFrame,
-                       df_m15: Optional[pd.DataFrame], df_h1: Optional[pd.DataFrame]):
+    def _update_zones(self, asset: str, df_m5: pd.DataFrame,
+                      df_m15: Optional[pd.DataFrame], df_h1: Optional[pd.DataFrame]):
+        """Alimenta el tracker incremental y persiste solo las zonas que cambiaron."""
         try:
-            detected = self.zone_detector.detect_multi_tf(
-                df_m5=df_m5,
-                df_m15=df_m15 if df_m15 is not None and len(df_m15) >= 10 else df_m5,
-                df_h1=df_h1 if df_h1 is not None and len(df_h1) >= 5 else None,
-            )
-            if detected:
-                self.memory.bulk_add_zones(asset, detected)
+            tracker = self._zone_trackers.get(asset)
+            if tracker is None:
+                tracker = self._zone_trackers[asset] = ZoneTracker(self.zone_detector)
+            changed = tracker.update({300: df_m5, 900: df_m15, 3600: df_h1})
+            if changed:
+                self.memory.bulk_add_zones(asset, changed)
                 self.memory.purge_weak_zones(asset, min_strength=0.20)
                 self.memory.save()
         except Exception:
@@ -937,16 +796,10 @@ class IntelligentEngine:
         try:
             if df_m1 is None or len(df_m1) < 15:
                 return 0.001
-            highs  = df_m1["high"].values[-15:]
-            lows   = df_m1["low"].values[-15:]
-            closes = df_m1["close"].values[-15:]
-            trs = []
-            for i in range(1, len(highs)):
-                tr = max(highs[i] - lows[i],
-                         abs(highs[i] - closes[i-1]),
-                         abs(lows[i]  - closes[i-1]))
-                trs.append(tr)
-            atr = float(sum(trs) / len(trs)) if trs else 0.001
+            # Media simple del true range de las últimas 14 velas
+            atr = get_indicator_service().atr(df_m1, 14, kind="sma")[-1]
+            atr = float(atr) if np.isfinite(atr) else 0.001
+            closes = df_m1["close"].values
             price = float(closes[-1]) if closes[-1] > 0 else 1.0
             return atr / price
         except Exception:
@@ -8,6 +8,8 @@ import ta
 from typing import Optional, Dict
 from datetime import datetime
 
+from brain.indicator_service import get_indicator_service
+
 
 class SignalEngine:
     """
@@ -287,29 +289,31 @@ class SignalEngine:
                 return None
             df = df.copy()
 
+            # Misma semántica que ta (Wilder ewm, EMAs con min_periods, BB ddof=0)
+            # pero servidas desde la caché compartida
+            indicators = get_indicator_service()
+
             # RSI
-            df["rsi"] = ta.momentum.RSIIndicator(df["close"], window=14).rsi()
+            df["rsi"] = indicators.rsi(df, 14, kind="ewm")
 
             # MACD
-            macd_ind = ta.trend.MACD(df["close"])
-            df["macd"]        = macd_ind.macd()
-            df["macd_signal"] = macd_ind.macd_signal()
+            macd, macd_signal, _ = indicators.macd(df, 12, 26, 9, kind="ewm", strict=True)
+            df["macd"]        = macd
+            df["macd_signal"] = macd_signal
 
             # Bollinger Bands
-            bb = ta.volatility.BollingerBands(df["close"], window=20, window_dev=2)
-            df["bb_high"] = bb.bollinger_hband()
-            df["bb_low"]  = bb.bollinger_lband()
-            df["bb_mid"]  = bb.bollinger_mavg()
+            bb_high, bb_low, bb_mid = indicators.bollinger(df, 20, 2, ddof=0)
+            df["bb_high"] = bb_high
+            df["bb_low"]  = bb_low
+            df["bb_mid"]  = bb_mid
 
             # EMAs
-            df["ema_9"]  = ta.trend.EMAIndicator(df["close"], window=9).ema_indicator()
-            df["ema_21"] = ta.trend.EMAIndicator(df["close"], window=21).ema_indicator()
-            df["ema_50"] = ta.trend.EMAIndicator(df["close"], window=50).ema_indicator()
+            df["ema_9"]  = indicators.ema(df, 9, kind="ewm", strict=True)
+            df["ema_21"] = indicators.ema(df, 21, kind="ewm", strict=True)
+            df["ema_50"] = indicators.ema(df, 50, kind="ewm", strict=True)
 
             # ATR
-            df["atr"] = ta.volatility.AverageTrueRange(
-                df["high"], df["low"], df["close"], window=14
-            ).average_true_range()
+            df["atr"] = indicators.atr(df, 14)
 
             # ADX
             adx = ta.trend.ADXIndicator(df["high"], df["low"], df["close"], window=14)
@@ -65,6 +65,7 @@ from exnovaapi.ws.chanels.buy_blitz_option import BuyBlitzOption
 from exnovaapi.ws.objects.timesync import TimeSync
 from exnovaapi.ws.objects.profile import Profile
 from exnovaapi.ws.objects.candles import Candles
+from exnovaapi.ws.objects.candle_ring import CandleRing
 from exnovaapi.ws.objects.listinfodata import ListInfoData
 from exnovaapi.ws.objects.betinfo import Game_betinfo_data
 import exnovaapi.global_value as global_value
@@ -130,7 +131,7 @@ class ExnovaAPI(object):  # pylint: disable=too-many-instance-attributes
     live_deal_data = nested_dict(3, deque)
 
     subscribe_commission_changed_data = nested_dict(2, dict)
-    real_time_candles = nested_dict(3, dict)
+    real_time_candle_rings = nested_dict(1, dict)
     real_time_candles_maxdict_table = nested_dict(2, dict)
     candle_generated_check = nested_dict(2, dict)
     candle_generated_all_size_check = nested_dict(1, dict)
@@ -179,6 +180,52 @@ class ExnovaAPI(object):  # pylint: disable=too-many-instance-attributes
         # If it is true, the last buy order was successful
         self.buy_successful = None
         self.__active_account_type = None
+        # Notified by the websocket thread after every processed message so
+        # callers can block on a response instead of spinning on a field.
+        self.message_condition = threading.Condition()
+        # Held by the websocket thread while it processes a message; requests
+        # wait on it instead of spinning (re-entrant: handlers may send too).
+        self.message_lock = threading.RLock()
+        # Serializes writes to the socket, including forced sends.
+        self.send_lock = threading.Lock()
+
+    def candle_ring(self, active, size):
+        """Get (or create) the real-time candle ring buffer of an asset/size.
+
+        :param str active: The asset name.
+        :param int size: The candle size in seconds.
+
+        :returns: The instance of :class:`CandleRing
+            <exnovaapi.ws.objects.candle_ring.CandleRing>`.
+        """
+        rings = self.real_time_candle_rings[active]
+        ring = rings.get(size)
+        if ring is None:
+            maxdict = self.real_time_candles_maxdict_table[active][size]
+            capacity = maxdict if isinstance(maxdict, int) and maxdict > 0 else 1000
+            ring = rings[size] = CandleRing(capacity, size)
+        return ring
+
+    def wait_for(self, predicate, timeout=None):
+        """Block until predicate() is true or timeout expires.
+
+        :param predicate: Callable evaluated after every incoming message.
+        :param timeout: Seconds to wait, None waits forever.
+
+        :returns: The last value of predicate().
+        """
+        with self.message_condition:
+            return self.message_condition.wait_for(predicate, timeout)
+
+    def wait_message(self, timeout):
+        """Block until the next websocket message is processed or timeout expires."""
+        with self.message_condition:
+            self.message_condition.wait(timeout)
+
+    def notify_message(self):
+        """Wake every thread blocked in :meth:`wait_for`."""
+        with self.message_condition:
+            self.message_condition.notify_all()
 
     def prepare_http_url(self, resource):
         """Construct http url from resource url.
@@ -272,12 +319,13 @@ class ExnovaAPI(object):  # pylint: disable=too-many-instance-attributes
         data = json.dumps(dict(name=name,
                                msg=msg, request_id=request_id))
 
-        while (global_value.ssl_Mutual_exclusion or global_value.ssl_Mutual_exclusion_write) and no_force_send:
-            pass
-        global_value.ssl_Mutual_exclusion_write = True
-        self.websocket.send(data)
+        if no_force_send:
+            with self.message_lock, self.send_lock:
+                self.websocket.send(data)
+        else:
+            with self.send_lock:
+                self.websocket.send(data)
         logger.debug(data)
-        global_value.ssl_Mutual_exclusion_write = False
 
     @property
     def logout(self):
@@ -587,4 +587,35 @@ ACTIVES = {
     "FETUSD-OTC": 2289,
     "RENDERUSD-OTC": 2290,
     "TAOUSD-OTC": 2291
-}
\ No newline at end of file
+}
+
+# id -> name reverse map of ACTIVES, rebuilt when ACTIVES is replaced or grows
+_ACTIVE_NAMES = {}
+_ACTIVE_NAMES_KEY = None
+
+
+def refresh_active_names():
+    """Rebuild the id -> name map (first name wins, like list.index)."""
+    global _ACTIVE_NAMES, _ACTIVE_NAMES_KEY
+    names = {}
+    for name, active_id in ACTIVES.items():
+        names.setdefault(active_id, name)
+    _ACTIVE_NAMES = names
+    _ACTIVE_NAMES_KEY = (id(ACTIVES), len(ACTIVES))
+
+
+def get_active_name(active_id):
+    """O(1) lookup of the asset name for an active id.
+
+    :raises ValueError: if the id is not in ACTIVES.
+    """
+    if _ACTIVE_NAMES_KEY != (id(ACTIVES), len(ACTIVES)):
+        refresh_active_names()
+    try:
+        return _ACTIVE_NAMES[active_id]
+    except KeyError:
+        # An entry may have been re-assigned in place; rebuild once
+        refresh_active_names()
+        if active_id in _ACTIVE_NAMES:
+            return _ACTIVE_NAMES[active_id]
+        raise ValueError("{} is not in ACTIVES".format(active_id))
@@ -8,7 +8,7 @@ setup(
     author_email="cassioms764@gmail.com",
     url="https://github.com/cassDS/exnovaapi",
     packages=find_packages(),
-    install_requires=["pylint", "requests", "websocket-client==1.8.0"],
+    install_requires=["pylint", "requests", "websocket-client==1.8.0", "numpy"],
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License"
@@ -32,6 +32,8 @@ class Exnova:
         self.email = email
         self.password = password
         self.suspend = 0.5
+        # Max seconds to wait for a websocket response before giving up
+        self.response_timeout = 60
         self.thread = None
         self.subscribe_candle = []
         self.subscribe_candle_all_size = []
@@ -51,6 +53,18 @@ class Exnova:
 
     # --------------------------------------------------------------------------
 
+    def _wait_for(self, predicate, timeout=None, name="response"):
+        """Block (without spinning) until predicate() is true.
+
+        :returns: True if the condition was met, False on timeout.
+        """
+        if timeout is None:
+            timeout = self.response_timeout
+        if self.api.wait_for(predicate, timeout):
+            return True
+        logging.error('**error** timeout waiting for {} after {}s'.format(name, timeout))
+        return False
+
     def get_server_timestamp(self):
         return self.api.timesync.server_timestamp
 
@@ -108,8 +122,8 @@ class Exnova:
             self.re_subscribe_stream()
 
             # ---------for async get name: "position-changed", microserviceName
-            while global_value.balance_id == None:
-                pass
+            if not self._wait_for(lambda: global_value.balance_id is not None, name="balance_id"):
+                return False, "timeout waiting for balance_id"
 
             self.position_change_all(
                 "subscribeMessage", global_value.balance_id)
@@ -188,6 +202,7 @@ class Exnova:
             for lis in sorted(OP_code.ACTIVES.items(), key=operator.itemgetter(1)):
                 dicc[lis[0]] = lis[1]
             OP_code.ACTIVES = dicc
+            OP_code.refresh_active_names()
         except Exception as e:
             logging.error(f'**error** Failed to update ACTIVES OPCODE: {e}')
             # Si falla, intentar reconectar y reintentar una vez
@@ -201,6 +216,7 @@ class Exnova:
                 for lis in sorted(OP_code.ACTIVES.items(), key=operator.itemgetter(1)):
                     dicc[lis[0]] = lis[1]
                 OP_code.ACTIVES = dicc
+                OP_code.refresh_active_names()
             except Exception as retry_error:
                 logging.error(f'**error** Retry also failed: {retry_error}')
 
@@ -214,8 +230,7 @@ class Exnova:
     def get_financial_information(self, activeId):
         self.api.financial_information = None
         self.api.get_financial_information(activeId)
-        while self.api.financial_information == None:
-            pass
+        self._wait_for(lambda: self.api.financial_information is not None, name="financial_information")
         return self.api.financial_information
 
     def get_leader_board(self, country, from_position, to_position, near_traders_count, user_country_id=0, near_traders_country_count=0, top_country_count=0, top_count=0, top_type=2):
@@ -225,8 +240,7 @@ class Exnova:
         self.api.Get_Leader_Board(country_id, user_country_id, from_position, to_position,
                                   near_traders_country_count, near_traders_count, top_country_count, top_count, top_type)
 
-        while self.api.leaderboard_deals_client == None:
-            pass
+        self._wait_for(lambda: self.api.leaderboard_deals_client is not None, name="leaderboard_deals_client")
         return self.api.leaderboard_deals_client
 
     def get_instruments(self, type):
@@ -237,8 +251,7 @@ class Exnova:
             try:
                 self.api.get_instruments(type)
                 start = time.time()
-                while self.api.instruments == None and time.time() - start < 10:
-                    pass
+                self._wait_for(lambda: self.api.instruments is not None, 10, name="instruments")
             except:
                 logging.error('**error** api.get_instruments need reconnect')
                 self.connect()
@@ -285,17 +298,8 @@ class Exnova:
                 
                 self.api.get_api_option_init_all()
                 
-                start = time.time()
-                while True:
-                    if time.time() - start > 30:
-                        logging.error('**warning** get_all_init late 30 sec')
-                        break
-                    try:
-                        if self.api.api_option_init_all_result != None:
-                            break
-                    except:
-                        pass
-                    time.sleep(0.1)  # Pequeña pausa para evitar CPU overload
+                if not self.api.wait_for(lambda: self.api.api_option_init_all_result != None, 30):
+                    logging.error('**warning** get_all_init late 30 sec')
                 
                 try:
                     if self.api.api_option_init_all_result and self.api.api_option_init_all_result.get("isSuccessful") == True:
@@ -331,6 +335,7 @@ class Exnova:
             if time.time() - start_t >= 30:
                 logging.error('**warning** get_all_init_v2 late 30 sec')
                 return None
+            self.api.wait_message(0.1)
         return self.api.api_option_init_all_result_v2
 
         # return OP_code.ACTIVES
@@ -445,8 +450,7 @@ class Exnova:
     # ______________________________________self.api.getprofile() https________________________________
 
     def get_profile_ansyc(self):
-        while self.api.profile.msg == None:
-            pass
+        self._wait_for(lambda: self.api.profile.msg is not None, name="profile")
         return self.api.profile.msg
 
     """def get_profile(self):
@@ -464,6 +468,8 @@ class Exnova:
 
     def get_currency(self):
         balances_raw = self.get_balances()
+        if balances_raw is None:
+            return None
         for balance in balances_raw["msg"]:
             if balance["id"] == global_value.balance_id:
                 return balance["currency"]
@@ -487,6 +493,8 @@ class Exnova:
     def get_balance(self):
 
         balances_raw = self.get_balances()
+        if balances_raw is None:
+            return None
         for balance in balances_raw["msg"]:
             if balance["id"] == global_value.balance_id:
                 return balance["amount"]
@@ -494,13 +502,14 @@ class Exnova:
     def get_balances(self):
         self.api.balances_raw = None
         self.api.get_balances()
-        while self.api.balances_raw == None:
-            pass
+        self._wait_for(lambda: self.api.balances_raw is not None, name="balances_raw")
         return self.api.balances_raw
 
     def get_balance_mode(self):
         # self.api.profile.balance_type=None
         profile = self.get_profile_ansyc()
+        if profile is None:
+            return None
         for balance in profile.get("balances"):
             if balance["id"] == global_value.balance_id:
                 if balance["type"] == 1:
@@ -514,8 +523,7 @@ class Exnova:
     def reset_practice_balance(self):
         self.api.training_balance_reset_request = None
         self.api.reset_training_balance()
-        while self.api.training_balance_reset_request == None:
-            pass
+        self._wait_for(lambda: self.api.training_balance_reset_request is not None, name="training_balance_reset_request")
         return self.api.training_balance_reset_request
 
     def position_change_all(self, Main_Name, user_balance_id):
@@ -546,7 +554,12 @@ class Exnova:
         practice_id = None
         tournament_id = None
 
-        for balance in self.get_profile_ansyc()["balances"]:
+        profile = self.get_profile_ansyc()
+        if profile is None:
+            logging.error('**error** change_balance could not get profile')
+            return False
+
+        for balance in profile["balances"]:
             if balance["type"] == 1:
                 real_id = balance["id"]
             if balance["type"] == 4:
@@ -572,24 +585,47 @@ class Exnova:
     # _______________________        CANDLE      _____________________________
     # ________________________self.api.getcandles() wss________________________
 
-    def get_candles(self, ACTIVES, interval, count, endtime):
-        self.api.candles.candles_data = None
-        while True:
+    def get_candles(self, ACTIVES, interval, count, endtime, timeout=30):
+        return self.get_candles_many([(ACTIVES, interval, count, endtime)], timeout)[0]
+
+    def get_candles_many(self, queries, timeout=30, retries=3):
+        """Request several candle windows at once and wait for all replies.
+
+        :param queries: list of (ACTIVES, interval, count, endtime) tuples.
+        :param timeout: seconds to wait for each round of replies.
+
+        :returns: list with the candles data of each query (None on failure).
+        """
+        results = [None] * len(queries)
+        todo = []
+        for i, (ACTIVES, interval, count, endtime) in enumerate(queries):
+            if ACTIVES not in OP_code.ACTIVES:
+                print('Asset {} not found on consts'.format(ACTIVES))
+                continue
+            todo.append(i)
+
+        for _ in range(retries):
+            if not todo:
+                break
             try:
-                if ACTIVES not in OP_code.ACTIVES:
-                    print('Asset {} not found on consts'.format(ACTIVES))
-                    break
-                self.api.getcandles(
-                    OP_code.ACTIVES[ACTIVES], interval, count, endtime)
-                while self.check_connect and self.api.candles.candles_data == None:
-                    pass
-                if self.api.candles.candles_data != None:
-                    break
+                request_ids = {}
+                for i in todo:
+                    ACTIVES, interval, count, endtime = queries[i]
+                    request_ids[i] = self.api.getcandles(
+                        OP_code.ACTIVES[ACTIVES], interval, count, endtime)
+                deadline = time.time() + timeout
+                for i, request_id in request_ids.items():
+                    results[i] = self.api.candles.wait_reply(
+                        request_id, max(0.0, deadline - time.time()))
+                todo = [i for i in todo if results[i] is None]
+                if todo and not self.check_connect():
+                    logging.error('**error** get_candles need reconnect')
+                    self.connect()
             except:
                 logging.error('**error** get_candles need reconnect')
                 self.connect()
 
-        return self.api.candles.candles_data
+        return results
 
     #######################################################
     # ______________________________________________________
@@ -598,20 +634,22 @@ class Exnova:
     #######################################################
 
     def start_candles_stream(self, ACTIVE, size, maxdict):
-
+        """Seed the ring(s) from history and subscribe; False on timeout or bad size."""
         if size == "all":
             for s in self.size:
-                self.full_realtime_get_candle(ACTIVE, s, maxdict)
+                # maxdict first: the ring is sized from it
                 self.api.real_time_candles_maxdict_table[ACTIVE][s] = maxdict
-            self.start_candles_all_size_stream(ACTIVE)
+                self.full_realtime_get_candle(ACTIVE, s, maxdict)
+            return self.start_candles_all_size_stream(ACTIVE)
         elif size in self.size:
             self.api.real_time_candles_maxdict_table[ACTIVE][size] = maxdict
             self.full_realtime_get_candle(ACTIVE, size, maxdict)
-            self.start_candles_one_stream(ACTIVE, size)
+            return self.start_candles_one_stream(ACTIVE, size)
 
         else:
             logging.error(
                 '**error** start_candles_stream please input right size')
+            return False
 
     def stop_candles_stream(self, ACTIVE, size):
         if size == "all":
@@ -625,14 +663,15 @@ class Exnova:
     def get_realtime_candles(self, ACTIVE, size):
         if size == "all":
             try:
-                return self.api.real_time_candles[ACTIVE]
+                return {s: ring.to_dict()
+                        for s, ring in self.api.real_time_candle_rings[ACTIVE].items()}
             except:
                 logging.error(
                     '**error** get_realtime_candles() size="all" can not get candle')
                 return False
         elif size in self.size:
             try:
-                return self.api.real_time_candles[ACTIVE][size]
+                return self.api.real_time_candle_rings[ACTIVE][size].to_dict()
             except:
                 logging.error(
                     '**error** get_realtime_candles() size=' + str(size) + ' can not get candle')
@@ -642,7 +681,22 @@ class Exnova:
                 '**error** get_realtime_candles() please input right "size"')
 
     def get_all_realtime_candles(self):
-        return self.api.real_time_candles
+        return {active: {size: ring.to_dict() for size, ring in rings.items()}
+                for active, rings in self.api.real_time_candle_rings.items()}
+
+    def get_realtime_candle_ring(self, ACTIVE, size):
+        """Return the live ring buffer of ACTIVE/size or None if not streaming."""
+        return self.api.real_time_candle_rings[ACTIVE].get(size)
+
+    def get_realtime_bars(self, ACTIVE, size, count=None):
+        """Return the last `count` live bars as NumPy column views (no copy).
+
+        :returns: dict from/open/max/min/close/volume -> array, or None.
+        """
+        ring = self.get_realtime_candle_ring(ACTIVE, size)
+        if ring is None:
+            return None
+        return ring.last(count)
 
     ################################################
     # ---------REAL TIME CANDLE Subset Function---------
@@ -652,9 +706,11 @@ class Exnova:
     def full_realtime_get_candle(self, ACTIVE, size, maxdict):
         candles = self.get_candles(
             ACTIVE, size, maxdict, self.api.timesync.server_timestamp)
-        for can in candles:
-            self.api.real_time_candles[str(
-                ACTIVE)][int(size)][can["from"]] = can
+        # New ring sized for maxdict, seeded with the history window
+        self.api.real_time_candle_rings[str(ACTIVE)].pop(int(size), None)
+        ring = self.api.candle_ring(str(ACTIVE), int(size))
+        for can in candles or []:
+            ring.update(can)
 
     # ------------------------Subscribe ONE SIZE-----------------------
     def start_candles_one_stream(self, ACTIVE, size):
@@ -794,8 +850,9 @@ class Exnova:
     def get_technical_indicators(self, ACTIVES):
         request_id = self.api.get_Technical_indicators(
             OP_code.ACTIVES[ACTIVES])
-        while self.api.technical_indicators.get(request_id) == None:
-            pass
+        if not self._wait_for(lambda: self.api.technical_indicators.get(request_id) is not None,
+                              name="technical_indicators"):
+            return None
         return self.api.technical_indicators[request_id]
 
 ##############################################################################################
@@ -804,8 +861,8 @@ class Exnova:
 ##############################################################################################
 
     def check_binary_order(self, order_id):
-        while order_id not in self.api.order_binary:
-            pass
+        if not self._wait_for(lambda: order_id in self.api.order_binary, name="order_binary"):
+            return None
         your_order = self.api.order_binary[order_id]
         del self.api.order_binary[order_id]
         return your_order
@@ -819,6 +876,7 @@ class Exnova:
                     break
             except:
                 pass
+            self.api.wait_message(0.5)
         self.api.listinfodata.delete(id_number)
         return listinfodata_dict["win"]
 
@@ -840,63 +898,68 @@ class Exnova:
 
     def check_win_v4(self, id_number, timeout=120):
         """
-        Versión asíncrona con timeout para verificar resultado de operación
-        
+        Versión orientada a eventos con timeout para verificar resultado de operación
+
         Args:
             id_number: ID de la operación
             timeout: Tiempo máximo de espera en segundos (default: 120)
-            
+
         Returns:
             tuple: (resultado, ganancia/pérdida) o (None, None) si timeout
         """
-        start_time = time.time()
-        
-        while True:
-            # Verificar timeout
-            if time.time() - start_time > timeout:
-                logging.error(f'**error** check_win_v4 timeout after {timeout}s for order {id_number}')
+        # Bloquea hasta que llegue el socket-option-closed de la orden (sin sondear)
+        if not self.api.wait_for(
+                lambda: self.api.socket_option_closed.get(id_number) is not None, timeout):
+            logging.error(f'**error** check_win_v4 timeout after {timeout}s for order {id_number}')
+            return None, None
+
+        return self.get_option_result(id_number)
+
+    def get_option_result(self, id_number):
+        """
+        Resultado de una operación cerrada sin bloquear.
+
+        Returns:
+            tuple: (resultado, ganancia/pérdida); (None, None) si todavía no
+            llegó el socket-option-closed o la respuesta es inválida
+        """
+        x = self.api.socket_option_closed.get(id_number)
+        if x is None:
+            return None, None
+
+        try:
+            # Validar que tenga la estructura esperada
+            if 'msg' not in x:
+                logging.error(f'**error** check_win_v4 invalid response structure for order {id_number}')
                 return None, None
-            
-            try:
-                # Verificar si hay resultado disponible
-                if id_number in self.api.socket_option_closed and self.api.socket_option_closed[id_number] is not None:
-                    x = self.api.socket_option_closed[id_number]
-                    
-                    # Validar que tenga la estructura esperada
-                    if 'msg' not in x:
-                        logging.error(f'**error** check_win_v4 invalid response structure for order {id_number}')
-                        return None, None
-                    
-                    msg = x['msg']
-                    if 'win' not in msg:
-                        logging.error(f'**error** check_win_v4 missing win field for order {id_number}')
-                        return None, None
-                    
-                    win_status = msg['win']
-                    
-                    # Calcular ganancia/pérdida
-                    if win_status == 'equal':
-                        profit = 0
-                    elif win_status == 'loose':
-                        profit = float(msg.get('sum', 0)) * -1
-                    else:  # win
-                        profit = float(msg.get('win_amount', 0)) - float(msg.get('sum', 0))
-                    
-                    logging.info(f'check_win_v4 result for order {id_number}: {win_status}, profit: {profit}')
-                    return win_status, profit
-                    
-            except KeyError as e:
-                logging.debug(f'check_win_v4 waiting for result {id_number}: {e}')
-            except Exception as e:
-                logging.error(f'**error** check_win_v4 exception for order {id_number}: {e}')
+
+            msg = x['msg']
+            if 'win' not in msg:
+                logging.error(f'**error** check_win_v4 missing win field for order {id_number}')
                 return None, None
-            
-            # Pequeña pausa para no saturar CPU
-            time.sleep(0.5)
+
+            win_status = msg['win']
+
+            # Calcular ganancia/pérdida
+            if win_status == 'equal':
+                profit = 0
+            elif win_status == 'loose':
+                profit = float(msg.get('sum', 0)) * -1
+            else:  # win
+                profit = float(msg.get('win_amount', 0)) - float(msg.get('sum', 0))
+
+            logging.info(f'check_win_v4 result for order {id_number}: {win_status}, profit: {profit}')
+            return win_status, profit
+
+        except Exception as e:
+            logging.error(f'**error** check_win_v4 exception for order {id_number}: {e}')
+            return None, None
 
     def check_win_v3(self, id_number):
         while True:
             result = self.get_optioninfo_v2(10)
+            if result is None:
+                continue
             if result['msg']['closed_options'][0]['id'][0] == id_number and result['msg']['closed_options'][0]['id'][0] != None:
                 return result['msg']['closed_options'][0]['win'], (result['msg']['closed_options'][0]['win_amount'] - result['msg']['closed_options'][0]['amount'] if result['msg']['closed_options'][0]['win'] != 'equal' else 0)
                 break
@@ -922,6 +985,7 @@ class Exnova:
                     self.connect()
                     self.api.get_betinfo(id_number)
                     time.sleep(self.suspend * 10)
+                self.api.wait_message(0.5)
             if self.api.game_betinfo.isSuccessful == True:
                 return self.api.game_betinfo.isSuccessful, self.api.game_betinfo.dict
             else:
@@ -931,16 +995,14 @@ class Exnova:
     def get_optioninfo(self, limit):
         self.api.api_game_getoptions_result = None
         self.api.get_options(limit)
-        while self.api.api_game_getoptions_result == None:
-            pass
+        self._wait_for(lambda: self.api.api_game_getoptions_result is not None, name="api_game_getoptions_result")
 
         return self.api.api_game_getoptions_result
 
     def get_optioninfo_v2(self, limit):
         self.api.get_options_v2_data = None
         self.api.get_options_v2(limit, "binary,turbo")
-        while self.api.get_options_v2_data == None:
-            pass
+        self._wait_for(lambda: self.api.get_options_v2_data is not None, name="get_options_v2_data")
 
         return self.api.get_options_v2_data
 
@@ -955,8 +1017,7 @@ class Exnova:
             for idx in range(buy_len):
                 self.api.buyv3(
                     price[idx], OP_code.ACTIVES[ACTIVES[idx]], ACTION[idx], expirations[idx], idx)
-            while len(self.api.buy_multi_option) < buy_len:
-                pass
+            self._wait_for(lambda: len(self.api.buy_multi_option) >= buy_len, name="buy_multi")
             buy_id = []
             for key in sorted(self.api.buy_multi_option.keys()):
                 try:
@@ -1005,6 +1066,7 @@ class Exnova:
             if time.time() - start_t >= 5:
                 logging.error('**warning** buy late 5 sec')
                 return False, None
+            self.api.wait_message(0.1)
 
         return self.api.result, self.api.buy_multi_option[req_id]["id"]
 
@@ -1035,21 +1097,20 @@ class Exnova:
             if time.time() - start_t >= 5:
                 logging.error('**warning** buy late 5 sec')
                 return False, None
+            self.api.wait_message(0.1)
 
         return self.api.result, self.api.buy_multi_option[req_id]["id"]
 
     def sell_option(self, options_ids):
         self.api.sell_option(options_ids)
         self.api.sold_options_respond = None
-        while self.api.sold_options_respond == None:
-            pass
+        self._wait_for(lambda: self.api.sold_options_respond is not None, name="sold_options_respond")
         return self.api.sold_options_respond
 
     def sell_digital_option(self, options_ids):
         self.api.sell_digital_option(options_ids)
         self.api.sold_digital_options_respond = None
-        while self.api.sold_digital_options_respond == None:
-            pass
+        self._wait_for(lambda: self.api.sold_digital_options_respond is not None, name="sold_digital_options_respond")
         return self.api.sold_digital_options_respond
 # __________________for Digital___________________
 
@@ -1062,6 +1123,7 @@ class Exnova:
                 logging.error(
                     '**warning** get_digital_underlying_list_data late 30 sec')
                 return None
+            self.api.wait_message(0.1)
 
         return self.api.underlying_list_data
 
@@ -1069,8 +1131,8 @@ class Exnova:
         self.api.strike_list = None
         self.api.get_strike_list(ACTIVES, duration)
         ans = {}
-        while self.api.strike_list == None:
-            pass
+        if not self._wait_for(lambda: self.api.strike_list is not None, name="strike_list"):
+            return None, None
         try:
             for data in self.api.strike_list["msg"]["strike"]:
                 temp = {}
@@ -1092,16 +1154,14 @@ class Exnova:
             ACTIVE, expiration_period)
 
     def get_instrument_quites_generated_data(self, ACTIVE, duration):
-        while self.api.instrument_quotes_generated_raw_data[ACTIVE][duration * 60] == {}:
-            pass
+        self._wait_for(lambda: self.api.instrument_quotes_generated_raw_data[ACTIVE][duration * 60] != {},
+                       name="instrument_quotes_generated")
         return self.api.instrument_quotes_generated_raw_data[ACTIVE][duration * 60]
 
     def get_realtime_strike_list(self, ACTIVE, duration):
-        while True:
-            if not self.api.instrument_quites_generated_data[ACTIVE][duration * 60]:
-                pass
-            else:
-                break
+        if not self._wait_for(lambda: bool(self.api.instrument_quites_generated_data[ACTIVE][duration * 60]),
+                              name="instrument_quites_generated"):
+            return {}
         """
         strike_list dict: price:{call:id,put:id}
         """
@@ -1111,6 +1171,8 @@ class Exnova:
         while ans == {}:
             if self.get_realtime_strike_list_temp_data == {} or now_timestamp != self.get_realtime_strike_list_temp_expiration:
                 raw_data, strike_list = self.get_strike_list(ACTIVE, duration)
+                if raw_data is None:
+                    return {}
                 self.get_realtime_strike_list_temp_expiration = raw_data["msg"]["expiration"]
                 self.get_realtime_strike_list_temp_data = strike_list
             else:
@@ -1176,12 +1238,9 @@ class Exnova:
 
         request_id = self.api.place_digital_option(instrument_id, amount)
 
-        start_t = time.time()
-        while self.api.digital_option_placed_id.get(request_id) == None:
-            if time.time() - start_t > 10:
-                logging.error('**error** buy_digital_spot timeout')
-                return False, None
-            time.sleep(0.1)
+        if not self.api.wait_for(lambda: self.api.digital_option_placed_id.get(request_id) is not None, 10):
+            logging.error('**error** buy_digital_spot timeout')
+            return False, None
         digital_order_id = self.api.digital_option_placed_id.get(request_id)
         if isinstance(digital_order_id, int):
             return True, digital_order_id
@@ -1202,8 +1261,9 @@ class Exnova:
                     return row["price"]["bid"]
             return None
 
-        while self.get_async_order(position_id)["position-changed"] == {}:
-            pass
+        if not self._wait_for(lambda: self.get_async_order(position_id)["position-changed"] != {},
+                              name="position-changed"):
+            return None
         # ___________________/*position*/_________________
         position = self.get_async_order(position_id)["position-changed"]["msg"]
         # doEURUSD201911040628PT1MPSPT
@@ -1296,23 +1356,27 @@ class Exnova:
             if time.time() - start_t > 30:
                 logging.error('buy_digital loss digital_option_placed_id')
                 return False, None
+            self.api.wait_message(0.1)
         return True, self.api.digital_option_placed_id
 
     def close_digital_option(self, position_id):
         self.api.result = None
-        while self.get_async_order(position_id)["position-changed"] == {}:
-            pass
+        if not self._wait_for(lambda: self.get_async_order(position_id)["position-changed"] != {},
+                              name="position-changed"):
+            return None
         position_changed = self.get_async_order(
             position_id)["position-changed"]["msg"]
         self.api.close_digital_option(position_changed["external_id"])
-        while self.api.result == None:
-            pass
+        if not self._wait_for(lambda: self.api.result is not None, name="result"):
+            return None
         return self.api.result
 
     def check_win_digital(self, buy_order_id, polling_time):
         while True:
             time.sleep(polling_time)
             data = self.get_digital_position(buy_order_id)
+            if data is None:
+                continue
 
             if data["msg"]["position"]["status"] == "closed":
                 if data["msg"]["position"]["close_reason"] == "default":
@@ -1322,8 +1386,9 @@ class Exnova:
 
     def check_win_digital_v2(self, buy_order_id):
 
-        while self.get_async_order(buy_order_id)["position-changed"] == {}:
-            pass
+        if not self._wait_for(lambda: self.get_async_order(buy_order_id)["position-changed"] != {},
+                              name="position-changed"):
+            return False, None
         order_data = self.get_async_order(
             buy_order_id)["position-changed"]["msg"]
         if order_data != None:
@@ -1361,10 +1426,10 @@ class Exnova:
             use_token_for_commission=use_token_for_commission
         )
 
-        while self.api.buy_order_id == None:
-            pass
+        if not self._wait_for(lambda: self.api.buy_order_id is not None, name="buy_order_id"):
+            return False, None
         check, data = self.get_order(self.api.buy_order_id)
-        while data["status"] == "pending_new":
+        while check and data["status"] == "pending_new":
             check, data = self.get_order(self.api.buy_order_id)
             time.sleep(1)
 
@@ -1380,8 +1445,8 @@ class Exnova:
     def change_auto_margin_call(self, ID_Name, ID, auto_margin_call):
         self.api.auto_margin_call_changed_respond = None
         self.api.change_auto_margin_call(ID_Name, ID, auto_margin_call)
-        while self.api.auto_margin_call_changed_respond == None:
-            pass
+        if not self._wait_for(lambda: self.api.auto_margin_call_changed_respond is not None, name="auto_margin_call_changed_respond"):
+            return False, None
         if self.api.auto_margin_call_changed_respond["status"] == 2000:
             return True, self.api.auto_margin_call_changed_respond
         else:
@@ -1394,8 +1459,7 @@ class Exnova:
         check = True
         if ID_Name == "position_id":
             check, order_data = self.get_order(order_id)
-            position_id = order_data["position_id"]
-            ID = position_id
+            ID = order_data["position_id"] if check else None
         elif ID_Name == "order_id":
             ID = order_id
         else:
@@ -1410,8 +1474,8 @@ class Exnova:
                 use_trail_stop=use_trail_stop)
             self.change_auto_margin_call(
                 ID_Name=ID_Name, ID=ID, auto_margin_call=auto_margin_call)
-            while self.api.tpsl_changed_respond == None:
-                pass
+            if not self._wait_for(lambda: self.api.tpsl_changed_respond is not None, name="tpsl_changed_respond"):
+                return False, None
             if self.api.tpsl_changed_respond["status"] == 2000:
                 return True, self.api.tpsl_changed_respond["msg"]
             else:
@@ -1432,8 +1496,8 @@ class Exnova:
         # new
         self.api.order_data = None
         self.api.get_order(buy_order_id)
-        while self.api.order_data == None:
-            pass
+        if not self._wait_for(lambda: self.api.order_data is not None, name="order_data"):
+            return False, None
         if self.api.order_data["status"] == 2000:
             return True, self.api.order_data["msg"]
         else:
@@ -1442,8 +1506,8 @@ class Exnova:
     def get_pending(self, instrument_type):
         self.api.deferred_orders = None
         self.api.get_pending(instrument_type)
-        while self.api.deferred_orders == None:
-            pass
+        if not self._wait_for(lambda: self.api.deferred_orders is not None, name="deferred_orders"):
+            return False, None
         if self.api.deferred_orders["status"] == 2000:
             return True, self.api.deferred_orders["msg"]
         else:
@@ -1453,8 +1517,8 @@ class Exnova:
     def get_positions(self, instrument_type):
         self.api.positions = None
         self.api.get_positions(instrument_type)
-        while self.api.positions == None:
-            pass
+        if not self._wait_for(lambda: self.api.positions is not None, name="positions"):
+            return False, None
         if self.api.positions["status"] == 2000:
             return True, self.api.positions["msg"]
         else:
@@ -1463,10 +1527,12 @@ class Exnova:
     def get_position(self, buy_order_id):
         self.api.position = None
         check, order_data = self.get_order(buy_order_id)
+        if not check:
+            return False, None
         position_id = order_data["position_id"]
         self.api.get_position(position_id)
-        while self.api.position == None:
-            pass
+        if not self._wait_for(lambda: self.api.position is not None, name="position"):
+            return False, None
         if self.api.position["status"] == 2000:
             return True, self.api.position["msg"]
         else:
@@ -1477,26 +1543,26 @@ class Exnova:
     def get_digital_position_by_position_id(self, position_id):
         self.api.position = None
         self.api.get_digital_position(position_id)
-        while self.api.position == None:
-            pass
+        self._wait_for(lambda: self.api.position is not None, name="position")
         return self.api.position
 
     def get_digital_position(self, order_id):
         self.api.position = None
-        while self.get_async_order(order_id)["position-changed"] == {}:
-            pass
+        if not self._wait_for(lambda: self.get_async_order(order_id)["position-changed"] != {},
+                              name="position-changed"):
+            return None
         position_id = self.get_async_order(
             order_id)["position-changed"]["msg"]["external_id"]
         self.api.get_digital_position(position_id)
-        while self.api.position == None:
-            pass
+        if not self._wait_for(lambda: self.api.position is not None, name="position"):
+            return None
         return self.api.position
 
     def get_position_history(self, instrument_type):
         self.api.position_history = None
         self.api.get_position_history(instrument_type)
-        while self.api.position_history == None:
-            pass
+        if not self._wait_for(lambda: self.api.position_history is not None, name="position_history"):
+            return False, None
 
         if self.api.position_history["status"] == 2000:
             return True, self.api.position_history["msg"]
@@ -1508,8 +1574,8 @@ class Exnova:
         self.api.position_history_v2 = None
         self.api.get_position_history_v2(
             instrument_type, limit, offset, start, end)
-        while self.api.position_history_v2 == None:
-            pass
+        if not self._wait_for(lambda: self.api.position_history_v2 is not None, name="position_history_v2"):
+            return False, None
 
         if self.api.position_history_v2["status"] == 2000:
             return True, self.api.position_history_v2["msg"]
@@ -1523,8 +1589,8 @@ class Exnova:
         else:
             self.api.get_available_leverages(
                 instrument_type, OP_code.ACTIVES[actives])
-        while self.api.available_leverages == None:
-            pass
+        if not self._wait_for(lambda: self.api.available_leverages is not None, name="available_leverages"):
+            return False, None
         if self.api.available_leverages["status"] == 2000:
             return True, self.api.available_leverages["msg"]
         else:
@@ -1533,8 +1599,8 @@ class Exnova:
     def cancel_order(self, buy_order_id):
         self.api.order_canceled = None
         self.api.cancel_order(buy_order_id)
-        while self.api.order_canceled == None:
-            pass
+        if not self._wait_for(lambda: self.api.order_canceled is not None, name="order_canceled"):
+            return False
         if self.api.order_canceled["status"] == 2000:
             return True
         else:
@@ -1542,11 +1608,11 @@ class Exnova:
 
     def close_position(self, position_id):
         check, data = self.get_order(position_id)
-        if data["position_id"] != None:
+        if check and data["position_id"] != None:
             self.api.close_position_data = None
             self.api.close_position(data["position_id"])
-            while self.api.close_position_data == None:
-                pass
+            if not self._wait_for(lambda: self.api.close_position_data is not None, name="close_position_data"):
+                return False
             if self.api.close_position_data["status"] == 2000:
                 return True
             else:
@@ -1555,12 +1621,12 @@ class Exnova:
             return False
 
     def close_position_v2(self, position_id):
-        while self.get_async_order(position_id) == None:
-            pass
+        if not self._wait_for(lambda: self.get_async_order(position_id) is not None, name="get_async_order"):
+            return False
         position_changed = self.get_async_order(position_id)
         self.api.close_position(position_changed["id"])
-        while self.api.close_position_data == None:
-            pass
+        if not self._wait_for(lambda: self.api.close_position_data is not None, name="close_position_data"):
+            return False
         if self.api.close_position_data["status"] == 2000:
             return True
         else:
@@ -1569,8 +1635,8 @@ class Exnova:
     def get_overnight_fee(self, instrument_type, active):
         self.api.overnight_fee = None
         self.api.get_overnight_fee(instrument_type, OP_code.ACTIVES[active])
-        while self.api.overnight_fee == None:
-            pass
+        if not self._wait_for(lambda: self.api.overnight_fee is not None, name="overnight_fee"):
+            return False, None
         if self.api.overnight_fee["status"] == 2000:
             return True, self.api.overnight_fee["msg"]
         else:
@@ -1585,7 +1651,7 @@ class Exnova:
     # -----------------------------------------------------------------
 
     def opcode_to_name(self, opcode):
-        return list(OP_code.ACTIVES.keys())[list(OP_code.ACTIVES.values()).index(opcode)]
+        return OP_code.get_active_name(opcode)
 
     # name:
     # "live-deal-binary-option-placed"
@@ -1632,8 +1698,7 @@ class Exnova:
     def get_user_profile_client(self, user_id):
         self.api.user_profile_client = None
         self.api.Get_User_Profile_Client(user_id)
-        while self.api.user_profile_client == None:
-            pass
+        self._wait_for(lambda: self.api.user_profile_client is not None, name="user_profile_client")
 
         return self.api.user_profile_client
 
@@ -1670,6 +1735,7 @@ class Exnova:
         while self.api.digital_payout is None:
             if seconds and int(time.time() - start) > seconds:
                 break
+            self.api.wait_message(0.1)
 
         self.api.unsubscribe_digital_price_splitter(asset_id)
 
@@ -1713,8 +1779,9 @@ class Exnova:
         logger.info(instrument_id)
         request_id = self.api.place_digital_option_v2(instrument_id, active_id, amount)
 
-        while self.api.digital_option_placed_id.get(request_id) is None:
-            pass
+        if not self._wait_for(lambda: self.api.digital_option_placed_id.get(request_id) is not None,
+                              name="digital_option_placed_id"):
+            return False, None
 
         digital_order_id = self.api.digital_option_placed_id.get(request_id)
         if isinstance(digital_order_id, int):
@@ -1770,6 +1837,7 @@ class Exnova:
             if time.time() - start_t >= 5:
                 logging.error('**warning** buy_blitz late 5 sec')
                 return False, None
+            self.api.wait_message(0.1)
 
         return self.api.result, self.api.buy_multi_option[request_id]["id"]
 
@@ -1,8 +1,11 @@
 """Module for Exnova candles websocket chanel."""
 
 from exnovaapi.ws.chanels.base import Base
+import itertools
 import time
 
+_request_counter = itertools.count(1)
+
 class GetCandles(Base):
     """Class for Exnova candles websocket chanel."""
     # pylint: disable=too-few-public-methods
@@ -15,6 +18,8 @@ class GetCandles(Base):
         :param active_id: The active/asset identifier.
         :param duration: The candle duration (timeframe for the candles).
         :param amount: The number of candles you want to have
+
+        :returns: The request identifier used to correlate the reply.
         """
         #thank SeanStayn share new request
         #https://github.com/n1nj4z33/iqoptionapi/issues/88
@@ -30,4 +35,7 @@ class GetCandles(Base):
                         }
                 }
 
-        self.send_websocket_request(self.name, data)
+        request_id = "c_{}".format(next(_request_counter))
+        self.api.candles.register_request(request_id)
+        self.send_websocket_request(self.name, data, request_id)
+        return request_id
@@ -75,23 +75,72 @@ class WebsocketClient(object):
             self.api.wss_url, on_message=self.on_message,
             on_error=self.on_error, on_close=self.on_close,
             on_open=self.on_open)
+        self._handlers = self._build_handlers()
 
-    def dict_queue_add(self, dict, maxdict, key1, key2, key3, value):
-        if key3 in dict[key1][key2]:
-            dict[key1][key2][key3] = value
-        else:
-            while True:
-                try:
-                    dic_size = len(dict[key1][key2])
-                except:
-                    dic_size = 0
-                if dic_size < maxdict:
-                    dict[key1][key2][key3] = value
-                    break
-                else:
-                    # del mini key
-                    del dict[key1][key2][sorted(
-                        dict[key1][key2].keys(), reverse=False)[0]]
+    def _build_handlers(self):
+        """Map each websocket message name to its receiver.
+
+        Every receiver only reacts to one message name, so on_message does a
+        single dict lookup instead of calling all of them in sequence.
+        """
+        api = self.api
+        return {
+            "technical-indicators": lambda m: technical_indicators(api, m, self.api_dict_clean),
+            "timeSync": lambda m: time_sync(api, m),
+            "heartbeat": lambda m: heartbeat(api, m),
+            "balances": lambda m: balances(api, m),
+            "profile": lambda m: profile(api, m),
+            "balance-changed": lambda m: balance_changed(api, m),
+            "candles": lambda m: candles(api, m),
+            "buyComplete": lambda m: buy_complete(api, m),
+            "option": lambda m: option(api, m),
+            "position-history": lambda m: position_history(api, m),
+            "listInfoData": lambda m: list_info_data(api, m),
+            "candle-generated": lambda m: candle_generated_realtime(api, m),
+            "candles-generated": lambda m: candle_generated_v2(api, m),
+            "commission-changed": lambda m: commission_changed(api, m),
+            "socket-option-opened": lambda m: socket_option_opened(api, m),
+            "api_option_init_all_result": lambda m: api_option_init_all_result(api, m),
+            "initialization-data": lambda m: initialization_data(api, m),
+            "underlying-list": lambda m: underlying_list(api, m),
+            "instruments": lambda m: instruments(api, m),
+            "financial-information": lambda m: financial_information(api, m),
+            "position-changed": lambda m: position_changed(api, m),
+            "option-opened": lambda m: option_opened(api, m),
+            "option-closed": lambda m: option_closed(api, m),
+            "top-assets-updated": lambda m: top_assets_updated(api, m),
+            "strike-list": lambda m: strike_list(api, m),
+            "api_game_betinfo_result": lambda m: api_game_betinfo_result(api, m),
+            "traders-mood-changed": lambda m: traders_mood_changed(api, m),
+            # ------for forex&cfd&crypto..
+            "order-placed-temp": lambda m: order_placed_temp(api, m),
+            "order": lambda m: order(api, m),
+            "position": lambda m: position(api, m),
+            "positions": lambda m: positions(api, m),
+            "deferred-orders": lambda m: deferred_orders(api, m),
+            "history-positions": lambda m: history_positions(api, m),
+            "available-leverages": lambda m: available_leverages(api, m),
+            "order-canceled": lambda m: order_canceled(api, m),
+            "position-closed": lambda m: position_closed(api, m),
+            "overnight-fee": lambda m: overnight_fee(api, m),
+            "api_game_getoptions_result": lambda m: api_game_getoptions_result(api, m),
+            "sold-options": lambda m: sold_options(api, m),
+            "tpsl-changed": lambda m: tpsl_changed(api, m),
+            "auto-margin-call-changed": lambda m: auto_margin_call_changed(api, m),
+            "digital-option-placed": lambda m: digital_option_placed(api, m, self.api_dict_clean),
+            "result": lambda m: result(api, m),
+            "instrument-quotes-generated": lambda m: instrument_quotes_generated(api, m),
+            "training-balance-reset": lambda m: training_balance_reset(api, m),
+            "socket-option-closed": lambda m: socket_option_closed(api, m),
+            "live-deal-binary-option-placed": lambda m: live_deal_binary_option_placed(api, m),
+            "live-deal-digital-option": lambda m: live_deal_digital_option(api, m),
+            "leaderboard-deals-client": lambda m: leaderboard_deals_client(api, m),
+            "live-deal": lambda m: live_deal(api, m),
+            "user-profile-client": lambda m: user_profile_client(api, m),
+            "leaderboard-userinfo-deals-client": lambda m: leaderboard_userinfo_deals_client(api, m),
+            "users-availability": lambda m: users_availability(api, m),
+            "client-price-generated": lambda m: client_price_generated(api, m),
+        }
 
     def api_dict_clean(self, obj):
         if len(obj) > 5000:
@@ -101,71 +150,18 @@ class WebsocketClient(object):
 
     def on_message(self, wss, message):  # pylint: disable=unused-argument
         """Method to process websocket messages."""
-        global_value.ssl_Mutual_exclusion = True
         logger = logging.getLogger(__name__)
         logger.debug(message)
 
         message = json.loads(str(message))
 
+        handler = self._handlers.get(message.get("name"))
+        if handler is not None:
+            # Requests sent meanwhile block on the lock (no spinning)
+            with self.api.message_lock:
+                handler(message)
 
-        technical_indicators(self.api, message, self.api_dict_clean)
-        time_sync(self.api, message)
-        heartbeat(self.api, message)
-        balances(self.api, message)
-        profile(self.api, message)
-        balance_changed(self.api, message)
-        candles(self.api, message)
-        buy_complete(self.api, message)
-        option(self.api, message)
-        position_history(self.api, message)
-        list_info_data(self.api, message)
-        candle_generated_realtime(self.api, message, self.dict_queue_add)
-        candle_generated_v2(self.api, message, self.dict_queue_add)
-        commission_changed(self.api, message)
-        socket_option_opened(self.api, message)
-        api_option_init_all_result(self.api, message)
-        initialization_data(self.api, message)
-        underlying_list(self.api, message)
-        instruments(self.api, message)
-        financial_information(self.api, message)
-        position_changed(self.api, message)
-        option_opened(self.api, message)
-        option_closed(self.api, message)
-        top_assets_updated(self.api, message)
-        strike_list(self.api, message)
-        api_game_betinfo_result(self.api, message)
-        traders_mood_changed(self.api, message)
-         # ------for forex&cfd&crypto..
-        order_placed_temp(self.api, message)
-        order(self.api, message)
-        position(self.api, message)
-        positions(self.api, message)
-        order_placed_temp(self.api, message)
-        deferred_orders(self.api, message)
-        history_positions(self.api, message)
-        available_leverages(self.api, message)
-        order_canceled(self.api, message)
-        position_closed(self.api, message)
-        overnight_fee(self.api, message)
-        api_game_getoptions_result(self.api, message)
-        sold_options(self.api, message)
-        tpsl_changed(self.api, message)
-        auto_margin_call_changed(self.api, message)
-        digital_option_placed(self.api, message, self.api_dict_clean)
-        result(self.api, message)
-        instrument_quotes_generated(self.api, message)
-        training_balance_reset(self.api, message)
-        socket_option_closed(self.api, message)
-        live_deal_binary_option_placed(self.api, message)
-        live_deal_digital_option(self.api, message)
-        leaderboard_deals_client(self.api, message)
-        live_deal(self.api, message)
-        user_profile_client(self.api, message)
-        leaderboard_userinfo_deals_client(self.api, message)
-        users_availability(self.api, message)
-        client_price_generated(self.api, message)
-
-        global_value.ssl_Mutual_exclusion = False
+        self.api.notify_message()
 
     @staticmethod
     def on_error(wss, error):  # pylint: disable=unused-argument
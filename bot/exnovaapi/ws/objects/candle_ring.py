@@ -0,0 +1,101 @@
+"""Module for Exnova real-time candle ring buffer object."""
+
+import numpy as np
+
+from exnovaapi.ws.objects.base import Base
+
+
+class CandleRing(Base):
+    """Fixed-capacity ring buffer of real-time candles for one (asset, size).
+
+    Columns are stored as a preallocated float64 matrix. Every slot is written
+    twice (at ``i`` and ``i + capacity``) so the last N bars are always one
+    contiguous slice and :meth:`last` can return views without copying.
+    """
+
+    FIELDS = ("from", "open", "max", "min", "close", "volume")
+
+    def __init__(self, capacity, size):
+        """
+        :param capacity: The max number of candles kept.
+        :param size: The candle size in seconds.
+        """
+        super(CandleRing, self).__init__()
+        self.__name = "candle_ring"
+        self.capacity = max(1, int(capacity))
+        self.size = int(size)
+        self._data = np.zeros((len(self.FIELDS), 2 * self.capacity), dtype=np.float64)
+        self._pos = -1
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def last_from(self):
+        """Property to get the open time of the newest candle (None if empty)."""
+        if not self._count:
+            return None
+        return int(self._data[0, self._pos])
+
+    def update(self, candle):
+        """Method to append a new candle or patch the forming one in O(1).
+
+        :param candle: The candle dict (from/open/max/min/close/volume).
+        """
+        from_ = int(candle["from"])
+        row = (from_, candle.get("open", 0.0), candle.get("max", 0.0),
+               candle.get("min", 0.0), candle.get("close", 0.0), candle.get("volume", 0.0))
+        last_from = self.last_from
+        if last_from is None or from_ > last_from:
+            # Fill both slots before publishing, so readers never see the new
+            # position pointing at stale data; _pos goes before _count so a
+            # window of _count bars ending at _pos is always valid
+            pos = (self._pos + 1) % self.capacity
+            self._write(pos, row)
+            self._pos = pos
+            self._count = min(self._count + 1, self.capacity)
+        elif from_ == last_from:
+            self._write(self._pos, row)
+        else:
+            # Late update of an older bar: only patch it if it is still held
+            offset = (last_from - from_) // max(self.size, 1)
+            if offset < self._count:
+                idx = (self._pos - offset) % self.capacity
+                if int(self._data[0, idx]) == from_:
+                    self._write(idx, row)
+
+    def _write(self, idx, row):
+        self._data[:, idx] = row
+        self._data[:, idx + self.capacity] = row
+
+    def last(self, n=None):
+        """Method to get the newest candles as column views.
+
+        :param n: The number of candles, None for all of them.
+
+        :returns: dict of read-only NumPy views keyed by field name, oldest first.
+        """
+        n = self._count if n is None else max(0, min(int(n), self._count))
+        end = self._pos + self.capacity + 1
+        view = self._data[:, end - n:end]
+        view.flags.writeable = False
+        return {field: view[i] for i, field in enumerate(self.FIELDS)}
+
+    def to_dict(self):
+        """Method to get the candles in the legacy {from: candle} layout."""
+        cols = self.last()
+        out = {}
+        for i in range(self._count):
+            from_ = int(cols["from"][i])
+            out[from_] = {
+                "from": from_,
+                "to": from_ + self.size,
+                "open": float(cols["open"][i]),
+                "max": float(cols["max"][i]),
+                "min": float(cols["min"][i]),
+                "close": float(cols["close"][i]),
+                "volume": float(cols["volume"][i]),
+                "size": self.size,
+            }
+        return out
@@ -1,5 +1,7 @@
 """Module for Exnova Candles websocket object."""
 
+import threading
+
 from exnovaapi.ws.objects.base import Base
 
 
@@ -71,6 +73,9 @@ class Candles(Base):
         super(Candles, self).__init__()
         self.__name = "candles"
         self.__candles_data = None
+        self.__lock = threading.Lock()
+        self.__pending = {}
+        self.__replies = {}
 
     @property
     def candles_data(self):
@@ -85,6 +90,48 @@ class Candles(Base):
         """Method to set candles data."""
         self.__candles_data = candles_data
 
+    def register_request(self, request_id):
+        """Method to register a pending get-candles request.
+
+        :param request_id: The request identifier sent to the server.
+        """
+        with self.__lock:
+            self.__pending[str(request_id)] = threading.Event()
+
+    def set_reply(self, request_id, candles_data):
+        """Method to store the candles reply of a request and wake its waiter.
+
+        :param request_id: The request identifier echoed by the server.
+        :param candles_data: The list of candles data.
+        """
+        self.candles_data = candles_data
+        request_id = str(request_id)
+        with self.__lock:
+            event = self.__pending.get(request_id)
+            if event is None:
+                # Late reply of an abandoned request
+                return
+            self.__replies[request_id] = candles_data
+        event.set()
+
+    def wait_reply(self, request_id, timeout=None):
+        """Method to wait for the candles reply of a request.
+
+        :param request_id: The request identifier.
+        :param timeout: Seconds to wait, None waits forever.
+
+        :returns: The list of candles data or None on timeout.
+        """
+        request_id = str(request_id)
+        with self.__lock:
+            event = self.__pending.get(request_id)
+        if event is None:
+            return None
+        event.wait(timeout)
+        with self.__lock:
+            self.__pending.pop(request_id, None)
+            return self.__replies.pop(request_id, None)
+
     @property
     def first_candle(self):
         """Method to get first candle.
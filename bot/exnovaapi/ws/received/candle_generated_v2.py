@@ -1,9 +1,8 @@
 import exnovaapi.constants as OP_code
 
-def candle_generated_v2(api, message, dict_queue_add):
+def candle_generated_v2(api, message):
     if message["name"] == "candles-generated":
-        Active_name = list(OP_code.ACTIVES.keys())[list(
-                OP_code.ACTIVES.values()).index(message["msg"]["active_id"])]
+        Active_name = OP_code.get_active_name(message["msg"]["active_id"])
         active = str(Active_name)
         for k, v in message["msg"]["candles"].items():
             v["active_id"] = message["msg"]["active_id"]
@@ -12,10 +11,6 @@ def candle_generated_v2(api, message, dict_queue_add):
             v["bid"] = message["msg"]["bid"]
             v["close"] = message["msg"]["value"]
             v["size"] = int(k)
-            size = int(v["size"])
-            from_ = int(v["from"])
-            maxdict = api.real_time_candles_maxdict_table[Active_name][size]
-            msg = v
-            dict_queue_add(api.real_time_candles, maxdict, active, size, from_, msg)
+            api.candle_ring(active, int(k)).update(v)
 
         api.candle_generated_all_size_check[active] = True
\ No newline at end of file
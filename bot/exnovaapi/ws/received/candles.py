@@ -3,6 +3,6 @@
 def candles(api, message):
     if message['name'] == 'candles':
         try:
-            api.candles.candles_data = message["msg"]["candles"]
+            api.candles.set_reply(message.get("request_id"), message["msg"]["candles"])
         except:
-            pass
\ No newline at end of file
+            pass
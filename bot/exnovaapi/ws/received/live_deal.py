@@ -6,8 +6,7 @@ def live_deal(api, message):
     if message["name"] == "live-deal":
         # name = message["name"]
         active_id = message["msg"]["instrument_active_id"]
-        active = list(OP_code.ACTIVES.keys())[
-            list(OP_code.ACTIVES.values()).index(active_id)]
+        active = OP_code.get_active_name(active_id)
         _type = message["msg"]["instrument_type"]
         try:
             # api.live_deal_data[name][active][_type].appendleft(
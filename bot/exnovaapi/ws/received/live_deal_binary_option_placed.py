@@ -6,8 +6,7 @@ def live_deal_binary_option_placed(api, message):
     if message["name"] == "live-deal-binary-option-placed":
         # name = message["name"]
         active_id = message["msg"]["active_id"]
-        active = list(OP_code.ACTIVES.keys())[
-            list(OP_code.ACTIVES.values()).index(active_id)]
+        active = OP_code.get_active_name(active_id)
         _type = message["msg"]["option_type"]
         try:
             # self.api.live_deal_data[name][active][_type].appendleft(
@@ -6,8 +6,7 @@ def live_deal_digital_option(api, message):
     if message["name"] == "live-deal-digital-option":
         # name = message["name"]
         active_id = message["msg"]["instrument_active_id"]
-        active = list(OP_code.ACTIVES.keys())[
-            list(OP_code.ACTIVES.values()).index(active_id)]
+        active = OP_code.get_active_name(active_id)
         _type = message["msg"]["expiration_type"]
         try:
             # self.api.live_deal_data[name][active][_type].appendleft(
@@ -8,6 +8,7 @@
 import sys, os, time, signal, json, threading, atexit
 from datetime import datetime
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "brain"))
@@ -32,7 +33,10 @@ from brain.trade_evaluator import TradeEvaluator
 from brain.adaptive_learning_mode import get_learning_mode
 from brain.market_session import get_market_session
 from brain.zone_reaction_history import get_zone_history
+from brain.bar_view import post_trade_move
 from engine.intelligent_engine import IntelligentEngine
+from core.settlement_tracker import SettlementTracker, OpenPosition
+from core.latency_profiler import get_latency_profiler
 
 console = Console()
 
@@ -52,6 +56,7 @@ state = {
     "current_asset": "",
     "status": "INICIANDO",
     "active_order": None,
+    "open_positions": 0,
     "consecutive_losses": 0,
     "best_streak": 0,
     "current_streak": 0,
@@ -78,6 +83,11 @@ COOLDOWN_AFTER_LOSS = 120   # 2 minutos tras pérdida
 MIN_BETWEEN_TRADES  = 90    # 90 segundos mínimo entre trades
 MIN_BETWEEN_SAME_ASSET = 300  # 5 min entre trades del mismo activo
 MAX_CONSEC_LOSSES   = 3     # pausa tras 3 pérdidas seguidas
+SCAN_PARALLEL       = os.getenv("SCAN_MODE", "parallel").lower() != "sequential"
+SCAN_WORKERS        = int(os.getenv("SCAN_WORKERS", "6"))
+SCAN_INTERVAL       = 2     # segundos entre barridos completos (modo paralelo)
+MAX_OPEN_POSITIONS  = 3     # posiciones abiertas simultáneas
+MAX_OPEN_PER_ASSET  = 1     # posiciones abiertas por activo
 
 
 # ─── File logging (para monitoreo externo) ───────────────────────────────────
@@ -156,7 +166,7 @@ def make_header() -> Panel:
     title.append(f"  ·  {session_obj.get_status_display()}", style="dim cyan")
 
     grid = Table.grid(expand=True, padding=(0, 2))
-    for _ in range(7): grid.add_column(justify="center")
+    for _ in range(8): grid.add_column(justify="center")
 
     grid.add_row(
         f"[dim]Balance[/dim]\n[bold white]${bal:,.2f}[/bold white]",
@@ -165,6 +175,7 @@ def make_header() -> Panel:
         f"[dim]W / L[/dim]\n[bold green]{state['wins']}[/bold green] / [bold red]{state['losses']}[/bold red]",
         f"[dim]Bot WR aprendido[/dim]\n[bold {'green' if global_wr>=0.55 else 'yellow'}]{global_wr:.1%}[/bold {'green' if global_wr>=0.55 else 'yellow'}]",
         f"[dim]Activo[/dim]\n[bold cyan]{state['current_asset'] or '---'}[/bold cyan]",
+        f"[dim]Abiertas[/dim]\n[bold {'green' if state['open_positions'] else 'dim'}]{state['open_positions']}[/bold {'green' if state['open_positions'] else 'dim'}]",
         f"[dim]Estado[/dim]\n[bold {'green' if state['status']=='OPERANDO' else 'yellow' if state['status']=='ANALIZANDO' else 'dim'}]{state['status']}[/bold {'green' if state['status']=='OPERANDO' else 'yellow' if state['status']=='ANALIZANDO' else 'dim'}]",
     )
     return Panel(grid, title=title, border_style="cyan", padding=(0,1))
@@ -377,6 +388,14 @@ def make_risk_panel() -> Panel:
                  f"[{'red' if state['consecutive_losses']>=3 else 'white'}]{state['consecutive_losses']}[/]")
     grid.add_row("[dim]Ciclo[/dim]", str(state["cycle"]))
     grid.add_row("", "")
+    # Latencia por etapa (solo con LATENCY_PROFILE=1): las 4 de mayor p95
+    profiler = get_latency_profiler()
+    if profiler.enabled:
+        for stage, pct in profiler.top_stages(4, exclude=("analyze", "signal_to_order")):
+            p95_col = "red" if pct["p95_ms"] > 1000 else "yellow" if pct["p95_ms"] > 200 else "white"
+            grid.add_row(f"[dim]T: {stage}[/dim]",
+                         f"{pct['p50_ms']:.0f}/[{p95_col}]{pct['p95_ms']:.0f}[/{p95_col}] ms")
+        grid.add_row("", "")
     # Top rejection reasons
     rej = state.get("rejection_stats", {})
     sorted_rej = sorted(rej.items(), key=lambda x: -x[1])[:3]
@@ -462,6 +481,53 @@ def record_trade(asset, direction, amount, confidence, result, pnl,
 
 # ─── Bucle principal ──────────────────────────────────────────────────────────
 
+def start_live_streams(market_data: MarketDataHandler):
+    """Velas M1 en vivo por activo: el motor las lee del ring buffer sin pedirlas."""
+    started = sum(1 for asset in ASSETS if market_data.start_stream(asset, 60, 200))
+    if started:
+        log(f"Streams M1 en vivo: {started}/{len(ASSETS)} activos", "INFO")
+
+
+def _signal_rank(signal: dict) -> tuple:
+    tradeable = signal.get("action") == "TRADE" and signal.get("confidence", 0) >= MIN_CONFIDENCE
+    return (tradeable, signal.get("confidence", 0), signal.get("score", 0))
+
+
+def scan_assets(engine: IntelligentEngine, market_data: MarketDataHandler,
+                pool: ThreadPoolExecutor) -> list:
+    """Analiza todos los activos en paralelo; devuelve las señales, la mejor primero."""
+    futures = {pool.submit(engine.analyze, asset, market_data): asset for asset in ASSETS}
+    signals = []
+    for future in as_completed(futures):
+        try:
+            signal = future.result()
+        except Exception as e:
+            log(f"{futures[future]} | Error en análisis: {e}", "ERROR")
+            continue
+        if signal:
+            signals.append(signal)
+    signals.sort(key=_signal_rank, reverse=True)
+    return signals
+
+
+def log_wait_signal(signal: dict, last_reasons: dict = None):
+    """Loguea una señal no operada. Con last_reasons, solo si el motivo cambió."""
+    asset  = signal.get("asset", "")
+    action = signal.get("action", "WAIT")
+    reason = signal.get("reason", "")
+    if last_reasons is not None:
+        if last_reasons.get(asset) == reason:
+            return
+        last_reasons[asset] = reason
+    if action == "WAIT":
+        if reason and "zona" in reason.lower():
+            log(f"{asset} | {reason}", "ZONE")
+        elif reason:
+            log(f"{asset} | {reason}", "WAIT")
+    else:
+        log(f"{asset} | Score {signal.get('score', 0):.0f} | {reason} ", "WAIT")
+
+
 def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
     email    = os.getenv("EXNOVA_EMAIL", "")
     password = os.getenv("EXNOVA_PASSWORD", "")
@@ -494,11 +560,28 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
     rm.initialize(balance)
     log(f"Conectado. Balance práctica: ${balance:,.2f}", "INFO")
     log(f"Sistema de aprendizaje cargado. {learner.summary()}", "LEARN")
+    start_live_streams(market_data)
     log("Iniciando escaneo de zonas y análisis de mercado...", "INFO")
     state["status"] = "ANALIZANDO"
 
+    tracker = SettlementTracker(
+        resolve_fn=market_data.get_trade_result,
+        on_settled=lambda position, status, profit: settle_trade(
+            position, status, profit, market_data, rm,
+            learner, memory, evaluator, agent, tracker),
+        wait_fn=market_data.wait_trade_event,
+        max_per_asset=MAX_OPEN_PER_ASSET,
+        max_open=MAX_OPEN_POSITIONS,
+    )
+
+    profiler = get_latency_profiler()
     asset_idx = 0
     last_reconnect = time.time()
+    last_reasons = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, SCAN_WORKERS), thread_name_prefix="scan") \
+        if SCAN_PARALLEL else None
+    if pool:
+        log(f"Escaneo paralelo: {len(ASSETS)} activos, {SCAN_WORKERS} workers", "INFO")
 
     while state["running"]:
         try:
@@ -510,6 +593,7 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
                 if not market_data.is_really_connected():
                     log("Reconectando...", "WARN")
                     market_data.reconnect(email, password)
+                    start_live_streams(market_data)
                 last_reconnect = now
 
             # Pausa de riesgo solo por pérdidas consecutivas — no por horario
@@ -520,13 +604,23 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
                 state["consecutive_losses"] = 0
                 continue
 
-            asset = ASSETS[asset_idx % len(ASSETS)]
-            asset_idx += 1
-            state["current_asset"] = asset
             state["status"] = "ANALIZANDO"
 
             # ── Analizar con el motor inteligente ──
-            signal = engine.analyze(asset, market_data)
+            cycle_timer = profiler.timer()
+            if pool:
+                # Todos los activos a la vez; la mejor señal pasa a ejecución
+                signals = scan_assets(engine, market_data, pool)
+                for other in signals[1:]:
+                    log_wait_signal(other, last_reasons)
+                signal = signals[0] if signals else None
+                asset = signal["asset"] if signal else ""
+            else:
+                asset = ASSETS[asset_idx % len(ASSETS)]
+                asset_idx += 1
+                signal = engine.analyze(asset, market_data)
+            cycle_timer.mark("scan")
+            state["current_asset"] = asset
 
             if signal:
                 state["last_signal"] = signal
@@ -555,6 +649,7 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
                         'direction': direction
                     }
                     
+                    order_timer = profiler.timer(asset)
                     log(f"Enviando trade a Agente Inteligente para validacion...", "INFO")
                     try:
                         ai_result = agent.analyze_trade_opportunity(market_context)
@@ -584,6 +679,7 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
                             
                     except Exception as ai_err:
                         log(f"Error en validacion de IA: {ai_err}", "WARN")
+                    order_timer.mark("llm_agent")
 
                     time_since_last = now - state["last_trade_time"]
                     learning_mode = get_learning_mode()
@@ -595,7 +691,11 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
                     time_since_asset = now - last_asset_trade
 
                     rejection = None
-                    if time_since_last < cooldown_needed:
+                    exposure = tracker.can_open(asset)
+                    if exposure:
+                        rejection = exposure
+                        log(rejection, "WAIT")
+                    elif time_since_last < cooldown_needed:
                         rejection = f"Cooldown global: {int(cooldown_needed - time_since_last)}s restantes"
                         log(rejection, "WAIT")
                     elif time_since_asset < MIN_BETWEEN_SAME_ASSET:
@@ -606,6 +706,7 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
                         log(rejection, "WARN")
                     else:
                         base_amount = rm.calculate_position_size(confidence=confidence)
+                        order_timer.mark("position_size")
                         user_amount = os.environ.get("TRADE_AMOUNT")
                         if user_amount:
                             try:
@@ -616,7 +717,9 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
                             amount = base_amount
                             
                         if amount > 0:
-                            executed = execute_trade(market_data, rm, signal, amount, learner, memory, evaluator, agent)
+                            executed = execute_trade(market_data, signal, amount, tracker)
+                            order_timer.mark("order_send")
+                            order_timer.total("signal_to_order")
                             if executed:
                                 state["last_trade_by_asset"][asset] = time.time()
                         else:
@@ -628,16 +731,11 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
                         cause = rejection.split(":")[0][:40]
                         state["rejection_stats"][cause] = state["rejection_stats"].get(cause, 0) + 1
 
-                elif action == "WAIT":
-                    reason = signal.get("reason", "")
-                    if reason and "zona" in reason.lower():
-                        log(f"{asset} | {reason}", "ZONE")
-                    elif reason:
-                        log(f"{asset} | {reason}", "WAIT")
                 else:
-                    log(f"{asset} | Score {score:.0f} | {signal.get('reason', '')} ", "WAIT")
+                    log_wait_signal(signal, last_reasons if pool else None)
 
-            time.sleep(6)
+            profiler.maybe_export()
+            time.sleep(SCAN_INTERVAL if pool else 6)
 
         except KeyboardInterrupt:
             state["running"] = False
@@ -646,12 +744,20 @@ def bot_loop(market_data: MarketDataHandler, rm, engine: IntelligentEngine):
             log(f"Error en loop: {e}", "ERROR")
             time.sleep(5)
 
+    if pool:
+        pool.shutdown(wait=False)
+    if len(tracker):
+        log(f"Detenido con {len(tracker)} posiciones abiertas sin liquidar", "WARN")
+    tracker.stop()
+    if profiler.enabled:
+        profiler.export()
     log("Bot detenido.", "INFO")
     state["status"] = "DETENIDO"
     memory.save()
 
 
-def execute_trade(market_data, rm, signal, amount, learner, memory, evaluator, agent) -> bool:
+def execute_trade(market_data, signal, amount, tracker: SettlementTracker) -> bool:
+    """Coloca la orden y la deja en manos del tracker; no espera el vencimiento."""
     asset      = signal["asset"]
     direction  = signal["signal"]
     confidence = signal["confidence"]
@@ -685,134 +791,12 @@ def execute_trade(market_data, rm, signal, amount, learner, memory, evaluator, a
         if check:
             log(f"Orden abierta: {direction} ${amount:.2f} exp={duration}min", "INFO")
             state["active_order"] = order_id
-            time.sleep(expiration + 8)
-
-            # Verificar resultado
-            result, pnl = "DRAW", 0.0
-            try:
-                result_data = market_data.api.check_win_v4(order_id)
-                if result_data is not None:
-                    if isinstance(result_data, tuple):
-                        status, profit = result_data
-                        if profit is not None and isinstance(profit, (int, float)):
-                            profit = float(profit)
-                        else:
-                            profit = 0.0
-                    elif isinstance(result_data, (int, float)):
-                        profit = float(result_data)
-                    else:
-                        log(f"Resultado inesperado: {type(result_data)} = {result_data}", "WARN")
-                        profit = 0.0
-
-                    if profit > 0:
-                        pnl, result = profit, "WIN"
-                        log(f"WIN +${profit:.2f} | {asset} {direction} | patron={pattern} zona={zone_str:.2f}", "WIN")
-                    elif profit < 0:
-                        pnl, result = -amount, "LOSS"
-                        log(f"LOSS -${amount:.2f} | {asset} {direction} | patron={pattern} zona={zone_str:.2f}", "LOSS")
-                    else:
-                        pnl, result = 0.0, "DRAW"
-                        log(f"EMPATE | {asset} {direction}", "WARN")
-                else:
-                    pnl, result = -amount * 0.5, "LOSS"
-                    log("Sin confirmacion de resultado, asumiendo LOSS", "WARN")
-            except TypeError as e:
-                log(f"Error de tipo verificando resultado: {e} | Dato: {result_data}", "WARN")
-                pnl, result = 0.0, "DRAW"
-            except Exception as e:
-                log(f"Error verificando resultado: {e}", "WARN")
-                pnl, result = 0.0, "DRAW"
-
-            record_trade(asset, direction, amount, confidence, result, pnl, pattern, zone_str)
-            rm.update_balance(state["balance"], {"profit": pnl})
-
-            learning_mode = get_learning_mode()
-            learning_mode.record_trade()
-
-            # Auto-evaluacion y aprendizaje
-            df_after = None
-            try:
-                df_after = market_data.get_candles(asset, 60, 20)
-            except Exception:
-                pass
-
-            trade_record = {
-                "asset": asset, "direction": direction, "amount": amount,
-                "confidence": confidence, "result": result, "pnl": pnl,
-                "pattern": pattern, "order_id": str(order_id),
-                "entry_price": signal.get("zone", 0.0) or amount,
-                "expiration_minutes": signal.get("expiration_minutes", duration),
-                "zone_strength": zone_str,
-                "rsi_at_touch": context.get("momentum", {}).get("rsi_m1", 50),
-                "trend_aligned": context.get("zone_context", {}).get("trend_aligned", False),
-            }
-            diagnosis = evaluator.evaluate(trade_record, context, conditions,
-                                           df_m1_after=df_after)
-            learner.learn_from_trade(conditions, result, diagnosis)
-            state["last_diagnosis"] = evaluator.format_for_display(diagnosis)
-
-            # ── Aprendizaje post-trade con OpenCode AI ──
-            agent.learn_from_trade_result(trade_record)
-            total_trades_count = state["wins"] + state["losses"]
-            if total_trades_count > 0 and total_trades_count % 5 == 0:
-                agent.evaluate_session()
-
-            # Log de diagnostico post-trade
-            if result == "LOSS":
-                cause = diagnosis.get("primary_cause", "unknown")
-                log(f"Diagnostico LOSS: causa={cause} | leccion={diagnosis.get('lessons', ['-'])[0]}", "LEARN")
-            elif result == "WIN":
-                good = diagnosis.get("what_worked", ["-"])[0]
-                log(f"Diagnostico WIN: {good}", "LEARN")
-
-            # Actualizar memoria de zona
-            if zone_obj:
-                reacted = (result == "WIN" and direction == "CALL" and zone_obj.zone_type == "support") or \
-                          (result == "WIN" and direction == "PUT" and zone_obj.zone_type == "resistance")
-                memory.add_or_update_zone(asset, zone_obj.level, zone_obj.zone_type, reacted)
-                memory.save()
-
-            # Registrar historial detallado de reacción en la zona
-            try:
-                zone_history = get_zone_history()
-                session_obj  = get_market_session()
-                session_name, _ = session_obj.get_current_session()
-                # Calcular pips movidos
-                entry_px = signal.get("zone", 0.0) or 0.0
-                pips_moved = 0.0
-                if df_after is not None and len(df_after) >= 2 and entry_px > 0:
-                    if direction == "CALL":
-                        pips_moved = (float(df_after["high"].max()) - entry_px) * 10000
-                    else:
-                        pips_moved = (entry_px - float(df_after["low"].min())) * 10000
-                    pips_moved = max(0.0, pips_moved)
-                candles_to_move = 1
-                if df_after is not None and len(df_after) >= 2 and entry_px > 0:
-                    for i, (_, row) in enumerate(df_after.iterrows()):
-                        if direction == "CALL" and float(row.get("high", 0)) > entry_px * 1.0003:
-                            candles_to_move = i + 1; break
-                        if direction == "PUT" and float(row.get("low", 9999)) < entry_px * 0.9997:
-                            candles_to_move = i + 1; break
-                touch_result = "HOLD" if result == "WIN" else "BREAK" if result == "LOSS" else "UNKNOWN"
-                zone_history.record_touch(
-                    asset=asset,
-                    level=zone_obj.level,
-                    zone_type=zone_obj.zone_type,
-                    result=touch_result,
-                    pips_moved=pips_moved,
-                    candles_to_move=candles_to_move,
-                    had_pattern=bool(pattern),
-                    pattern_name=pattern or "",
-                    session=session_name,
-                    rsi=context.get("momentum", {}).get("rsi_m1", 50),
-                    trend_aligned=context.get("zone_context", {}).get("trend_aligned", False),
-                    price_at_touch=entry_px,
-                )
-            except Exception as zh_err:
-                log(f"Error registrando historial zona: {zh_err}", "WARN")
-
+            tracker.open(OpenPosition(
+                order_id=order_id, asset=asset, direction=direction, amount=amount,
+                expiration=expiration, payload={"signal": signal, "duration": duration},
+            ))
+            state["open_positions"] = len(tracker)
             state["status"] = "ANALIZANDO"
-            state["active_order"] = None
             return True
 
         else:
@@ -828,6 +812,126 @@ def execute_trade(market_data, rm, signal, amount, learner, memory, evaluator, a
         return False
 
 
+def settle_trade(position: OpenPosition, status, profit, market_data, rm,
+                 learner, memory, evaluator, agent, tracker: SettlementTracker):
+    """Resultado + aprendizaje post-trade. Corre en el worker del SettlementTracker."""
+    signal     = position.payload["signal"]
+    duration   = position.payload["duration"]
+    asset      = position.asset
+    direction  = position.direction
+    amount     = position.amount
+    order_id   = position.order_id
+    confidence = signal["confidence"]
+    pattern    = signal.get("pattern", "")
+    zone_str   = signal.get("zone_strength", 0.0)
+    context    = signal.get("context", {})
+    conditions = signal.get("conditions", {})
+    zone_obj   = signal.get("zone_object")
+
+    # Verificar resultado
+    if status is not None:
+        profit = float(profit) if isinstance(profit, (int, float)) else 0.0
+        if profit > 0:
+            pnl, result = profit, "WIN"
+            log(f"WIN +${profit:.2f} | {asset} {direction} | patron={pattern} zona={zone_str:.2f}", "WIN")
+        elif profit < 0:
+            pnl, result = -amount, "LOSS"
+            log(f"LOSS -${amount:.2f} | {asset} {direction} | patron={pattern} zona={zone_str:.2f}", "LOSS")
+        else:
+            pnl, result = 0.0, "DRAW"
+            log(f"EMPATE | {asset} {direction}", "WARN")
+    else:
+        # Resultado desconocido (timeout o socket-option-closed invalido): no inventar
+        # una perdida; se registra como empate y no alimenta el aprendizaje
+        pnl, result = 0.0, "DRAW"
+        log(f"Sin confirmacion de resultado ({order_id}), registrado como EMPATE sin aprendizaje", "WARN")
+
+    record_trade(asset, direction, amount, confidence, result, pnl, pattern, zone_str)
+    rm.update_balance(state["balance"], {"profit": pnl})
+
+    learning_mode = get_learning_mode()
+    learning_mode.record_trade()
+
+    if status is None:
+        state["open_positions"] = len(tracker)
+        if not len(tracker):
+            state["active_order"] = None
+        return
+
+    # Auto-evaluacion y aprendizaje
+    df_after = None
+    try:
+        df_after = market_data.get_candles(asset, 60, 20)
+    except Exception:
+        pass
+
+    trade_record = {
+        "asset": asset, "direction": direction, "amount": amount,
+        "confidence": confidence, "result": result, "pnl": pnl,
+        "pattern": pattern, "order_id": str(order_id),
+        "entry_price": signal.get("zone", 0.0) or amount,
+        "expiration_minutes": signal.get("expiration_minutes", duration),
+        "zone_strength": zone_str,
+        "rsi_at_touch": context.get("momentum", {}).get("rsi_m1", 50),
+        "trend_aligned": context.get("zone_context", {}).get("trend_aligned", False),
+    }
+    diagnosis = evaluator.evaluate(trade_record, context, conditions,
+                                   df_m1_after=df_after)
+    learner.learn_from_trade(conditions, result, diagnosis)
+    state["last_diagnosis"] = evaluator.format_for_display(diagnosis)
+
+    # ── Aprendizaje post-trade con OpenCode AI ──
+    agent.learn_from_trade_result(trade_record)
+    total_trades_count = state["wins"] + state["losses"]
+    if total_trades_count > 0 and total_trades_count % 5 == 0:
+        agent.evaluate_session()
+
+    # Log de diagnostico post-trade
+    if result == "LOSS":
+        cause = diagnosis.get("primary_cause", "unknown")
+        log(f"Diagnostico LOSS: causa={cause} | leccion={diagnosis.get('lessons', ['-'])[0]}", "LEARN")
+    elif result == "WIN":
+        good = diagnosis.get("what_worked", ["-"])[0]
+        log(f"Diagnostico WIN: {good}", "LEARN")
+
+    # Actualizar memoria de zona
+    if zone_obj:
+        reacted = (result == "WIN" and direction == "CALL" and zone_obj.zone_type == "support") or \
+                  (result == "WIN" and direction == "PUT" and zone_obj.zone_type == "resistance")
+        memory.add_or_update_zone(asset, zone_obj.level, zone_obj.zone_type, reacted)
+        memory.save()
+
+    # Registrar historial detallado de reacción en la zona
+    try:
+        zone_history = get_zone_history()
+        session_obj  = get_market_session()
+        session_name, _ = session_obj.get_current_session()
+        # Calcular pips movidos
+        entry_px = signal.get("zone", 0.0) or 0.0
+        pips_moved, candles_to_move = post_trade_move(df_after, entry_px, direction)
+        touch_result = "HOLD" if result == "WIN" else "BREAK" if result == "LOSS" else "UNKNOWN"
+        zone_history.record_touch(
+            asset=asset,
+            level=zone_obj.level,
+            zone_type=zone_obj.zone_type,
+            result=touch_result,
+            pips_moved=pips_moved,
+            candles_to_move=candles_to_move,
+            had_pattern=bool(pattern),
+            pattern_name=pattern or "",
+            session=session_name,
+            rsi=context.get("momentum", {}).get("rsi_m1", 50),
+            trend_aligned=context.get("zone_context", {}).get("trend_aligned", False),
+            price_at_touch=entry_px,
+        )
+    except Exception as zh_err:
+        log(f"Error registrando historial zona: {zh_err}", "WARN")
+
+    state["open_positions"] = len(tracker)
+    if not len(tracker):
+        state["active_order"] = None
+
+
 # ─── Entry point ─────────────────────────────────────────────────────────────
 
 def signal_handler(sig, frame):
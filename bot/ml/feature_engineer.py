@@ -7,6 +7,8 @@ import pandas as pd
 from typing import Dict, List
 from datetime import datetime
 
+from brain.indicator_service import get_indicator_service
+
 
 class FeatureEngineer:
     """
@@ -323,13 +325,8 @@ class FeatureEngineer:
         if len(df) < period + 1:
             return 50.0
         
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return float(rsi.iloc[-1]) if not pd.isna(rsi.iloc[-1]) else 50.0
+        rsi = get_indicator_service().rsi(df, period, kind="sma")
+        return float(rsi[-1]) if not np.isnan(rsi[-1]) else 50.0
     
     @staticmethod
     def _calculate_macd(df: pd.DataFrame, fast=12, slow=26, signal=9):
@@ -337,16 +334,14 @@ class FeatureEngineer:
         if len(df) < slow + signal:
             return 0.0, 0.0, 0.0
         
-        ema_fast = df['close'].ewm(span=fast).mean()
-        ema_slow = df['close'].ewm(span=slow).mean()
-        macd_line = ema_fast - ema_slow
-        signal_line = macd_line.ewm(span=signal).mean()
-        histogram = macd_line - signal_line
+        macd_line, signal_line, histogram = get_indicator_service().macd(
+            df, fast, slow, signal, kind="ewm", adjust=True
+        )
         
         return (
-            float(macd_line.iloc[-1]),
-            float(signal_line.iloc[-1]),
-            float(histogram.iloc[-1])
+            float(macd_line[-1]),
+            float(signal_line[-1]),
+            float(histogram[-1])
         )
     
     @staticmethod
@@ -356,15 +351,12 @@ class FeatureEngineer:
             mid = float(df['close'].mean())
             return mid, mid, mid
         
-        mid = df['close'].rolling(window=period).mean()
-        std = df['close'].rolling(window=period).std()
-        upper = mid + (std * std_dev)
-        lower = mid - (std * std_dev)
+        upper, lower, mid = get_indicator_service().bollinger(df, period, std_dev)
         
         return (
-            float(upper.iloc[-1]),
-            float(lower.iloc[-1]),
-            float(mid.iloc[-1])
+            float(upper[-1]),
+            float(lower[-1]),
+            float(mid[-1])
         )
     
     @staticmethod
@@ -373,18 +365,8 @@ class FeatureEngineer:
         if len(df) < period + 1:
             return 0.0
         
-        high = df['high']
-        low = df['low']
-        close = df['close'].shift(1)
-        
-        tr1 = high - low
-        tr2 = abs(high - close)
-        tr3 = abs(low - close)
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = tr.rolling(window=period).mean()
-        
-        return float(atr.iloc[-1]) if not pd.isna(atr.iloc[-1]) else 0.0
+        atr = get_indicator_service().atr(df, period, kind="sma")
+        return float(atr[-1]) if not np.isnan(atr[-1]) else 0.0
     
     @staticmethod
     def _calculate_adx(df: pd.DataFrame, period=14) -> float: